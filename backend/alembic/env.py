@@ -2,6 +2,8 @@ from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
+from app.config import settings
+from app.db.database import to_sync_url
 from app.db.models import Base
 
 from alembic import context
@@ -10,6 +12,10 @@ from alembic import context
 # access to the values within the .ini file in use.
 config = context.config
 
+# Migrate the database the app is configured for, when one is set
+if settings.DATABASE_URL:
+    config.set_main_option("sqlalchemy.url", to_sync_url(settings.DATABASE_URL).replace("%", "%%"))
+
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
 if config.config_file_name is not None:
@@ -0,0 +1,95 @@
+"""Add user and group search indexes
+
+Revision ID: 7d2c4b1e9f35
+Revises: a3f06c2e8d91
+Create Date: 2026-10-18 19:41:27.804512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2c4b1e9f35'
+down_revision: Union[str, Sequence[str], None] = 'a3f06c2e8d91'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SQLITE_UPGRADE = [
+    """CREATE VIRTUAL TABLE users_fts USING fts5(
+        email, first_name, last_name,
+        content='users', content_rowid='rowid', prefix='1 2 3 4 5 6'
+    )""",
+    """CREATE TRIGGER users_fts_ai AFTER INSERT ON users BEGIN
+        INSERT INTO users_fts(rowid, email, first_name, last_name)
+        VALUES (new.rowid, new.email, new.first_name, new.last_name);
+    END""",
+    """CREATE TRIGGER users_fts_ad AFTER DELETE ON users BEGIN
+        INSERT INTO users_fts(users_fts, rowid, email, first_name, last_name)
+        VALUES ('delete', old.rowid, old.email, old.first_name, old.last_name);
+    END""",
+    """CREATE TRIGGER users_fts_au AFTER UPDATE ON users BEGIN
+        INSERT INTO users_fts(users_fts, rowid, email, first_name, last_name)
+        VALUES ('delete', old.rowid, old.email, old.first_name, old.last_name);
+        INSERT INTO users_fts(rowid, email, first_name, last_name)
+        VALUES (new.rowid, new.email, new.first_name, new.last_name);
+    END""",
+    "INSERT INTO users_fts(users_fts) VALUES ('rebuild')",
+    """CREATE VIRTUAL TABLE groups_fts USING fts5(
+        name, content='groups', content_rowid='id', prefix='1 2 3 4 5 6'
+    )""",
+    """CREATE TRIGGER groups_fts_ai AFTER INSERT ON groups BEGIN
+        INSERT INTO groups_fts(rowid, name) VALUES (new.id, new.name);
+    END""",
+    """CREATE TRIGGER groups_fts_ad AFTER DELETE ON groups BEGIN
+        INSERT INTO groups_fts(groups_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    END""",
+    """CREATE TRIGGER groups_fts_au AFTER UPDATE ON groups BEGIN
+        INSERT INTO groups_fts(groups_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO groups_fts(rowid, name) VALUES (new.id, new.name);
+    END""",
+    "INSERT INTO groups_fts(groups_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS groups_fts_au",
+    "DROP TRIGGER IF EXISTS groups_fts_ad",
+    "DROP TRIGGER IF EXISTS groups_fts_ai",
+    "DROP TABLE IF EXISTS groups_fts",
+    "DROP TRIGGER IF EXISTS users_fts_au",
+    "DROP TRIGGER IF EXISTS users_fts_ad",
+    "DROP TRIGGER IF EXISTS users_fts_ai",
+    "DROP TABLE IF EXISTS users_fts",
+]
+
+POSTGRES_UPGRADE = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX ix_users_email_trgm ON users USING gin (email gin_trgm_ops)",
+    "CREATE INDEX ix_users_first_name_trgm ON users USING gin (first_name gin_trgm_ops)",
+    "CREATE INDEX ix_users_last_name_trgm ON users USING gin (last_name gin_trgm_ops)",
+    "CREATE INDEX ix_groups_name_trgm ON groups USING gin (name gin_trgm_ops)",
+]
+
+POSTGRES_DOWNGRADE = [
+    "DROP INDEX IF EXISTS ix_groups_name_trgm",
+    "DROP INDEX IF EXISTS ix_users_last_name_trgm",
+    "DROP INDEX IF EXISTS ix_users_first_name_trgm",
+    "DROP INDEX IF EXISTS ix_users_email_trgm",
+]
+
+
+def _run(statements_by_dialect: dict) -> None:
+    for statement in statements_by_dialect.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _run({"sqlite": SQLITE_UPGRADE, "postgresql": POSTGRES_UPGRADE})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _run({"sqlite": SQLITE_DOWNGRADE, "postgresql": POSTGRES_DOWNGRADE})
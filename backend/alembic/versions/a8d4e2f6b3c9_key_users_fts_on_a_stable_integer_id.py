@@ -0,0 +1,110 @@
+"""Key users_fts on a stable integer id
+
+Revision ID: a8d4e2f6b3c9
+Revises: f3b8d2a6c1e7
+Create Date: 2026-10-18 21:12:40.518307
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8d4e2f6b3c9'
+down_revision: Union[str, Sequence[str], None] = 'f3b8d2a6c1e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# users_fts was keyed on the implicit rowid of users, whose TEXT primary key
+# leaves that rowid free to change on VACUUM. Index a copy of the searched
+# columns under an INTEGER PRIMARY KEY instead.
+SQLITE_UPGRADE = [
+    "DROP TRIGGER IF EXISTS users_fts_au",
+    "DROP TRIGGER IF EXISTS users_fts_ad",
+    "DROP TRIGGER IF EXISTS users_fts_ai",
+    "DROP TABLE IF EXISTS users_fts",
+    """CREATE TABLE users_search (
+        id INTEGER PRIMARY KEY,
+        uid VARCHAR NOT NULL UNIQUE,
+        email VARCHAR, first_name VARCHAR, last_name VARCHAR
+    )""",
+    "INSERT INTO users_search(uid, email, first_name, last_name) SELECT uid, email, first_name, last_name FROM users",
+    """CREATE TRIGGER users_search_ai AFTER INSERT ON users BEGIN
+        INSERT INTO users_search(uid, email, first_name, last_name)
+        VALUES (new.uid, new.email, new.first_name, new.last_name);
+    END""",
+    """CREATE TRIGGER users_search_ad AFTER DELETE ON users BEGIN
+        DELETE FROM users_search WHERE uid = old.uid;
+    END""",
+    """CREATE TRIGGER users_search_au AFTER UPDATE ON users BEGIN
+        UPDATE users_search SET uid = new.uid, email = new.email, first_name = new.first_name,
+            last_name = new.last_name
+        WHERE uid = old.uid;
+    END""",
+    """CREATE VIRTUAL TABLE users_fts USING fts5(
+        email, first_name, last_name,
+        content='users_search', content_rowid='id', prefix='1 2 3 4 5 6'
+    )""",
+    """CREATE TRIGGER users_search_fts_ai AFTER INSERT ON users_search BEGIN
+        INSERT INTO users_fts(rowid, email, first_name, last_name)
+        VALUES (new.id, new.email, new.first_name, new.last_name);
+    END""",
+    """CREATE TRIGGER users_search_fts_ad AFTER DELETE ON users_search BEGIN
+        INSERT INTO users_fts(users_fts, rowid, email, first_name, last_name)
+        VALUES ('delete', old.id, old.email, old.first_name, old.last_name);
+    END""",
+    """CREATE TRIGGER users_search_fts_au AFTER UPDATE ON users_search BEGIN
+        INSERT INTO users_fts(users_fts, rowid, email, first_name, last_name)
+        VALUES ('delete', old.id, old.email, old.first_name, old.last_name);
+        INSERT INTO users_fts(rowid, email, first_name, last_name)
+        VALUES (new.id, new.email, new.first_name, new.last_name);
+    END""",
+    "INSERT INTO users_fts(users_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS users_search_fts_au",
+    "DROP TRIGGER IF EXISTS users_search_fts_ad",
+    "DROP TRIGGER IF EXISTS users_search_fts_ai",
+    "DROP TABLE IF EXISTS users_fts",
+    "DROP TRIGGER IF EXISTS users_search_au",
+    "DROP TRIGGER IF EXISTS users_search_ad",
+    "DROP TRIGGER IF EXISTS users_search_ai",
+    "DROP TABLE IF EXISTS users_search",
+    """CREATE VIRTUAL TABLE users_fts USING fts5(
+        email, first_name, last_name,
+        content='users', content_rowid='rowid', prefix='1 2 3 4 5 6'
+    )""",
+    """CREATE TRIGGER users_fts_ai AFTER INSERT ON users BEGIN
+        INSERT INTO users_fts(rowid, email, first_name, last_name)
+        VALUES (new.rowid, new.email, new.first_name, new.last_name);
+    END""",
+    """CREATE TRIGGER users_fts_ad AFTER DELETE ON users BEGIN
+        INSERT INTO users_fts(users_fts, rowid, email, first_name, last_name)
+        VALUES ('delete', old.rowid, old.email, old.first_name, old.last_name);
+    END""",
+    """CREATE TRIGGER users_fts_au AFTER UPDATE ON users BEGIN
+        INSERT INTO users_fts(users_fts, rowid, email, first_name, last_name)
+        VALUES ('delete', old.rowid, old.email, old.first_name, old.last_name);
+        INSERT INTO users_fts(rowid, email, first_name, last_name)
+        VALUES (new.rowid, new.email, new.first_name, new.last_name);
+    END""",
+    "INSERT INTO users_fts(users_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Postgres searches with pg_trgm indexes on users itself
+    if op.get_bind().dialect.name == "sqlite":
+        for statement in SQLITE_UPGRADE:
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == "sqlite":
+        for statement in SQLITE_DOWNGRADE:
+            op.execute(statement)
@@ -0,0 +1,176 @@
+"""Stamp Postgres sync versions with transaction ids
+
+Revision ID: b7e1c4f9a2d6
+Revises: a8d4e2f6b3c9
+Create Date: 2026-10-19 09:41:26.870152
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e1c4f9a2d6'
+down_revision: Union[str, Sequence[str], None] = 'a8d4e2f6b3c9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Several deletes in one Postgres transaction now share a version, so
+# tombstones get their own key. SQLite keeps its counter; its tables only
+# need the new tombstone key. The table is rebuilt under a legacy rename so
+# the triggers that write to it keep pointing at "sync_tombstones".
+SQLITE_UPGRADE = [
+    "PRAGMA legacy_alter_table = ON",
+    "ALTER TABLE sync_tombstones RENAME TO sync_tombstones_old",
+    """CREATE TABLE sync_tombstones (
+        id INTEGER NOT NULL PRIMARY KEY,
+        version BIGINT NOT NULL,
+        kind VARCHAR NOT NULL,
+        entity_id INTEGER NOT NULL,
+        wishlist_id INTEGER NOT NULL,
+        user_id VARCHAR,
+        deleted_at DATETIME NOT NULL
+    )""",
+    """INSERT INTO sync_tombstones (version, kind, entity_id, wishlist_id, user_id, deleted_at)
+        SELECT version, kind, entity_id, wishlist_id, user_id, deleted_at FROM sync_tombstones_old ORDER BY version""",
+    "DROP TABLE sync_tombstones_old",
+    "PRAGMA legacy_alter_table = OFF",
+    "CREATE INDEX ix_sync_tombstones_version ON sync_tombstones (version)",
+]
+
+SQLITE_DOWNGRADE = [
+    "PRAGMA legacy_alter_table = ON",
+    "ALTER TABLE sync_tombstones RENAME TO sync_tombstones_old",
+    """CREATE TABLE sync_tombstones (
+        version INTEGER NOT NULL PRIMARY KEY,
+        kind VARCHAR NOT NULL,
+        entity_id INTEGER NOT NULL,
+        wishlist_id INTEGER NOT NULL,
+        user_id VARCHAR,
+        deleted_at DATETIME NOT NULL
+    )""",
+    """INSERT INTO sync_tombstones (version, kind, entity_id, wishlist_id, user_id, deleted_at)
+        SELECT version, kind, entity_id, wishlist_id, user_id, deleted_at FROM sync_tombstones_old""",
+    "DROP TABLE sync_tombstones_old",
+    "PRAGMA legacy_alter_table = OFF",
+]
+
+# sync_clock.version stays at the last counter value and is added to
+# transaction ids, so new versions land above every existing token
+POSTGRES_UPGRADE = [
+    "ALTER TABLE wishlists ALTER COLUMN version TYPE BIGINT",
+    "ALTER TABLE wishlist_items ALTER COLUMN version TYPE BIGINT",
+    "ALTER TABLE shared_with ALTER COLUMN version TYPE BIGINT",
+    "ALTER TABLE sync_clock ALTER COLUMN version TYPE BIGINT, ALTER COLUMN pruned_version TYPE BIGINT",
+    "ALTER TABLE sync_tombstones DROP CONSTRAINT sync_tombstones_pkey",
+    "ALTER TABLE sync_tombstones ALTER COLUMN version TYPE BIGINT, ADD COLUMN id SERIAL PRIMARY KEY",
+    "CREATE INDEX ix_sync_tombstones_version ON sync_tombstones (version)",
+    "DROP TRIGGER IF EXISTS users_changed ON users",
+    "DROP TRIGGER IF EXISTS group_members_changed ON group_members",
+    "DROP FUNCTION IF EXISTS sync_bump_clock()",
+    """CREATE OR REPLACE FUNCTION sync_current_version() RETURNS bigint AS $$
+        SELECT pg_current_xact_id()::text::bigint + version FROM sync_clock WHERE id = 1
+    $$ LANGUAGE sql STABLE""",
+    """CREATE OR REPLACE FUNCTION sync_safe_version() RETURNS bigint AS $$
+        SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint - 1 + version FROM sync_clock WHERE id = 1
+    $$ LANGUAGE sql STABLE""",
+    """CREATE OR REPLACE FUNCTION sync_stamp_version() RETURNS trigger AS $$
+    BEGIN
+        NEW.version := sync_current_version();
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION sync_wishlist_deleted() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO sync_tombstones (version, kind, entity_id, wishlist_id, user_id, deleted_at)
+        VALUES (sync_current_version(), 'wishlist', OLD.id, OLD.id, OLD.owner_id, now() AT TIME ZONE 'utc');
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION sync_item_deleted() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO sync_tombstones (version, kind, entity_id, wishlist_id, user_id, deleted_at)
+        VALUES (sync_current_version(), 'item', OLD.id, OLD.wishlist_id, NULL, now() AT TIME ZONE 'utc');
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION sync_share_changed() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            INSERT INTO sync_tombstones (version, kind, entity_id, wishlist_id, user_id, deleted_at)
+            VALUES (sync_current_version(), 'share', OLD.wishlist_id, OLD.wishlist_id, OLD.user_id, now() AT TIME ZONE 'utc');
+            UPDATE wishlists SET version = version WHERE id = OLD.wishlist_id;
+        ELSE
+            UPDATE wishlists SET version = version WHERE id = NEW.wishlist_id;
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    "DROP FUNCTION IF EXISTS sync_next_version()",
+]
+
+# The counter resumes above every transaction-id version, and tombstones
+# that share a version cannot keep their old key: drop them and send every
+# client a full snapshot instead
+POSTGRES_DOWNGRADE = [
+    "UPDATE sync_clock SET version = sync_current_version(), pruned_version = sync_current_version() WHERE id = 1",
+    "DELETE FROM sync_tombstones",
+    """CREATE OR REPLACE FUNCTION sync_next_version() RETURNS bigint AS $$
+        UPDATE sync_clock SET version = version + 1 WHERE id = 1 RETURNING version
+    $$ LANGUAGE sql""",
+    """CREATE OR REPLACE FUNCTION sync_stamp_version() RETURNS trigger AS $$
+    BEGIN
+        NEW.version := sync_next_version();
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION sync_wishlist_deleted() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO sync_tombstones (version, kind, entity_id, wishlist_id, user_id, deleted_at)
+        VALUES (sync_next_version(), 'wishlist', OLD.id, OLD.id, OLD.owner_id, now() AT TIME ZONE 'utc');
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION sync_item_deleted() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO sync_tombstones (version, kind, entity_id, wishlist_id, user_id, deleted_at)
+        VALUES (sync_next_version(), 'item', OLD.id, OLD.wishlist_id, NULL, now() AT TIME ZONE 'utc');
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION sync_share_changed() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            INSERT INTO sync_tombstones (version, kind, entity_id, wishlist_id, user_id, deleted_at)
+            VALUES (sync_next_version(), 'share', OLD.wishlist_id, OLD.wishlist_id, OLD.user_id, now() AT TIME ZONE 'utc');
+            UPDATE wishlists SET version = version WHERE id = OLD.wishlist_id;
+        ELSE
+            UPDATE wishlists SET version = version WHERE id = NEW.wishlist_id;
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION sync_bump_clock() RETURNS trigger AS $$
+    BEGIN
+        PERFORM sync_next_version();
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE TRIGGER group_members_changed AFTER INSERT OR DELETE ON group_members
+        FOR EACH ROW EXECUTE FUNCTION sync_bump_clock()""",
+    """CREATE OR REPLACE TRIGGER users_changed AFTER UPDATE ON users
+        FOR EACH ROW EXECUTE FUNCTION sync_bump_clock()""",
+    "DROP FUNCTION IF EXISTS sync_safe_version()",
+    "DROP FUNCTION IF EXISTS sync_current_version()",
+    "DROP INDEX IF EXISTS ix_sync_tombstones_version",
+    "ALTER TABLE sync_tombstones DROP COLUMN id",
+    "ALTER TABLE sync_tombstones ADD PRIMARY KEY (version)",
+]
+
+
+def _run(statements_by_dialect: dict) -> None:
+    for statement in statements_by_dialect.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _run({"sqlite": SQLITE_UPGRADE, "postgresql": POSTGRES_UPGRADE})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _run({"sqlite": SQLITE_DOWNGRADE, "postgresql": POSTGRES_DOWNGRADE})
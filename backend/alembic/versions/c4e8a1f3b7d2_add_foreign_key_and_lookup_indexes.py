@@ -0,0 +1,36 @@
+"""Add foreign key and lookup indexes
+
+Revision ID: c4e8a1f3b7d2
+Revises: 7d2c4b1e9f35
+Create Date: 2026-10-18 21:12:40.183927
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e8a1f3b7d2'
+down_revision: Union[str, Sequence[str], None] = '7d2c4b1e9f35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_wishlists_owner_id'), 'wishlists', ['owner_id'], unique=False)
+    # Leads with wishlist_id, so it also serves lookups on wishlist_id alone
+    op.create_index('ix_wishlist_items_wishlist_id_id', 'wishlist_items', ['wishlist_id', 'id'], unique=False)
+    op.create_index('ix_shared_with_user_id', 'shared_with', ['user_id'], unique=False)
+    op.create_index(op.f('ix_group_members_user_id'), 'group_members', ['user_id'], unique=False)
+    op.create_index(op.f('ix_groups_name'), 'groups', ['name'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_groups_name'), table_name='groups')
+    op.drop_index(op.f('ix_group_members_user_id'), table_name='group_members')
+    op.drop_index('ix_shared_with_user_id', table_name='shared_with')
+    op.drop_index('ix_wishlist_items_wishlist_id_id', table_name='wishlist_items')
+    op.drop_index(op.f('ix_wishlists_owner_id'), table_name='wishlists')
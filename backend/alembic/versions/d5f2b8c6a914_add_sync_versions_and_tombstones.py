@@ -0,0 +1,174 @@
+"""Add change versions and tombstones for incremental sync
+
+Revision ID: d5f2b8c6a914
+Revises: c4e8a1f3b7d2
+Create Date: 2026-10-18 23:05:11.402715
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5f2b8c6a914'
+down_revision: Union[str, Sequence[str], None] = 'c4e8a1f3b7d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SQLITE_UPGRADE = [
+    "INSERT OR IGNORE INTO sync_clock (id, version, pruned_version) VALUES (1, 0, 0)",
+    # AFTER UPDATE triggers skip the triggers' own version writes (WHEN ...
+    # IS old.version); "SET version = version" is how a list is bumped
+    """CREATE TRIGGER IF NOT EXISTS wishlists_version_ai AFTER INSERT ON wishlists BEGIN
+        UPDATE sync_clock SET version = version + 1 WHERE id = 1;
+        UPDATE wishlists SET version = (SELECT version FROM sync_clock WHERE id = 1) WHERE id = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS wishlists_version_au AFTER UPDATE ON wishlists
+    WHEN new.version IS old.version BEGIN
+        UPDATE sync_clock SET version = version + 1 WHERE id = 1;
+        UPDATE wishlists SET version = (SELECT version FROM sync_clock WHERE id = 1) WHERE id = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS wishlists_version_ad AFTER DELETE ON wishlists BEGIN
+        UPDATE sync_clock SET version = version + 1 WHERE id = 1;
+        INSERT INTO sync_tombstones (version, kind, entity_id, wishlist_id, user_id, deleted_at)
+        SELECT version, 'wishlist', old.id, old.id, old.owner_id, CURRENT_TIMESTAMP FROM sync_clock WHERE id = 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS wishlist_items_version_ai AFTER INSERT ON wishlist_items BEGIN
+        UPDATE sync_clock SET version = version + 1 WHERE id = 1;
+        UPDATE wishlist_items SET version = (SELECT version FROM sync_clock WHERE id = 1) WHERE id = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS wishlist_items_version_au AFTER UPDATE ON wishlist_items
+    WHEN new.version IS old.version BEGIN
+        UPDATE sync_clock SET version = version + 1 WHERE id = 1;
+        UPDATE wishlist_items SET version = (SELECT version FROM sync_clock WHERE id = 1) WHERE id = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS wishlist_items_version_ad AFTER DELETE ON wishlist_items BEGIN
+        UPDATE sync_clock SET version = version + 1 WHERE id = 1;
+        INSERT INTO sync_tombstones (version, kind, entity_id, wishlist_id, user_id, deleted_at)
+        SELECT version, 'item', old.id, old.wishlist_id, NULL, CURRENT_TIMESTAMP FROM sync_clock WHERE id = 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS shared_with_version_ai AFTER INSERT ON shared_with BEGIN
+        UPDATE sync_clock SET version = version + 1 WHERE id = 1;
+        UPDATE shared_with SET version = (SELECT version FROM sync_clock WHERE id = 1)
+        WHERE wishlist_id = new.wishlist_id AND user_id = new.user_id;
+        UPDATE wishlists SET version = version WHERE id = new.wishlist_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS shared_with_version_ad AFTER DELETE ON shared_with BEGIN
+        UPDATE sync_clock SET version = version + 1 WHERE id = 1;
+        INSERT INTO sync_tombstones (version, kind, entity_id, wishlist_id, user_id, deleted_at)
+        SELECT version, 'share', old.wishlist_id, old.wishlist_id, old.user_id, CURRENT_TIMESTAMP FROM sync_clock WHERE id = 1;
+        UPDATE wishlists SET version = version WHERE id = old.wishlist_id;
+    END""",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS shared_with_version_ad",
+    "DROP TRIGGER IF EXISTS shared_with_version_ai",
+    "DROP TRIGGER IF EXISTS wishlist_items_version_ad",
+    "DROP TRIGGER IF EXISTS wishlist_items_version_au",
+    "DROP TRIGGER IF EXISTS wishlist_items_version_ai",
+    "DROP TRIGGER IF EXISTS wishlists_version_ad",
+    "DROP TRIGGER IF EXISTS wishlists_version_au",
+    "DROP TRIGGER IF EXISTS wishlists_version_ai",
+]
+
+POSTGRES_UPGRADE = [
+    "INSERT INTO sync_clock (id, version, pruned_version) VALUES (1, 0, 0) ON CONFLICT DO NOTHING",
+    """CREATE OR REPLACE FUNCTION sync_next_version() RETURNS integer AS $$
+        UPDATE sync_clock SET version = version + 1 WHERE id = 1 RETURNING version
+    $$ LANGUAGE sql""",
+    """CREATE OR REPLACE FUNCTION sync_stamp_version() RETURNS trigger AS $$
+    BEGIN
+        NEW.version := sync_next_version();
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION sync_wishlist_deleted() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO sync_tombstones (version, kind, entity_id, wishlist_id, user_id, deleted_at)
+        VALUES (sync_next_version(), 'wishlist', OLD.id, OLD.id, OLD.owner_id, now() AT TIME ZONE 'utc');
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION sync_item_deleted() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO sync_tombstones (version, kind, entity_id, wishlist_id, user_id, deleted_at)
+        VALUES (sync_next_version(), 'item', OLD.id, OLD.wishlist_id, NULL, now() AT TIME ZONE 'utc');
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION sync_share_changed() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            INSERT INTO sync_tombstones (version, kind, entity_id, wishlist_id, user_id, deleted_at)
+            VALUES (sync_next_version(), 'share', OLD.wishlist_id, OLD.wishlist_id, OLD.user_id, now() AT TIME ZONE 'utc');
+            UPDATE wishlists SET version = version WHERE id = OLD.wishlist_id;
+        ELSE
+            UPDATE wishlists SET version = version WHERE id = NEW.wishlist_id;
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE TRIGGER wishlists_version BEFORE INSERT OR UPDATE ON wishlists
+        FOR EACH ROW EXECUTE FUNCTION sync_stamp_version()""",
+    """CREATE OR REPLACE TRIGGER wishlists_deleted AFTER DELETE ON wishlists
+        FOR EACH ROW EXECUTE FUNCTION sync_wishlist_deleted()""",
+    """CREATE OR REPLACE TRIGGER wishlist_items_version BEFORE INSERT OR UPDATE ON wishlist_items
+        FOR EACH ROW EXECUTE FUNCTION sync_stamp_version()""",
+    """CREATE OR REPLACE TRIGGER wishlist_items_deleted AFTER DELETE ON wishlist_items
+        FOR EACH ROW EXECUTE FUNCTION sync_item_deleted()""",
+    """CREATE OR REPLACE TRIGGER shared_with_version BEFORE INSERT OR UPDATE ON shared_with
+        FOR EACH ROW EXECUTE FUNCTION sync_stamp_version()""",
+    """CREATE OR REPLACE TRIGGER shared_with_changed AFTER INSERT OR DELETE ON shared_with
+        FOR EACH ROW EXECUTE FUNCTION sync_share_changed()""",
+]
+
+POSTGRES_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS shared_with_changed ON shared_with",
+    "DROP TRIGGER IF EXISTS shared_with_version ON shared_with",
+    "DROP TRIGGER IF EXISTS wishlist_items_deleted ON wishlist_items",
+    "DROP TRIGGER IF EXISTS wishlist_items_version ON wishlist_items",
+    "DROP TRIGGER IF EXISTS wishlists_deleted ON wishlists",
+    "DROP TRIGGER IF EXISTS wishlists_version ON wishlists",
+    "DROP FUNCTION IF EXISTS sync_share_changed()",
+    "DROP FUNCTION IF EXISTS sync_item_deleted()",
+    "DROP FUNCTION IF EXISTS sync_wishlist_deleted()",
+    "DROP FUNCTION IF EXISTS sync_stamp_version()",
+    "DROP FUNCTION IF EXISTS sync_next_version()",
+]
+
+
+def _run(statements_by_dialect: dict) -> None:
+    for statement in statements_by_dialect.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows start at version 0, below any token a client can hold
+    for table in ('wishlists', 'wishlist_items', 'shared_with'):
+        op.add_column(table, sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('sync_clock',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('pruned_version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('sync_tombstones',
+    sa.Column('version', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('wishlist_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.String(), nullable=True),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('version')
+    )
+    _run({"sqlite": SQLITE_UPGRADE, "postgresql": POSTGRES_UPGRADE})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _run({"sqlite": SQLITE_DOWNGRADE, "postgresql": POSTGRES_DOWNGRADE})
+    op.drop_table('sync_tombstones')
+    op.drop_table('sync_clock')
+    for table in ('shared_with', 'wishlist_items', 'wishlists'):
+        op.drop_column(table, 'version')
@@ -0,0 +1,69 @@
+"""Advance the sync clock on group membership and user changes
+
+Revision ID: e7a3c9d1f5b6
+Revises: d5f2b8c6a914
+Create Date: 2026-10-19 00:12:47.519306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a3c9d1f5b6'
+down_revision: Union[str, Sequence[str], None] = 'd5f2b8c6a914'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SQLITE_UPGRADE = [
+    """CREATE TRIGGER IF NOT EXISTS group_members_version_ai AFTER INSERT ON group_members BEGIN
+        UPDATE sync_clock SET version = version + 1 WHERE id = 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS group_members_version_ad AFTER DELETE ON group_members BEGIN
+        UPDATE sync_clock SET version = version + 1 WHERE id = 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_version_au AFTER UPDATE ON users BEGIN
+        UPDATE sync_clock SET version = version + 1 WHERE id = 1;
+    END""",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS users_version_au",
+    "DROP TRIGGER IF EXISTS group_members_version_ad",
+    "DROP TRIGGER IF EXISTS group_members_version_ai",
+]
+
+POSTGRES_UPGRADE = [
+    """CREATE OR REPLACE FUNCTION sync_bump_clock() RETURNS trigger AS $$
+    BEGIN
+        PERFORM sync_next_version();
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE TRIGGER group_members_changed AFTER INSERT OR DELETE ON group_members
+        FOR EACH ROW EXECUTE FUNCTION sync_bump_clock()""",
+    """CREATE OR REPLACE TRIGGER users_changed AFTER UPDATE ON users
+        FOR EACH ROW EXECUTE FUNCTION sync_bump_clock()""",
+]
+
+POSTGRES_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS users_changed ON users",
+    "DROP TRIGGER IF EXISTS group_members_changed ON group_members",
+    "DROP FUNCTION IF EXISTS sync_bump_clock()",
+]
+
+
+def _run(statements_by_dialect: dict) -> None:
+    for statement in statements_by_dialect.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _run({"sqlite": SQLITE_UPGRADE, "postgresql": POSTGRES_UPGRADE})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _run({"sqlite": SQLITE_DOWNGRADE, "postgresql": POSTGRES_DOWNGRADE})
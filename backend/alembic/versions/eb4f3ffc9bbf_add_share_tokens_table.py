@@ -0,0 +1,40 @@
+"""Add share_tokens table
+
+Revision ID: eb4f3ffc9bbf
+Revises: 038a17f77709
+Create Date: 2026-10-18 18:02:11.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'eb4f3ffc9bbf'
+down_revision: Union[str, Sequence[str], None] = '038a17f77709'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('share_tokens',
+    sa.Column('token', sa.String(), nullable=False),
+    sa.Column('wishlist_id', sa.Integer(), nullable=False),
+    sa.Column('owner_id', sa.String(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.uid'], ),
+    sa.ForeignKeyConstraint(['wishlist_id'], ['wishlists.id'], ),
+    sa.PrimaryKeyConstraint('token')
+    )
+    op.create_index(op.f('ix_share_tokens_token'), 'share_tokens', ['token'], unique=False)
+    op.create_index(op.f('ix_share_tokens_expires_at'), 'share_tokens', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_share_tokens_expires_at'), table_name='share_tokens')
+    op.drop_index(op.f('ix_share_tokens_token'), table_name='share_tokens')
+    op.drop_table('share_tokens')
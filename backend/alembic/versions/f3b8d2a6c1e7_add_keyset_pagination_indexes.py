@@ -0,0 +1,34 @@
+"""Index wishlist owners and shares in wishlist id order for keyset pagination
+
+Revision ID: f3b8d2a6c1e7
+Revises: e7a3c9d1f5b6
+Create Date: 2026-10-18 14:41:18.264905
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8d2a6c1e7'
+down_revision: Union[str, Sequence[str], None] = 'e7a3c9d1f5b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Each replaces an index on its leading column alone
+    op.create_index('ix_wishlists_owner_id_id', 'wishlists', ['owner_id', 'id'], unique=False)
+    op.drop_index(op.f('ix_wishlists_owner_id'), table_name='wishlists')
+    op.create_index('ix_shared_with_user_id_wishlist_id', 'shared_with', ['user_id', 'wishlist_id'], unique=False)
+    op.drop_index('ix_shared_with_user_id', table_name='shared_with')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_shared_with_user_id', 'shared_with', ['user_id'], unique=False)
+    op.drop_index('ix_shared_with_user_id_wishlist_id', table_name='shared_with')
+    op.create_index(op.f('ix_wishlists_owner_id'), 'wishlists', ['owner_id'], unique=False)
+    op.drop_index('ix_wishlists_owner_id_id', table_name='wishlists')
@@ -1,23 +1,165 @@
-import firebase_admin
-from firebase_admin import auth, credentials
 from fastapi import HTTPException, Request, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-import os
-from dotenv import load_dotenv
+from collections import OrderedDict
+import hashlib
+import hmac
+import threading
+import time
 
-load_dotenv()
-cred_path = os.environ.get('FIREBASE_CREDENTIALS')
-cred = credentials.Certificate(cred_path)
-if not firebase_admin._apps:
-    firebase_admin.initialize_app(cred)
+from .config import settings
+from .utils.logger import logger
+from .utils.metrics import record_auth
 
 security = HTTPBearer()
 
-def verify_token(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
+_firebase_auth = None
+_firebase_lock = threading.Lock()
+
+
+def get_firebase_auth():
+    """The firebase_admin.auth module, with the app initialised on first use.
+
+    firebase-admin and google-auth are a large share of a worker's import
+    time and reading the credentials touches the filesystem, so both wait
+    for the first token that is not already in token_cache.
+    """
+    global _firebase_auth
+    if _firebase_auth is None:
+        with _firebase_lock:
+            if _firebase_auth is None:
+                import firebase_admin
+                from firebase_admin import auth, credentials
+                if not firebase_admin._apps:
+                    firebase_admin.initialize_app(credentials.Certificate(settings.FIREBASE_CREDENTIALS))
+                _firebase_auth = auth
+    return _firebase_auth
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of verified Firebase ID token claims, keyed by token hash.
+
+    Entries are only served until the token's own ``exp`` claim, so a cached
+    token never outlives what ``verify_id_token`` would have accepted.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_for(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            claims = self._entries.get(key)
+            if claims is None:
+                self.misses += 1
+                return None
+            if claims.get('exp', 0) <= now:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return claims
+
+    def put(self, key: str, claims: dict):
+        if self.max_size <= 0 or 'exp' not in claims:
+            return
+        with self._lock:
+            self._entries[key] = claims
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+token_cache = VerifiedTokenCache(settings.TOKEN_CACHE_SIZE)
+
+_key_refresher_started = False
+_key_refresher_lock = threading.Lock()
+
+
+def _refresh_public_keys():
+    """Keep firebase-admin's cached signing keys warm from a background thread.
+
+    The verifier's HTTP session honours the Cache-Control max-age Google sends
+    with the certificates (several hours). Forcing a revalidation well before
+    that means the cache never goes cold on the request path.
+
+    That session is only reachable through firebase-admin internals, checked
+    against the versions pyproject.toml allows; if they move, the refresher
+    stops and verification fetches the keys itself as it always has.
+    """
+    try:
+        from firebase_admin._token_gen import ID_TOKEN_CERT_URI
+        # A google.auth transport Request over the verifier's cached session
+        fetch = get_firebase_auth()._get_client(None)._token_verifier.request
+    except (ImportError, AttributeError) as e:
+        logger.warning("[auth] Public key refresh unavailable with this firebase-admin: %s", e)
+        return
+    while True:
+        time.sleep(settings.TOKEN_KEY_REFRESH_SECONDS)
+        try:
+            fetch(ID_TOKEN_CERT_URI, headers={'Cache-Control': 'no-cache'})
+        except Exception as e:
+            logger.warning("[auth] Public key refresh failed: %s", e)
+
+
+def _ensure_key_refresher():
+    global _key_refresher_started
+    if _key_refresher_started or settings.TOKEN_KEY_REFRESH_SECONDS <= 0:
+        return
+    with _key_refresher_lock:
+        if _key_refresher_started:
+            return
+        threading.Thread(target=_refresh_public_keys, name='firebase-key-refresh', daemon=True).start()
+        _key_refresher_started = True
+
+
+async def verify_token(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
+    started = time.perf_counter()
     try:
-        decoded_token = auth.verify_id_token(token)
+        token = credentials.credentials
+        key = token_cache.key_for(token)
+        decoded_token = token_cache.get(key)
+        if decoded_token is None:
+            firebase_auth = await run_in_threadpool(get_firebase_auth)
+            _ensure_key_refresher()
+            try:
+                decoded_token = await run_in_threadpool(firebase_auth.verify_id_token, token)
+            except Exception:
+                raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+            token_cache.put(key, decoded_token)
         request.state.user = decoded_token
         return decoded_token
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+    finally:
+        record_auth(time.perf_counter() - started)
+
+
+async def verify_admin(user=Depends(verify_token)):
+    """verify_token, then a 403 unless the caller is listed in ADMIN_UIDS."""
+    if user['uid'] not in settings.ADMIN_UIDS:
+        raise HTTPException(status_code=403, detail="Not allowed")
+    return user
+
+
+async def verify_metrics_scraper(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """The METRICS_SCRAPE_TOKEN if one is configured, otherwise verify_admin."""
+    token = settings.METRICS_SCRAPE_TOKEN
+    if token and hmac.compare_digest(credentials.credentials.encode(), token.encode()):
+        return None
+    return await verify_admin(await verify_token(request, credentials))
@@ -1,24 +1,126 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import field_validator
-from dotenv import load_dotenv
-import os
-
-# Load environment variables from .env file FIRST
-load_dotenv()
 
 
 class Settings(BaseSettings):
     API_PREFIX: str = "/api"
     DEBUG: bool = False
 
-    # DATABASE_URL: str
+    # Sync SQLAlchemy URL; defaults to the SQLite file in app/db when empty.
+    # The async URL is derived from it (aiosqlite / asyncpg) unless set explicitly.
+    DATABASE_URL: str = ""
+    ASYNC_DATABASE_URL: str = ""
+
+    # Connection pool per engine, Postgres only (see app/db/database.py)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+
+    # SQLite pragmas applied to every new connection
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE_BYTES: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024
+
+    # Logging (see app/utils/logger.py): LOG_FORMAT is "json" or "text"; the
+    # file defaults to app/wishful_backend.log and rotates at LOG_MAX_BYTES
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"
+    LOG_FILE: str = ""
+    LOG_MAX_BYTES: int = 10 * 1024 * 1024
+    LOG_BACKUP_COUNT: int = 5
+    LOG_QUEUE_SIZE: int = 10000
+
     ALLOWED_ORIGINS: str = ""
     WEBSITE_URL: str
 
+    # Firebase service account JSON, loaded on first token verification (see app/auth.py)
+    FIREBASE_CREDENTIALS: str = ""
+
+    # Firebase uids, comma-separated, allowed on the operational stats
+    # endpoints (see auth.verify_admin); empty keeps them closed to everyone
+    ADMIN_UIDS: str = ""
+
+    # Verified ID token cache (see app/auth.py)
+    TOKEN_CACHE_SIZE: int = 10000
+    TOKEN_KEY_REFRESH_SECONDS: int = 3600
+
+    # Per-user GET /wishlists cache (see app/utils/home_view_cache.py); the TTL
+    # bounds how stale a view can be after a write handled by another worker
+    HOME_VIEW_CACHE_SIZE: int = 10000
+    HOME_VIEW_CACHE_TTL_SECONDS: float = 30.0
+
+    # Wishlist share invites (see crud.create_share_token)
+    SHARE_TOKEN_TTL_HOURS: int = 24 * 14
+    SHARE_TOKEN_CACHE_SECONDS: int = 60
+    SHARE_TOKEN_SWEEP_SECONDS: int = 3600
+
+    # SMTP server, read when a connection is opened (see app/utils/email_utils.py);
+    # set SMTP_USE_TLS=false for a local debugging server without STARTTLS
+    SMTP_SERVER: str = ""
+    SMTP_PORT: int = 587
+    SMTP_USERNAME: str = ""
+    SMTP_PASSWORD: str = ""
+    SMTP_USE_TLS: bool = True
+    FROM_EMAIL: str = ""
+    TEST_EMAIL: str = ""
+
+    # List endpoints page with ?limit= and ?cursor= (see app/utils/pagination.py)
+    PAGE_SIZE_DEFAULT: int = 100
+    PAGE_SIZE_MAX: int = 500
+    SEARCH_LIMIT_MAX: int = 50
+
+    # Browser cache lifetime of GET /wishlist-tags, which only changes on deploy
+    WISHLIST_TAGS_MAX_AGE_SECONDS: int = 86400
+
+    # Live wishlist events (see app/utils/event_hub.py): "memory" reaches
+    # streams held by this process only; use "postgres" with several workers
+    EVENT_HUB_BACKEND: str = "memory"
+    EVENT_HUB_RECONNECT_SECONDS: float = 5.0
+    EVENT_STREAM_QUEUE_SIZE: int = 100
+    EVENT_STREAM_KEEPALIVE_SECONDS: float = 15.0
+
+    # Request and SQL metrics on /metrics (see app/utils/metrics.py)
+    METRICS_ENABLED: bool = True
+    # Bearer token a Prometheus scraper can send to /metrics; without one,
+    # /metrics takes a Firebase token of a user in ADMIN_UIDS
+    METRICS_SCRAPE_TOKEN: str = ""
+    SLOW_QUERY_MS: float = 100.0
+    SLOW_QUERY_SAMPLES: int = 50
+
+    # GET /sync deletion history; tokens older than this get a full snapshot
+    SYNC_TOMBSTONE_RETENTION_DAYS: int = 30
+    SYNC_TOMBSTONE_SWEEP_SECONDS: int = 3600
+
+    # SMTP connections of the outbox worker (see app/utils/mail_dispatcher.py)
+    MAIL_BATCH_SIZE: int = 50
+    MAIL_MAX_RETRIES: int = 3
+    MAIL_IDLE_TIMEOUT_SECONDS: float = 30.0
+
+    # Email outbox worker (see app/outbox_worker.py)
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_CONCURRENCY: int = 4
+    OUTBOX_POLL_SECONDS: float = 2.0
+    OUTBOX_LEASE_SECONDS: int = 300
+    OUTBOX_MAX_ATTEMPTS: int = 5
+    OUTBOX_RETRY_BASE_SECONDS: int = 60
+
+    # Recommendation model (see app/recommender.py); the model directory
+    # defaults to app/db/recommender when empty
+    RECOMMENDER_MODEL_DIR: str = ""
+    RECOMMENDER_NEIGHBOURS: int = 50
+    RECOMMENDER_TOP_K: int = 10
+    RECOMMENDER_RELOAD_SECONDS: int = 300
+
     @field_validator("ALLOWED_ORIGINS")
     def validate_allowed_origins(cls, v: str) -> list[str]:
         return [origin.strip() for origin in v.split(",")] if v else []
 
+    @field_validator("ADMIN_UIDS")
+    def validate_admin_uids(cls, v: str) -> list[str]:
+        return [uid.strip() for uid in v.split(",") if uid.strip()]
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -27,4 +129,6 @@ class Settings(BaseSettings):
     )
 
 
+# Read once per process (environment and .env); import this rather than
+# reading os.environ elsewhere
 settings = Settings()
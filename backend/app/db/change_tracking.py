@@ -0,0 +1,146 @@
+"""Change versions behind GET /sync.
+
+Every insert or update of a wishlist, item or share row stamps the row's
+``version``, and every delete leaves a row in sync_tombstones at its own
+version. A client that has seen everything up to version N asks for rows
+above N. Versions are stamped by triggers, so bulk and conditional
+statements are covered as well as ORM flushes. Sharing or unsharing a
+list also bumps the list, whose payload carries ``shared_with``.
+
+On SQLite the version is the next value of a single counter (sync_clock).
+SQLite runs one writer at a time anyway, so versions commit in order and
+the counter is also the sync token and the data version behind the ETags
+of the read endpoints; group membership changes and user edits advance it
+for the latter.
+
+On Postgres a counter row would be locked by every writer until commit.
+Instead the version is the writing transaction's id (plus sync_clock's
+frozen ``version``, so versions continue above those handed out by the
+counter before). Ids are taken without a lock but commit out of order, so
+GET /sync only promises everything up to the oldest transaction still in
+flight (sync_safe_version); a row above that can be sent twice, never
+missed. The data version is the database snapshot, which changes whenever
+a transaction commits.
+
+Created alongside the tables by ``Base.metadata.create_all`` (see
+models.py) and by the alembic revisions that introduced them.
+"""
+from sqlalchemy import text
+
+
+SQLITE_DDL = [
+    "INSERT OR IGNORE INTO sync_clock (id, version, pruned_version) VALUES (1, 0, 0)",
+    # AFTER UPDATE triggers skip the triggers' own version writes (WHEN ...
+    # IS old.version); "SET version = version" is how a list is bumped
+    """CREATE TRIGGER IF NOT EXISTS wishlists_version_ai AFTER INSERT ON wishlists BEGIN
+        UPDATE sync_clock SET version = version + 1 WHERE id = 1;
+        UPDATE wishlists SET version = (SELECT version FROM sync_clock WHERE id = 1) WHERE id = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS wishlists_version_au AFTER UPDATE ON wishlists
+    WHEN new.version IS old.version BEGIN
+        UPDATE sync_clock SET version = version + 1 WHERE id = 1;
+        UPDATE wishlists SET version = (SELECT version FROM sync_clock WHERE id = 1) WHERE id = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS wishlists_version_ad AFTER DELETE ON wishlists BEGIN
+        UPDATE sync_clock SET version = version + 1 WHERE id = 1;
+        INSERT INTO sync_tombstones (version, kind, entity_id, wishlist_id, user_id, deleted_at)
+        SELECT version, 'wishlist', old.id, old.id, old.owner_id, CURRENT_TIMESTAMP FROM sync_clock WHERE id = 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS wishlist_items_version_ai AFTER INSERT ON wishlist_items BEGIN
+        UPDATE sync_clock SET version = version + 1 WHERE id = 1;
+        UPDATE wishlist_items SET version = (SELECT version FROM sync_clock WHERE id = 1) WHERE id = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS wishlist_items_version_au AFTER UPDATE ON wishlist_items
+    WHEN new.version IS old.version BEGIN
+        UPDATE sync_clock SET version = version + 1 WHERE id = 1;
+        UPDATE wishlist_items SET version = (SELECT version FROM sync_clock WHERE id = 1) WHERE id = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS wishlist_items_version_ad AFTER DELETE ON wishlist_items BEGIN
+        UPDATE sync_clock SET version = version + 1 WHERE id = 1;
+        INSERT INTO sync_tombstones (version, kind, entity_id, wishlist_id, user_id, deleted_at)
+        SELECT version, 'item', old.id, old.wishlist_id, NULL, CURRENT_TIMESTAMP FROM sync_clock WHERE id = 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS shared_with_version_ai AFTER INSERT ON shared_with BEGIN
+        UPDATE sync_clock SET version = version + 1 WHERE id = 1;
+        UPDATE shared_with SET version = (SELECT version FROM sync_clock WHERE id = 1)
+        WHERE wishlist_id = new.wishlist_id AND user_id = new.user_id;
+        UPDATE wishlists SET version = version WHERE id = new.wishlist_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS shared_with_version_ad AFTER DELETE ON shared_with BEGIN
+        UPDATE sync_clock SET version = version + 1 WHERE id = 1;
+        INSERT INTO sync_tombstones (version, kind, entity_id, wishlist_id, user_id, deleted_at)
+        SELECT version, 'share', old.wishlist_id, old.wishlist_id, old.user_id, CURRENT_TIMESTAMP FROM sync_clock WHERE id = 1;
+        UPDATE wishlists SET version = version WHERE id = old.wishlist_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS group_members_version_ai AFTER INSERT ON group_members BEGIN
+        UPDATE sync_clock SET version = version + 1 WHERE id = 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS group_members_version_ad AFTER DELETE ON group_members BEGIN
+        UPDATE sync_clock SET version = version + 1 WHERE id = 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_version_au AFTER UPDATE ON users BEGIN
+        UPDATE sync_clock SET version = version + 1 WHERE id = 1;
+    END""",
+]
+
+POSTGRES_DDL = [
+    "INSERT INTO sync_clock (id, version, pruned_version) VALUES (1, 0, 0) ON CONFLICT DO NOTHING",
+    """CREATE OR REPLACE FUNCTION sync_current_version() RETURNS bigint AS $$
+        SELECT pg_current_xact_id()::text::bigint + version FROM sync_clock WHERE id = 1
+    $$ LANGUAGE sql STABLE""",
+    # Every version at or below this belongs to a finished transaction
+    """CREATE OR REPLACE FUNCTION sync_safe_version() RETURNS bigint AS $$
+        SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint - 1 + version FROM sync_clock WHERE id = 1
+    $$ LANGUAGE sql STABLE""",
+    """CREATE OR REPLACE FUNCTION sync_stamp_version() RETURNS trigger AS $$
+    BEGIN
+        NEW.version := sync_current_version();
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION sync_wishlist_deleted() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO sync_tombstones (version, kind, entity_id, wishlist_id, user_id, deleted_at)
+        VALUES (sync_current_version(), 'wishlist', OLD.id, OLD.id, OLD.owner_id, now() AT TIME ZONE 'utc');
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION sync_item_deleted() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO sync_tombstones (version, kind, entity_id, wishlist_id, user_id, deleted_at)
+        VALUES (sync_current_version(), 'item', OLD.id, OLD.wishlist_id, NULL, now() AT TIME ZONE 'utc');
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION sync_share_changed() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            INSERT INTO sync_tombstones (version, kind, entity_id, wishlist_id, user_id, deleted_at)
+            VALUES (sync_current_version(), 'share', OLD.wishlist_id, OLD.wishlist_id, OLD.user_id, now() AT TIME ZONE 'utc');
+            UPDATE wishlists SET version = version WHERE id = OLD.wishlist_id;
+        ELSE
+            UPDATE wishlists SET version = version WHERE id = NEW.wishlist_id;
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE TRIGGER wishlists_version BEFORE INSERT OR UPDATE ON wishlists
+        FOR EACH ROW EXECUTE FUNCTION sync_stamp_version()""",
+    """CREATE OR REPLACE TRIGGER wishlists_deleted AFTER DELETE ON wishlists
+        FOR EACH ROW EXECUTE FUNCTION sync_wishlist_deleted()""",
+    """CREATE OR REPLACE TRIGGER wishlist_items_version BEFORE INSERT OR UPDATE ON wishlist_items
+        FOR EACH ROW EXECUTE FUNCTION sync_stamp_version()""",
+    """CREATE OR REPLACE TRIGGER wishlist_items_deleted AFTER DELETE ON wishlist_items
+        FOR EACH ROW EXECUTE FUNCTION sync_item_deleted()""",
+    """CREATE OR REPLACE TRIGGER shared_with_version BEFORE INSERT OR UPDATE ON shared_with
+        FOR EACH ROW EXECUTE FUNCTION sync_stamp_version()""",
+    """CREATE OR REPLACE TRIGGER shared_with_changed AFTER INSERT OR DELETE ON shared_with
+        FOR EACH ROW EXECUTE FUNCTION sync_share_changed()""",
+]
+
+DDL_BY_DIALECT = {
+    "sqlite": SQLITE_DDL,
+    "postgresql": POSTGRES_DDL,
+}
+
+
+def create_change_tracking(target, connection, **kw):
+    """metadata ``after_create`` hook; a no-op on other backends."""
+    for statement in DDL_BY_DIALECT.get(connection.dialect.name, []):
+        connection.execute(text(statement))
@@ -1,13 +1,36 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from .models import UserDB, WishListDB, WishItemDB
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+import secrets
+import time
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Integer, String, and_, case, delete, func, insert, literal_column, or_, select, text, tuple_, union, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import selectinload
+from .models import (
+    EmailOutboxDB, GroupDB, GroupMemberDB, ShareTokenDB, SyncClockDB, SyncTombstoneDB, UserDB, WishListDB, WishItemDB,
+    wishlist_shared_with,
+)
+from .search_index import fts_prefix_query
 from ..models import WishListRequest, WishItemRequest, UserRequest
+from ..config import settings
+from ..utils.home_view_cache import home_view_cache
+from ..utils.event_hub import event_hub
 
 
-def get_user_by_uid(db: Session, uid: str):
-    return db.query(UserDB).filter(UserDB.uid == uid).first()
+async def get_user_by_uid(db: AsyncSession, uid: str):
+    return await db.scalar(select(UserDB).where(UserDB.uid == uid))
 
-def create_user(db: Session, user: UserRequest) -> UserDB:
+async def get_user_by_email(db: AsyncSession, email: str):
+    return await db.scalar(select(UserDB).where(UserDB.email == email))
+
+async def get_users_by_emails(db: AsyncSession, emails: list[str]) -> dict[str, str]:
+    """Map each registered email in emails to its user's uid, in one query."""
+    if not emails:
+        return {}
+    rows = await db.execute(select(UserDB.email, UserDB.uid).where(UserDB.email.in_(emails)))
+    return dict(rows.all())
+
+async def create_user(db: AsyncSession, user: UserRequest) -> UserDB:
     user_db = UserDB(
         uid=user.uid,
         first_name=user.first_name,
@@ -15,47 +38,228 @@ def create_user(db: Session, user: UserRequest) -> UserDB:
         email=user.email
     )
     db.add(user_db)
-    db.commit()
-    db.refresh(user_db)
+    await db.commit()
+    await db.refresh(user_db)
     return user_db
 
-def get_wishlist_by_id(db: Session, wishlist_id: int) -> WishListDB:
-    return db.query(WishListDB).filter(WishListDB.id == wishlist_id).first()
+async def get_wishlist_by_id(db: AsyncSession, wishlist_id: int) -> WishListDB:
+    return await db.scalar(select(WishListDB).where(WishListDB.id == wishlist_id))
+
+def _shared_wishlist_ids(user_id: str):
+    # An IN over ix_shared_with_user_id_wishlist_id; EXISTS (relationship
+    # .any()) is correlated per wishlist and made an OR with it scan the
+    # whole table
+    return select(wishlist_shared_with.c.wishlist_id).where(wishlist_shared_with.c.user_id == user_id)
+
+def _page(rows: list, limit: int | None, key) -> tuple[list, tuple | None]:
+    """Split the limit + 1 rows read for a page into the page and the key to resume after.
+
+    The key is None on the last page (and without a limit).
+    """
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, key(rows[-1])
 
-def get_wishlists_for_user(db: Session, user_id: str) -> list[WishListDB]:
-    return db.query(WishListDB).filter(
-        or_(WishListDB.owner_id == user_id, WishListDB.shared_with.any(UserDB.uid == user_id))
-    ).all()
+async def get_wishlists_for_user(
+    db: AsyncSession,
+    user_id: str,
+    include_items: bool = False,
+    after: tuple | None = None,
+    limit: int | None = None,
+) -> tuple[list[WishListDB], tuple | None]:
+    """Owned and shared wishlists in id order, with owner_user and shared_with preloaded.
 
-def create_wishlist(db: Session, wishlist_db: WishListDB) -> WishListDB:
+    Returns up to limit lists after the key ``(id,)`` (all of them without a
+    limit) and the key the next page starts after. Owned and shared ids are
+    each read in id order from their own index and cut at the page size
+    before they are merged, so a page costs the same however many lists the
+    user has. One query for the lists plus one IN query per relationship:
+    three statements, four with items.
+    """
+    owned = select(WishListDB.id).where(WishListDB.owner_id == user_id)
+    shared = _shared_wishlist_ids(user_id)
+    statement = select(WishListDB).order_by(WishListDB.id)
+    if after is not None:
+        owned = owned.where(WishListDB.id > after[0])
+        shared = shared.where(wishlist_shared_with.c.wishlist_id > after[0])
+    if limit is not None:
+        owned = owned.order_by(WishListDB.id).limit(limit + 1)
+        shared = shared.order_by(wishlist_shared_with.c.wishlist_id).limit(limit + 1)
+        statement = statement.limit(limit + 1)
+    visible = union(select(owned.subquery()), select(shared.subquery())).subquery()
+    options = [selectinload(WishListDB.owner_user), selectinload(WishListDB.shared_with)]
+    if include_items:
+        options.append(selectinload(WishListDB.items))
+    result = await db.scalars(statement.where(WishListDB.id.in_(select(visible))).options(*options))
+    return _page(list(result.all()), limit, lambda wishlist: (wishlist.id,))
+
+async def create_wishlist(db: AsyncSession, wishlist_db: WishListDB) -> WishListDB:
     db.add(wishlist_db)
-    db.commit()
-    db.refresh(wishlist_db)
+    await db.commit()
+    await db.refresh(wishlist_db)
     return wishlist_db
 
-def get_items_for_wishlist(db: Session, wishlist_id: int) -> list[WishItemDB]:
-    return db.query(WishItemDB).filter(WishItemDB.wishlist_id == wishlist_id).all()
+async def get_items_for_wishlist(
+    db: AsyncSession, wishlist_id: int, after: tuple | None = None, limit: int | None = None,
+) -> tuple[list[WishItemDB], tuple | None]:
+    """Items in id order after the key ``(id,)``, read from ix_wishlist_items_wishlist_id_id, and the next key."""
+    statement = select(WishItemDB).where(WishItemDB.wishlist_id == wishlist_id).order_by(WishItemDB.id)
+    if after is not None:
+        statement = statement.where(WishItemDB.id > after[0])
+    if limit is not None:
+        statement = statement.limit(limit + 1)
+    result = await db.scalars(statement)
+    return _page(list(result.all()), limit, lambda item: (item.id,))
+
+async def get_group_members(
+    db: AsyncSession, group_id: int, after: tuple | None = None, limit: int | None = None,
+) -> tuple[list[UserDB], tuple | None]:
+    """Members in uid order after the key ``(uid,)``, read along the primary key, and the next key."""
+    statement = (
+        select(UserDB)
+        .join(GroupMemberDB, GroupMemberDB.user_id == UserDB.uid)
+        .where(GroupMemberDB.group_id == group_id)
+        .order_by(GroupMemberDB.user_id)
+    )
+    if after is not None:
+        statement = statement.where(GroupMemberDB.user_id > after[0])
+    if limit is not None:
+        statement = statement.limit(limit + 1)
+    result = await db.scalars(statement)
+    return _page(list(result.all()), limit, lambda user: (user.uid,))
+
+async def get_item_in_wishlist(db: AsyncSession, wishlist_id: int, item_id: int) -> WishItemDB:
+    return await db.scalar(
+        select(WishItemDB).where(WishItemDB.id == item_id, WishItemDB.wishlist_id == wishlist_id)
+    )
+
+async def get_item_ids_in_wishlist(db: AsyncSession, wishlist_id: int, item_ids: list[int]) -> set[int]:
+    """Which of item_ids belong to wishlist_id, in one query."""
+    if not item_ids:
+        return set()
+    result = await db.scalars(
+        select(WishItemDB.id).where(WishItemDB.wishlist_id == wishlist_id, WishItemDB.id.in_(item_ids))
+    )
+    return set(result)
+
+async def apply_item_batch(
+    db: AsyncSession,
+    wishlist_id: int,
+    creates: list[dict],
+    updates: list[dict],
+    deletes: list[int],
+) -> list[int]:
+    """Create, update and delete items of one wishlist in a single transaction.
+
+    creates are column dicts, updates are column dicts keyed by "id" and
+    deletes are item ids; the caller checks the ids belong to wishlist_id.
+    Each kind is one statement however many items it covers. Returns the
+    ids of the created items in the order given.
+    """
+    if deletes:
+        await db.execute(
+            delete(WishItemDB)
+            .where(WishItemDB.wishlist_id == wishlist_id, WishItemDB.id.in_(deletes))
+            .execution_options(synchronize_session=False)
+        )
+    if updates:
+        # ORM bulk UPDATE by primary key, batched per set of changed columns
+        await db.execute(update(WishItemDB), updates)
+    created_ids = []
+    if creates:
+        # One multi-row INSERT; ids are handed out in VALUES order, so sorting
+        # them restores the input order (sort_by_parameter_order would send
+        # one INSERT per row, as the table has no sentinel column)
+        created_ids = sorted(await db.scalars(
+            insert(WishItemDB).returning(WishItemDB.id),
+            [{**item, "wishlist_id": wishlist_id} for item in creates],
+        ))
+    await db.commit()
+    home_view_cache.invalidate_wishlist(wishlist_id)
+    return created_ids
+
+async def get_item_names_for_owner(db: AsyncSession, user_id: str) -> list[str]:
+    """Names of the items on every wishlist user_id owns."""
+    result = await db.scalars(
+        select(WishItemDB.name)
+        .join(WishListDB, WishListDB.id == WishItemDB.wishlist_id)
+        .where(WishListDB.owner_id == user_id, WishItemDB.name.isnot(None))
+    )
+    return list(result)
+
+async def get_reserver_names(db: AsyncSession, items: list[WishItemDB]) -> dict[str, str]:
+    """Map each reserved_by uid in items to a display name, in one query."""
+    reserved_by_ids = set(item.reserved_by for item in items if item.reserved_by)
+    if not reserved_by_ids:
+        return {}
+    users = await db.scalars(select(UserDB).where(UserDB.uid.in_(reserved_by_ids)))
+    return {user.uid: f"{user.first_name} {user.last_name}".capitalize() for user in users}
 
-def add_item_to_wishlist(db: Session, item_db: WishItemDB) -> WishItemDB:
+async def add_item_to_wishlist(db: AsyncSession, item_db: WishItemDB) -> WishItemDB:
     db.add(item_db)
-    db.commit()
-    db.refresh(item_db)
+    await db.commit()
+    home_view_cache.invalidate_wishlist(item_db.wishlist_id)
+    await db.refresh(item_db)
     return item_db
 
-def share_wishlist_with_user(db: Session, wishlist_id: int, user_id: str):
-    wishlist = db.query(WishListDB).filter(WishListDB.id == wishlist_id).first()
-    user = db.query(UserDB).filter(UserDB.uid == user_id).first()
-    if wishlist and user and user not in wishlist.shared_with:
-        wishlist.shared_with.append(user)
-        db.commit()
+async def toggle_item_reservation(db: AsyncSession, wishlist_id: int, item_id: int, user_id: str) -> bool | None:
+    """Reserve an item for user_id, or release it if they hold it, in one UPDATE.
+
+    The conditions are part of the write, so the database checks them
+    against the row being changed: of several users racing for a free item,
+    the first UPDATE takes it and the others match nothing. Only users the
+    wishlist is shared with can reserve, and never its owner. Returns the
+    new reserved state, or None when no row matched.
+    """
+    held = and_(WishItemDB.reserved.is_(True), WishItemDB.reserved_by == user_id)
+    free = or_(WishItemDB.reserved.is_(False), WishItemDB.reserved.is_(None))
+    not_owner = select(WishListDB.id).where(WishListDB.id == wishlist_id, WishListDB.owner_id != user_id).exists()
+    shared = (
+        select(wishlist_shared_with.c.wishlist_id)
+        .where(wishlist_shared_with.c.wishlist_id == wishlist_id, wishlist_shared_with.c.user_id == user_id)
+        .exists()
+    )
+    reserved = await db.scalar(
+        update(WishItemDB)
+        .where(WishItemDB.id == item_id, WishItemDB.wishlist_id == wishlist_id, or_(free, held), not_owner, shared)
+        .values(
+            reserved=case((held, False), else_=True),
+            reserved_by=case((held, None), else_=user_id),
+        )
+        .returning(WishItemDB.reserved)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return reserved
+
+async def share_wishlist_with_user(db: AsyncSession, wishlist_id: int, user_id: str):
+    wishlist = await get_wishlist_by_id(db, wishlist_id)
+    user = await get_user_by_uid(db, user_id)
+    if wishlist and user:
+        shared_with = await wishlist.awaitable_attrs.shared_with
+        if user not in shared_with:
+            shared_with.append(user)
+            await db.commit()
+            home_view_cache.invalidate_wishlist(wishlist_id, [user.uid])
+            await event_hub.publish(wishlist_id, "wishlist_shared", user_id=user.uid)
     return wishlist
 
-def get_shared_wishlists_for_user(db: Session, user_id: str):
-    user = db.query(UserDB).filter(UserDB.uid == user_id).first()
+async def get_shared_wishlists_for_user(db: AsyncSession, user_id: str):
+    user = await get_user_by_uid(db, user_id)
     if not user:
         return []
+    db_wishlists = await db.scalars(
+        select(WishListDB)
+        .where(WishListDB.id.in_(_shared_wishlist_ids(user_id)))
+        .options(
+            selectinload(WishListDB.items),
+            selectinload(WishListDB.owner_user),
+            selectinload(WishListDB.shared_with),
+        )
+    )
     result = []
-    for db_wishlist in user.shared_wishlists:
+    for db_wishlist in db_wishlists:
         items = [WishItemRequest(
             id=item.id,
             name=item.name,
@@ -76,18 +280,402 @@ def get_shared_wishlists_for_user(db: Session, user_id: str):
         ))
     return result
 
-def get_shared_user_emails_for_wishlist(db: Session, wishlist_id: int) -> list[str]:
-    wishlist = db.query(WishListDB).filter(WishListDB.id == wishlist_id).first()
+async def is_shared_with(db: AsyncSession, wishlist_id: int, user_id: str) -> bool:
+    """A primary key lookup on shared_with, without loading the list's shares."""
+    return await db.scalar(
+        select(wishlist_shared_with.c.wishlist_id)
+        .where(wishlist_shared_with.c.wishlist_id == wishlist_id, wishlist_shared_with.c.user_id == user_id)
+    ) is not None
+
+
+async def get_shared_user_emails_for_wishlist(db: AsyncSession, wishlist_id: int) -> list[str]:
+    wishlist = await get_wishlist_by_id(db, wishlist_id)
     if not wishlist:
         return []
-    return [user.email for user in wishlist.shared_with]
+    return [user.email for user in await wishlist.awaitable_attrs.shared_with]
 
 
-def unshare_wishlist_with_user(db: Session, wishlist_id: int, email: str):
-    wishlist = db.query(WishListDB).filter(WishListDB.id == wishlist_id).first()
-    user = db.query(UserDB).filter(UserDB.email == email).first()
-    if wishlist and user and user in wishlist.shared_with:
-        wishlist.shared_with.remove(user)
-        db.commit()
+async def unshare_wishlist_with_user(db: AsyncSession, wishlist_id: int, email: str):
+    wishlist = await get_wishlist_by_id(db, wishlist_id)
+    user = await get_user_by_email(db, email)
+    if wishlist and user:
+        shared_with = await wishlist.awaitable_attrs.shared_with
+        if user in shared_with:
+            shared_with.remove(user)
+            await db.commit()
+            home_view_cache.invalidate_wishlist(wishlist_id, [user.uid])
+            await event_hub.publish(wishlist_id, "wishlist_unshared", user_id=user.uid)
     return wishlist
 
+
+# Share tokens are persisted in share_tokens so they survive restarts and are
+# visible to every worker. Valid lookups are cached in-process for a short
+# while; a token accepted on another worker can therefore still resolve here
+# until SHARE_TOKEN_CACHE_SECONDS passes, which only repeats an idempotent share.
+_share_token_cache: OrderedDict[str, tuple[int, str, float]] = OrderedDict()
+SHARE_TOKEN_CACHE_SIZE = 1024
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _cache_share_token(token: str, wishlist_id: int, owner_id: str, expires_at: datetime):
+    expires_ts = expires_at.replace(tzinfo=timezone.utc).timestamp()
+    cache_until = min(expires_ts, time.time() + settings.SHARE_TOKEN_CACHE_SECONDS)
+    _share_token_cache[token] = (wishlist_id, owner_id, cache_until)
+    _share_token_cache.move_to_end(token)
+    while len(_share_token_cache) > SHARE_TOKEN_CACHE_SIZE:
+        _share_token_cache.popitem(last=False)
+
+
+async def create_share_token(db: AsyncSession, wishlist_id: int, owner_id: str) -> str:
+    """Add a new share token to the session; the caller commits it."""
+    token = secrets.token_urlsafe(16)
+    expires_at = _utcnow() + timedelta(hours=settings.SHARE_TOKEN_TTL_HOURS)
+    db.add(ShareTokenDB(token=token, wishlist_id=wishlist_id, owner_id=owner_id, expires_at=expires_at))
+    return token
+
+
+async def get_share_token(db: AsyncSession, token: str) -> tuple[int, str] | None:
+    """Return (wishlist_id, owner_id) for a live token, or None."""
+    cached = _share_token_cache.get(token)
+    if cached:
+        wishlist_id, owner_id, cache_until = cached
+        if cache_until > time.time():
+            return wishlist_id, owner_id
+        _share_token_cache.pop(token, None)
+    entry = await db.scalar(
+        select(ShareTokenDB).where(ShareTokenDB.token == token, ShareTokenDB.expires_at > _utcnow())
+    )
+    if not entry:
+        return None
+    _cache_share_token(token, entry.wishlist_id, entry.owner_id, entry.expires_at)
+    return entry.wishlist_id, entry.owner_id
+
+
+async def delete_share_token(db: AsyncSession, token: str):
+    _share_token_cache.pop(token, None)
+    await db.execute(delete(ShareTokenDB).where(ShareTokenDB.token == token))
+    await db.commit()
+
+
+async def delete_expired_share_tokens(db: AsyncSession, batch_size: int = 500) -> int:
+    """Delete expired share tokens in batches, committing after each one."""
+    now = _utcnow()
+    deleted = 0
+    while True:
+        batch = select(ShareTokenDB.token).where(ShareTokenDB.expires_at <= now).limit(batch_size)
+        result = await db.execute(delete(ShareTokenDB).where(ShareTokenDB.token.in_(batch)))
+        await db.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+
+
+# Incremental sync: rows carry the version of their last change and deletes
+# leave tombstones (see change_tracking.py).
+
+async def get_data_version(db: AsyncSession) -> int | str:
+    """Moves on every change to anything the read endpoints return.
+
+    The sync clock on SQLite; on Postgres the current snapshot, which
+    changes whenever a transaction commits (see change_tracking.py).
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return await db.scalar(select(func.pg_current_snapshot().cast(String)))
+    return await db.scalar(select(SyncClockDB.version).where(SyncClockDB.id == 1))
+
+
+async def get_changes_for_user(db: AsyncSession, user_id: str, since: int) -> dict:
+    """What changed for user_id after version since, for GET /sync.
+
+    Returns the new token (the last version settled when the read started:
+    the clock on SQLite, sync_safe_version() on Postgres), the wishlists
+    and items changed since then among those the user can see, and the ids
+    of items and wishlists removed from their view. Lists that became
+    visible (shared with them) come with all their items. A token of 0,
+    from before the last tombstone prune, or from another database yields
+    a full snapshot with reset=True.
+    """
+    # Read the token first: anything committed after this is above it, so a
+    # change can be reported twice but never missed
+    clock = SyncClockDB.version
+    if db.get_bind().dialect.name == "postgresql":
+        clock = func.sync_safe_version()
+    token, pruned_version = (await db.execute(
+        select(clock, SyncClockDB.pruned_version).where(SyncClockDB.id == 1)
+    )).one()
+    reset = since <= 0 or since < pruned_version or since > token
+    if reset:
+        since = -1
+    visible = set(await db.scalars(
+        select(WishListDB.id).where(or_(WishListDB.owner_id == user_id, WishListDB.id.in_(_shared_wishlist_ids(user_id))))
+    ))
+    newly_shared = set(await db.scalars(
+        select(wishlist_shared_with.c.wishlist_id)
+        .where(wishlist_shared_with.c.user_id == user_id, wishlist_shared_with.c.version > since)
+    ))
+    wishlists = list(await db.scalars(
+        select(WishListDB)
+        .where(WishListDB.id.in_(visible), WishListDB.version > since)
+        .options(selectinload(WishListDB.owner_user), selectinload(WishListDB.shared_with))
+    ))
+    items = list(await db.scalars(
+        select(WishItemDB)
+        .where(WishItemDB.wishlist_id.in_(visible), or_(WishItemDB.version > since, WishItemDB.wishlist_id.in_(newly_shared)))
+    ))
+    deleted_items, deleted_wishlists = [], set()
+    if not reset:
+        tombstones = await db.scalars(
+            select(SyncTombstoneDB).where(
+                SyncTombstoneDB.version > since,
+                or_(
+                    and_(SyncTombstoneDB.kind == 'item', SyncTombstoneDB.wishlist_id.in_(visible)),
+                    and_(SyncTombstoneDB.kind.in_(('wishlist', 'share')), SyncTombstoneDB.user_id == user_id),
+                ),
+            )
+        )
+        for tombstone in tombstones:
+            if tombstone.kind == 'item':
+                deleted_items.append(tombstone.entity_id)
+            elif tombstone.wishlist_id not in visible:
+                deleted_wishlists.add(tombstone.wishlist_id)
+    return {
+        "token": token,
+        "reset": reset,
+        "wishlists": wishlists,
+        "items": items,
+        "deleted_wishlists": sorted(deleted_wishlists),
+        "deleted_items": deleted_items,
+    }
+
+
+async def prune_sync_tombstones(db: AsyncSession, retention_days: int) -> int:
+    """Drop tombstones older than retention_days; older tokens then get a full resync."""
+    cutoff = _utcnow() - timedelta(days=retention_days)
+    horizon = await db.scalar(select(func.max(SyncTombstoneDB.version)).where(SyncTombstoneDB.deleted_at < cutoff))
+    if horizon is None:
+        return 0
+    result = await db.execute(delete(SyncTombstoneDB).where(SyncTombstoneDB.version <= horizon))
+    await db.execute(update(SyncClockDB).where(SyncClockDB.id == 1).values(pruned_version=horizon))
+    await db.commit()
+    return result.rowcount
+
+
+# Email outbox: rows are written in the same transaction as the change that
+# triggers the email and delivered by app/outbox_worker.py.
+
+async def enqueue_email(
+    db: AsyncSession,
+    idempotency_key: str,
+    to_email: str,
+    subject: str,
+    body: str,
+    is_html: bool = True,
+    text_body: str = None,
+):
+    """Add an email to the outbox without committing; duplicate keys are ignored."""
+    await enqueue_emails(db, [{
+        "idempotency_key": idempotency_key,
+        "to_email": to_email,
+        "subject": subject,
+        "body": body,
+        "text_body": text_body,
+        "is_html": is_html,
+    }])
+
+
+async def enqueue_emails(db: AsyncSession, emails: list[dict]):
+    """Add several emails to the outbox in one INSERT without committing.
+
+    Each dict holds idempotency_key, to_email, subject, body, text_body and
+    is_html; rows whose key is already queued are skipped.
+    """
+    if not emails:
+        return
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    now = _utcnow()
+    await db.execute(
+        insert(EmailOutboxDB).on_conflict_do_nothing(index_elements=['idempotency_key']),
+        [{**email, "status": 'pending', "attempts": 0, "created_at": now, "available_at": now} for email in emails],
+    )
+
+
+async def claim_outbox_batch(db: AsyncSession, claim_token: str, batch_size: int, lease_seconds: int) -> list[EmailOutboxDB]:
+    """Lease up to batch_size deliverable emails under claim_token.
+
+    The conditional UPDATE only takes rows that are still pending (or whose
+    previous lease ran out), so concurrent workers never claim the same row.
+    """
+    now = _utcnow()
+    claimable = (
+        select(EmailOutboxDB.id)
+        .where(EmailOutboxDB.status.in_(('pending', 'sending')), EmailOutboxDB.available_at <= now)
+        .order_by(EmailOutboxDB.available_at)
+        .limit(batch_size)
+    )
+    await db.execute(
+        update(EmailOutboxDB)
+        .where(
+            EmailOutboxDB.id.in_(claimable),
+            EmailOutboxDB.status.in_(('pending', 'sending')),
+            EmailOutboxDB.available_at <= now,
+        )
+        .values(
+            status='sending',
+            claimed_by=claim_token,
+            attempts=EmailOutboxDB.attempts + 1,
+            available_at=now + timedelta(seconds=lease_seconds),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    result = await db.scalars(
+        select(EmailOutboxDB).where(EmailOutboxDB.status == 'sending', EmailOutboxDB.claimed_by == claim_token)
+    )
+    return list(result.all())
+
+
+async def record_outbox_results(db: AsyncSession, results: dict[int, Exception | None], max_attempts: int, retry_base_seconds: int):
+    """Mark delivered emails sent and reschedule (or fail) the rest."""
+    now = _utcnow()
+    sent_ids = [email_id for email_id, error in results.items() if error is None]
+    if sent_ids:
+        await db.execute(
+            update(EmailOutboxDB)
+            .where(EmailOutboxDB.id.in_(sent_ids))
+            .values(status='sent', sent_at=now, last_error=None, claimed_by=None)
+            .execution_options(synchronize_session=False)
+        )
+    failed = {email_id: error for email_id, error in results.items() if error is not None}
+    if failed:
+        for email in await db.scalars(select(EmailOutboxDB).where(EmailOutboxDB.id.in_(failed))):
+            email.last_error = str(failed[email.id])
+            email.claimed_by = None
+            if email.attempts >= max_attempts:
+                email.status = 'failed'
+            else:
+                email.status = 'pending'
+                email.available_at = now + timedelta(seconds=retry_base_seconds * 2 ** (email.attempts - 1))
+    await db.commit()
+
+
+# Search for the sharing dialog. SQLite matches word prefixes through the
+# FTS5 tables; other backends use ILIKE, which pg_trgm indexes serve.
+#
+# Ranking every FTS5 match (bm25) costs tens of milliseconds for one-letter
+# prefixes on a large table, so results are ranked in two tiers instead:
+# each is a LIMIT query reading the index in rowid order, and the second
+# only fills what the first leaves. Both run in one statement. The second
+# tier excludes what the first matches, so the tiers never overlap and a
+# page can resume from (tier, rowid) inside either of them.
+
+def _fts_tiered_search(table: str, fts_table: str, join: str) -> str:
+    """The tiered query; join joins table to the FTS rowids in hits."""
+    return f"""
+        SELECT {table}.*, hits.tier AS hit_tier, hits.rowid AS hit_rowid FROM (
+            SELECT * FROM (
+                SELECT rowid, 0 AS tier FROM {fts_table}
+                WHERE {fts_table} MATCH :first AND rowid > :after_first ORDER BY rowid LIMIT :limit
+            )
+            UNION ALL
+            SELECT * FROM (
+                SELECT rowid, 1 AS tier FROM {fts_table}
+                WHERE {fts_table} MATCH :then AND rowid > :after_then ORDER BY rowid LIMIT :limit
+            )
+        ) AS hits {join}
+        ORDER BY hits.tier, hits.rowid
+        LIMIT :limit
+    """
+
+
+_SEARCH_USERS_FTS = text(_fts_tiered_search(
+    "users", "users_fts",
+    "JOIN users_search ON users_search.id = hits.rowid JOIN users ON users.uid = users_search.uid",
+))
+_SEARCH_GROUPS_FTS = text(_fts_tiered_search("groups", "groups_fts", "JOIN groups ON groups.id = hits.rowid"))
+_MAX_ROWID = 2 ** 63 - 1
+
+
+async def _fts_search(
+    db: AsyncSession, model, statement, first: str, then: str, limit: int, after: tuple | None,
+) -> tuple[list, tuple | None]:
+    tier, rowid = after or (0, 0)
+    params = {
+        "first": first,
+        "then": f"({then}) NOT ({first})",
+        # A cursor in the second tier means the first is done
+        "after_first": rowid if tier == 0 else _MAX_ROWID,
+        "after_then": rowid if tier == 1 else 0,
+        "limit": limit + 1,
+    }
+    rows = (await db.execute(
+        select(model, literal_column("hit_tier", Integer), literal_column("hit_rowid", Integer)).from_statement(statement),
+        params,
+    )).all()
+    page, next_key = _page(rows, limit, lambda row: (row.hit_tier, row.hit_rowid))
+    return [row[0] for row in page], next_key
+
+
+def _like_pattern(q: str) -> str:
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+async def search_users(db: AsyncSession, q: str, limit: int, after: tuple | None = None) -> tuple[list[UserDB], tuple | None]:
+    """Users whose email or name matches q, best matches first, and the key of the next page.
+
+    after is the key returned with the previous page.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        if fts_prefix_query(q) is None:
+            return [], None
+        # Name prefixes first, then anything in the email address
+        return await _fts_search(
+            db, UserDB, _SEARCH_USERS_FTS, fts_prefix_query(q, columns="first_name last_name"), fts_prefix_query(q),
+            limit, after,
+        )
+    pattern = _like_pattern(q)
+    prefix = pattern[1:]
+    columns = (UserDB.email, UserDB.first_name, UserDB.last_name)
+    tier = case((or_(*(column.ilike(prefix, escape="\\") for column in columns)), 0), else_=1)
+    statement = (
+        select(UserDB, tier.label("tier"))
+        .where(or_(*(column.ilike(pattern, escape="\\") for column in columns)))
+        # Within a tier by uid, which unlike email is never NULL (guests)
+        .order_by(tier, UserDB.uid)
+        .limit(limit + 1)
+    )
+    if after is not None:
+        # str(): the key of an SQLite page holds a rowid instead
+        statement = statement.where(tuple_(tier, UserDB.uid) > tuple_(after[0], str(after[1])))
+    rows = (await db.execute(statement)).all()
+    page, next_key = _page(rows, limit, lambda row: (row.tier, row[0].uid))
+    return [row[0] for row in page], next_key
+
+
+async def search_groups(db: AsyncSession, q: str, limit: int, after: tuple | None = None) -> tuple[list[GroupDB], tuple | None]:
+    """Groups whose name matches q, best matches first, and the key of the next page."""
+    if db.get_bind().dialect.name == "sqlite":
+        if fts_prefix_query(q) is None:
+            return [], None
+        # Names starting with the query first, then any word in the name
+        return await _fts_search(
+            db, GroupDB, _SEARCH_GROUPS_FTS, fts_prefix_query(q, columns="name", initial=True), fts_prefix_query(q),
+            limit, after,
+        )
+    pattern = _like_pattern(q)
+    tier = case((GroupDB.name.ilike(pattern[1:], escape="\\"), 0), else_=1)
+    # Within a tier by id, as the FTS5 path orders by rowid
+    statement = (
+        select(GroupDB, tier.label("tier"))
+        .where(GroupDB.name.ilike(pattern, escape="\\"))
+        .order_by(tier, GroupDB.id)
+        .limit(limit + 1)
+    )
+    if after is not None:
+        statement = statement.where(tuple_(tier, GroupDB.id) > tuple_(*after))
+    rows = (await db.execute(statement)).all()
+    page, next_key = _page(rows, limit, lambda row: (row.tier, row[0].id))
+    return [row[0] for row in page], next_key
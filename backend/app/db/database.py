@@ -1,19 +1,142 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from pathlib import Path
 from .models import Base
+from ..config import settings
+from ..utils import metrics
 
 DB_PATH = Path(__file__).parent / 'wishful.db'
-SQLALCHEMY_DATABASE_URL = f"sqlite:///{DB_PATH}"
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / 'alembic.ini'
+# The schema init_db created before migrate() ran on deploy
+UNVERSIONED_SCHEMA_REVISION = "038a17f77709"
 
+# Sync driver for a URL that names only the backend: SQLAlchemy would pick
+# psycopg2 for "postgresql://", while the postgres extra installs psycopg 3
+SYNC_DRIVERS = {
+    "postgresql": "postgresql+psycopg",
+}
+
+# Async driver used for each backend when serving requests
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def to_sync_url(url: str) -> str:
+    """Fill in the sync driver of a URL that does not name one."""
+    parsed = make_url(url)
+    if parsed.drivername not in SYNC_DRIVERS:
+        return url
+    return parsed.set(drivername=SYNC_DRIVERS[parsed.drivername]).render_as_string(hide_password=False)
+
+
+def to_async_url(url: str) -> str:
+    """Swap the driver of a sync database URL for its asyncio counterpart."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend '{backend}'")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+SQLALCHEMY_DATABASE_URL = to_sync_url(settings.DATABASE_URL or f"sqlite:///{DB_PATH}")
+SQLALCHEMY_ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or to_async_url(SQLALCHEMY_DATABASE_URL)
+
+IS_SQLITE = make_url(SQLALCHEMY_DATABASE_URL).get_backend_name() == "sqlite"
+
+
+def _engine_options() -> dict:
+    if IS_SQLITE:
+        return {}
+    # Postgres: a bounded pool per process, with stale connections detected
+    # before use and recycled before server/proxy idle timeouts kick in
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Per-connection SQLite tuning.
+
+    WAL lets readers proceed while a write is in progress, and with
+    synchronous=NORMAL commits no longer wait for an fsync of the database
+    file. busy_timeout makes a second writer wait for the lock instead of
+    failing immediately with "database is locked".
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE_BYTES)}")
+    # Negative cache_size is in KiB rather than pages
+    cursor.execute(f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}")
+    cursor.close()
+
+
+# Sync engine: schema management, scripts and offline tooling
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False} if IS_SQLITE else {},
+    **_engine_options(),
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine: used by the API routers
+async_engine = create_async_engine(SQLALCHEMY_ASYNC_DATABASE_URL, **_engine_options())
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+if IS_SQLITE:
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
+if settings.METRICS_ENABLED:
+    # Statement timings and per-request query counts for /metrics
+    for _engine in (engine, async_engine.sync_engine):
+        event.listen(_engine, "before_cursor_execute", metrics.before_cursor_execute)
+        event.listen(_engine, "after_cursor_execute", metrics.after_cursor_execute)
+
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def init_db():
     Base.metadata.create_all(bind=engine)
 
 
+def migrate():
+    """Bring the schema up to date: ``python -m app.db.database``.
+
+    Run once per deploy, before the API workers start; they no longer touch
+    the schema themselves. The migration history starts from tables that
+    already exist, so an empty database is created from the models and
+    stamped at the latest revision instead of being migrated from scratch.
+    Tables without an alembic_version are a database built by ``init_db``
+    before migrations were run on deploy, so it is stamped at that revision
+    first.
+    """
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("sqlalchemy.url", SQLALCHEMY_DATABASE_URL.replace("%", "%%"))
+    table_names = inspect(engine).get_table_names()
+    if not table_names:
+        init_db()
+        command.stamp(config, "head")
+        return
+    if "alembic_version" not in table_names:
+        command.stamp(config, UNVERSIONED_SCHEMA_REVISION)
+    command.upgrade(config, "head")
+
+
 if __name__ == "__main__":
-    init_db()
+    migrate()
@@ -1,16 +1,24 @@
 
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Text, Table
+from sqlalchemy import event, Column, BigInteger, Integer, String, Boolean, DateTime, ForeignKey, Index, Text, Table
+from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.orm import relationship, declarative_base
+from .change_tracking import create_change_tracking
+from .search_index import create_search_index
 
 
-Base = declarative_base()
+Base = declarative_base(cls=AsyncAttrs)
 
 # Association table for wishlists shared with users
 wishlist_shared_with = Table(
     'shared_with',
     Base.metadata,
     Column('wishlist_id', Integer, ForeignKey('wishlists.id'), primary_key=True),
-    Column('user_id', String, ForeignKey('users.uid'), primary_key=True)
+    Column('user_id', String, ForeignKey('users.uid'), primary_key=True),
+    # Stamped by triggers (see change_tracking.py)
+    Column('version', BigInteger, nullable=False, server_default='0'),
+    # The primary key leads with wishlist_id; this serves "shared with me",
+    # in wishlist order for paging
+    Index('ix_shared_with_user_id_wishlist_id', 'user_id', 'wishlist_id'),
 )
 
 
@@ -34,6 +42,8 @@ class WishListDB(Base):
     owner_id = Column(String, ForeignKey('users.uid'))
     name = Column(String, unique=True, nullable=False)
     tag = Column(String)
+    # Stamped by triggers on every change (see change_tracking.py)
+    version = Column(BigInteger, nullable=False, server_default='0')
     items = relationship('WishItemDB', back_populates='wishlist', cascade='all, delete-orphan')
     shared_with = relationship(
         'UserDB',
@@ -41,6 +51,10 @@ class WishListDB(Base):
         back_populates='shared_wishlists'
     )
     owner_user = relationship('UserDB', back_populates='wishlists')
+    __table_args__ = (
+        # A user's own lists, in id order for paging
+        Index('ix_wishlists_owner_id_id', 'owner_id', 'id'),
+    )
 
 class WishItemDB(Base):
     __tablename__ = 'wishlist_items'
@@ -50,7 +64,13 @@ class WishItemDB(Base):
     reserved = Column(Boolean, default=False)
     reserved_by = Column(String, nullable=True)
     link = Column(String, nullable=True)
+    # Stamped by triggers on every change (see change_tracking.py)
+    version = Column(BigInteger, nullable=False, server_default='0')
     wishlist = relationship('WishListDB', back_populates='items')
+    __table_args__ = (
+        # Items of a wishlist, and a single item checked against its wishlist
+        Index('ix_wishlist_items_wishlist_id_id', 'wishlist_id', 'id'),
+    )
 
 
 # Removed SharedWithDB mapped class; now using association table for many-to-many
@@ -58,17 +78,85 @@ class WishItemDB(Base):
 class GroupDB(Base):
     __tablename__ = 'groups'
     id = Column(Integer, primary_key=True)
-    name = Column(String, nullable=False)
+    name = Column(String, nullable=False, index=True)
     owner_id = Column(String, ForeignKey('users.uid'))
     members = relationship('GroupMemberDB', back_populates='group', cascade='all, delete-orphan')
 
 class GroupMemberDB(Base):
     __tablename__ = 'group_members'
     group_id = Column(Integer, ForeignKey('groups.id'), primary_key=True)
-    user_id = Column(String, ForeignKey('users.uid'), primary_key=True)
+    user_id = Column(String, ForeignKey('users.uid'), primary_key=True, index=True)
     group = relationship('GroupDB', back_populates='members')
 
 class SharedWithGroupDB(Base):
     __tablename__ = 'shared_with_group'
     wishlist_id = Column(Integer, ForeignKey('wishlists.id'), primary_key=True)
-    group_id = Column(Integer, ForeignKey('groups.id'), primary_key=True)
\ No newline at end of file
+    group_id = Column(Integer, ForeignKey('groups.id'), primary_key=True)
+
+class ShareTokenDB(Base):
+    __tablename__ = 'share_tokens'
+    token = Column(String, primary_key=True, index=True)
+    wishlist_id = Column(Integer, ForeignKey('wishlists.id'), nullable=False)
+    owner_id = Column(String, ForeignKey('users.uid'), nullable=False)
+    # Naive UTC; expired rows are removed by crud.delete_expired_share_tokens
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+class EmailOutboxDB(Base):
+    __tablename__ = 'email_outbox'
+    id = Column(Integer, primary_key=True, index=True)
+    # Same logical email is only ever enqueued once (e.g. "share-invite:<token>")
+    idempotency_key = Column(String, unique=True, nullable=False)
+    to_email = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    # Plain-text alternative sent alongside an HTML body
+    text_body = Column(Text, nullable=True)
+    is_html = Column(Boolean, default=True, nullable=False)
+    # pending -> sending -> sent | failed; a "sending" row whose lease
+    # (available_at) has passed is picked up again by the worker
+    status = Column(String, default='pending', nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text, nullable=True)
+    claimed_by = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    available_at = Column(DateTime, nullable=False)
+    sent_at = Column(DateTime, nullable=True)
+    __table_args__ = (
+        Index('ix_email_outbox_status_available_at', 'status', 'available_at'),
+    )
+
+
+class SyncClockDB(Base):
+    """Single row (id 1) holding the last version handed out by the triggers.
+
+    On Postgres ``version`` stays put and is added to transaction ids instead
+    (see change_tracking.py).
+    """
+    __tablename__ = 'sync_clock'
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False)
+    # Tombstones up to this version have been pruned; older sync tokens get
+    # a full snapshot
+    pruned_version = Column(BigInteger, nullable=False)
+
+
+class SyncTombstoneDB(Base):
+    """A deleted wishlist, item or share, kept so GET /sync can report it."""
+    __tablename__ = 'sync_tombstones'
+    id = Column(Integer, primary_key=True)
+    # Not unique on Postgres, where deletes in one transaction share a version
+    version = Column(BigInteger, nullable=False, index=True)
+    # wishlist | item | share
+    kind = Column(String, nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    wishlist_id = Column(Integer, nullable=False)
+    # Owner of a deleted wishlist, or the user a wishlist was unshared from
+    user_id = Column(String, nullable=True)
+    deleted_at = Column(DateTime, nullable=False)
+
+
+# FTS5 / pg_trgm search indexes over users and groups (see search_index.py)
+event.listen(Base.metadata, 'after_create', create_search_index)
+# Version triggers and tombstones for GET /sync (see change_tracking.py)
+event.listen(Base.metadata, 'after_create', create_change_tracking)
@@ -0,0 +1,110 @@
+"""Full-text indexes behind /search and /groups/search.
+
+SQLite uses FTS5 external-content tables over groups and over
+users_search (a copy of the users columns under a stable integer key),
+kept in sync by triggers and queried by token prefix. Postgres uses pg_trgm GIN
+indexes, which serve the ILIKE '%q%' queries directly.
+
+The indexes are created alongside the tables by ``Base.metadata.create_all``
+(see models.py) and by the alembic revision that introduced them.
+"""
+import re
+
+from sqlalchemy import text
+
+
+SQLITE_DDL = [
+    # Prefix indexes make the short prefixes typed in the sharing dialog a
+    # single term lookup instead of a merge over every matching token
+    # users has a TEXT primary key, so its rowid is not stable (VACUUM may
+    # renumber it) and cannot key an external-content index. users_search
+    # copies the searched columns under an INTEGER PRIMARY KEY, kept up by
+    # triggers on users, and users_fts indexes that.
+    """CREATE TABLE IF NOT EXISTS users_search (
+        id INTEGER PRIMARY KEY,
+        uid VARCHAR NOT NULL UNIQUE,
+        email VARCHAR, first_name VARCHAR, last_name VARCHAR
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS users_search_ai AFTER INSERT ON users BEGIN
+        INSERT INTO users_search(uid, email, first_name, last_name)
+        VALUES (new.uid, new.email, new.first_name, new.last_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_search_ad AFTER DELETE ON users BEGIN
+        DELETE FROM users_search WHERE uid = old.uid;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_search_au AFTER UPDATE ON users BEGIN
+        UPDATE users_search SET uid = new.uid, email = new.email, first_name = new.first_name,
+            last_name = new.last_name
+        WHERE uid = old.uid;
+    END""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+        email, first_name, last_name,
+        content='users_search', content_rowid='id', prefix='1 2 3 4 5 6'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS users_search_fts_ai AFTER INSERT ON users_search BEGIN
+        INSERT INTO users_fts(rowid, email, first_name, last_name)
+        VALUES (new.id, new.email, new.first_name, new.last_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_search_fts_ad AFTER DELETE ON users_search BEGIN
+        INSERT INTO users_fts(users_fts, rowid, email, first_name, last_name)
+        VALUES ('delete', old.id, old.email, old.first_name, old.last_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_search_fts_au AFTER UPDATE ON users_search BEGIN
+        INSERT INTO users_fts(users_fts, rowid, email, first_name, last_name)
+        VALUES ('delete', old.id, old.email, old.first_name, old.last_name);
+        INSERT INTO users_fts(rowid, email, first_name, last_name)
+        VALUES (new.id, new.email, new.first_name, new.last_name);
+    END""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS groups_fts USING fts5(
+        name, content='groups', content_rowid='id', prefix='1 2 3 4 5 6'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS groups_fts_ai AFTER INSERT ON groups BEGIN
+        INSERT INTO groups_fts(rowid, name) VALUES (new.id, new.name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS groups_fts_ad AFTER DELETE ON groups BEGIN
+        INSERT INTO groups_fts(groups_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS groups_fts_au AFTER UPDATE ON groups BEGIN
+        INSERT INTO groups_fts(groups_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO groups_fts(rowid, name) VALUES (new.id, new.name);
+    END""",
+]
+
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_users_email_trgm ON users USING gin (email gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_users_first_name_trgm ON users USING gin (first_name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_users_last_name_trgm ON users USING gin (last_name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_groups_name_trgm ON groups USING gin (name gin_trgm_ops)",
+]
+
+DDL_BY_DIALECT = {
+    "sqlite": SQLITE_DDL,
+    "postgresql": POSTGRES_DDL,
+}
+
+
+def create_search_index(target, connection, **kw):
+    """metadata ``after_create`` hook; a no-op on other backends."""
+    for statement in DDL_BY_DIALECT.get(connection.dialect.name, []):
+        connection.execute(text(statement))
+
+
+_TOKEN = re.compile(r"\w+")
+
+
+def fts_prefix_query(q: str, columns: str = None, initial: bool = False) -> str | None:
+    """Turn free text into an FTS5 query matching every word as a prefix.
+
+    ``columns`` restricts the match to a space-separated list of columns and
+    ``initial`` anchors the first word to the start of the column. Only word
+    characters are kept, so the result is always valid FTS5 syntax; returns
+    None when nothing searchable remains.
+    """
+    tokens = _TOKEN.findall(q.lower())
+    if not tokens:
+        return None
+    query = " ".join(f'"{token}"*' for token in tokens)
+    if initial:
+        query = f"^{query}"
+    return f"{{{columns}}} : ({query})" if columns else query
@@ -1,3 +1,5 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .routes.wishlist import router as wishlist_router
@@ -6,10 +8,71 @@ from .routes.sharing import router as sharing_router
 from .routes.recommendations import router as recommendations_router
 from .routes.user import router as user_router
 from .routes.groups import router as group_router
-from .db.database import init_db
+from .routes.sync import router as sync_router
+from .routes.events import router as events_router
+from .routes.metrics import router as metrics_router
+from .db.database import AsyncSessionLocal
+from .db.crud import delete_expired_share_tokens, prune_sync_tombstones
+from .utils.event_hub import event_hub
+from .utils.home_view_cache import home_view_cache
+from .utils import metrics
+from .auth import token_cache
+from .recommender import reload_recommender
+from .config import settings
+from .utils.logger import RequestContextMiddleware, logger, stats as logging_stats
 
-init_db()
-app = FastAPI()
+
+async def sweep_expired_share_tokens():
+    """Periodically purge expired share tokens so the table stays small."""
+    while True:
+        await asyncio.sleep(settings.SHARE_TOKEN_SWEEP_SECONDS)
+        try:
+            async with AsyncSessionLocal() as db:
+                deleted = await delete_expired_share_tokens(db)
+            if deleted:
+                logger.info("[sweep_expired_share_tokens] Deleted %s expired share tokens", deleted)
+        except Exception as e:
+            logger.error("[sweep_expired_share_tokens] Error: %s", e)
+
+
+async def sweep_sync_tombstones():
+    """Periodically drop deletion records older than the sync retention window."""
+    while True:
+        await asyncio.sleep(settings.SYNC_TOMBSTONE_SWEEP_SECONDS)
+        try:
+            async with AsyncSessionLocal() as db:
+                deleted = await prune_sync_tombstones(db, settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+            if deleted:
+                logger.info("[sweep_sync_tombstones] Deleted %s sync tombstones", deleted)
+        except Exception as e:
+            logger.error("[sweep_sync_tombstones] Error: %s", e)
+
+
+async def reload_recommendations():
+    """Pick up recommendation models published by `python -m app.recommender`."""
+    while True:
+        await asyncio.sleep(settings.RECOMMENDER_RELOAD_SECONDS)
+        try:
+            await asyncio.to_thread(reload_recommender)
+        except Exception as e:
+            logger.error("[reload_recommendations] Error: %s", e)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    sweeper = asyncio.create_task(sweep_expired_share_tokens())
+    tombstone_sweeper = asyncio.create_task(sweep_sync_tombstones())
+    reloader = asyncio.create_task(reload_recommendations())
+    await event_hub.start()
+    yield
+    await event_hub.stop()
+    sweeper.cancel()
+    tombstone_sweeper.cancel()
+    reloader.cancel()
+
+
+# The schema is managed by alembic (python -m app.db.database), not at import
+app = FastAPI(lifespan=lifespan)
 
 # Allow CORS for all origins (for development)
 app.add_middleware(
@@ -18,12 +81,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "X-Next-Cursor"],
 )
 
+if settings.METRICS_ENABLED:
+    # Added after CORS, so it also times CORS handling
+    app.add_middleware(metrics.MetricsMiddleware)
+    metrics.register_stats("wishful_home_view_cache", home_view_cache.stats, counters=("hits", "misses", "stale", "invalidations", "evictions"))
+    metrics.register_stats("wishful_token_cache", token_cache.stats, counters=("hits", "misses"))
+    metrics.register_stats("wishful_events", event_hub.stats, counters=("published", "delivered", "overflows", "publish_errors"))
+    metrics.register_stats("wishful_logging", logging_stats, counters=("dropped",))
+
+# Outermost, so every log record of a request, metrics' included, carries its id
+app.add_middleware(RequestContextMiddleware)
+
 # Register API routes
 app.include_router(wishlist_router)
 app.include_router(wishlist_items_router)
 app.include_router(sharing_router)
 app.include_router(recommendations_router)
 app.include_router(user_router)
-app.include_router(group_router)
\ No newline at end of file
+app.include_router(group_router)
+app.include_router(sync_router)
+app.include_router(events_router)
+if settings.METRICS_ENABLED:
+    app.include_router(metrics_router)
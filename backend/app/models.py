@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Literal, Optional
 from enum import Enum
 
 class TagEnum(str, Enum):
@@ -18,6 +18,32 @@ class WishItemRequest(BaseModel):
     link: Optional[str] = None
 
 
+class ItemOperation(BaseModel):
+    """One step of POST /wishlists/{id}/items:batch.
+
+    create takes the fields POST /wishlists/{id}/items does, of which only
+    name is required, but no id: the server assigns it and returns it in
+    "created". update and delete need the item id; an update changes name
+    and/or link, whichever it sets, like PUT on the item.
+    """
+    op: Literal["create", "update", "delete"]
+    id: Optional[int] = None
+    name: Optional[str] = None
+    link: Optional[str] = None
+    reserved: bool = False
+    reserved_by: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_create_has_no_id(self):
+        if self.op == "create" and self.id is not None:
+            raise ValueError("create assigns the item id; leave id out")
+        return self
+
+
+class ItemBatchRequest(BaseModel):
+    operations: List[ItemOperation] = Field(..., min_length=1, max_length=500)
+
+
 class CreateWishListRequest(BaseModel):
     id: int
     name: str
@@ -38,6 +64,24 @@ class WishListRequest(BaseModel):
     tag: Optional[TagEnum] = None
 
 
+class SyncItem(WishItemRequest):
+    wishlist_id: int
+
+
+class SyncResponse(BaseModel):
+    """Changes since a GET /sync token.
+
+    Apply the deletions, then upsert wishlists and items. With reset the
+    payload is everything the user can see and replaces local state.
+    """
+    token: int
+    reset: bool = False
+    wishlists: List[WishListRequest] = []
+    items: List[SyncItem] = []
+    deleted_wishlists: List[int] = []
+    deleted_items: List[int] = []
+
+
 # User model for registration
 class UserRequest(BaseModel):
     uid: str
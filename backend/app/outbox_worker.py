@@ -0,0 +1,108 @@
+"""Deliver queued notification emails from the email_outbox table.
+
+Runs as its own process, separate from the API workers:
+
+    python -m app.outbox_worker [--once]
+
+Each pass leases a batch of due rows, sends them over ``--concurrency``
+pooled SMTP connections and records the outcome. Failed sends are retried
+with exponential backoff until OUTBOX_MAX_ATTEMPTS, then marked failed.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import socket
+import uuid
+
+from .config import settings
+from .db.crud import claim_outbox_batch, record_outbox_results
+from .db.database import AsyncSessionLocal
+from .utils.email_utils import build_message, is_valid_email, open_smtp_connection
+from .utils.logger import logger
+from .utils.mail_dispatcher import MailDispatcher
+
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def make_dispatchers(concurrency: int) -> list[MailDispatcher]:
+    return [
+        MailDispatcher(
+            open_smtp_connection,
+            max_queue=settings.OUTBOX_BATCH_SIZE,
+            batch_size=settings.MAIL_BATCH_SIZE,
+            max_retries=settings.MAIL_MAX_RETRIES,
+            idle_timeout=settings.MAIL_IDLE_TIMEOUT_SECONDS,
+        )
+        for _ in range(concurrency)
+    ]
+
+
+async def drain_once(dispatchers: list[MailDispatcher]) -> int:
+    """Send one batch of due emails; returns how many were claimed."""
+    claim_token = f"{WORKER_ID}:{uuid.uuid4().hex}"
+    async with AsyncSessionLocal() as db:
+        batch = await claim_outbox_batch(db, claim_token, settings.OUTBOX_BATCH_SIZE, settings.OUTBOX_LEASE_SECONDS)
+    if not batch:
+        return 0
+
+    loop = asyncio.get_running_loop()
+    pending: dict[int, asyncio.Future] = {}
+    results: dict[int, Exception | None] = {}
+    targets = itertools.cycle(dispatchers)
+    for email in batch:
+        if not is_valid_email(email.to_email):
+            results[email.id] = ValueError(f"Invalid email address: {email.to_email}")
+            continue
+        future = loop.create_future()
+        pending[email.id] = future
+        message = build_message(
+            email.to_email, email.subject, email.body, email.is_html, email.idempotency_key, email.text_body
+        )
+        next(targets).submit(
+            settings.FROM_EMAIL,
+            email.to_email,
+            message,
+            on_done=lambda error, f=future: loop.call_soon_threadsafe(f.set_result, error),
+        )
+    for email_id, future in pending.items():
+        results[email_id] = await future
+
+    async with AsyncSessionLocal() as db:
+        await record_outbox_results(db, results, settings.OUTBOX_MAX_ATTEMPTS, settings.OUTBOX_RETRY_BASE_SECONDS)
+    failures = sum(1 for error in results.values() if error is not None)
+    logger.info("[outbox_worker] Processed %s emails (%s failed)", len(batch), failures)
+    return len(batch)
+
+
+async def run(once: bool = False, concurrency: int = None):
+    dispatchers = make_dispatchers(concurrency or settings.OUTBOX_CONCURRENCY)
+    logger.info("[outbox_worker] Starting %s with %s SMTP connections", WORKER_ID, len(dispatchers))
+    try:
+        while True:
+            try:
+                claimed = await drain_once(dispatchers)
+            except Exception as e:
+                logger.error("[outbox_worker] Error: %s", e)
+                claimed = 0
+            if once and not claimed:
+                return
+            # Keep draining while there is a backlog; otherwise poll
+            if claimed < settings.OUTBOX_BATCH_SIZE:
+                await asyncio.sleep(0 if once else settings.OUTBOX_POLL_SECONDS)
+    finally:
+        for dispatcher in dispatchers:
+            await asyncio.to_thread(dispatcher.stop)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deliver emails from the email outbox.")
+    parser.add_argument("--once", action="store_true", help="Exit once no due emails remain")
+    parser.add_argument("--concurrency", type=int, default=None, help="Number of SMTP connections")
+    args = parser.parse_args()
+    asyncio.run(run(once=args.once, concurrency=args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""Item recommendations from what people put on their wishlists.
+
+Training runs offline and writes a model directory:
+
+    python -m app.recommender train      # always rebuild
+    python -m app.recommender refresh    # rebuild only if items changed
+
+Item names are normalised into item keys. Two item-item similarities are
+blended: cosine of co-occurrence across wishlists, and cosine of TF-IDF
+vectors over words and character trigrams of the names, found with
+nearest neighbours. Only the top RECOMMENDER_NEIGHBOURS per item are kept.
+
+The model is a set of .npy files memory-mapped by the API process, which
+needs only numpy to serve: a user's top-K is a sum over the neighbour rows
+of their own items. Names the model has not seen yet are projected onto
+known items through the stored TF-IDF vocabulary, so new items count
+immediately, before the next refresh picks up their co-occurrences.
+"""
+import argparse
+import json
+import math
+import os
+import re
+import shutil
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from .config import settings
+from .utils.logger import logger
+
+
+MODEL_DIR = Path(settings.RECOMMENDER_MODEL_DIR or Path(__file__).parent / "db" / "recommender")
+
+# Served when there is no model yet, or nothing to go on for a user
+DEFAULT_RECOMMENDATIONS = ["Gift Card", "Book", "Headphones"]
+
+# Weight of co-occurrence against name similarity in the blended score
+CO_OCCURRENCE_WEIGHT = 0.6
+# Unseen names map onto at most this many known items, above this similarity
+PROJECTION_NEIGHBOURS = 5
+PROJECTION_MIN_SIMILARITY = 0.3
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize_name(name: str) -> str:
+    return " ".join(_WORD.findall(name.casefold()))
+
+
+def item_terms(key: str) -> list[str]:
+    """Words and per-word character trigrams of a normalised item name."""
+    terms = []
+    for word in key.split():
+        terms.append(f"w:{word}")
+        padded = f" {word} "
+        terms.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return terms
+
+
+class Recommender:
+    """A trained model, memory-mapped from a model version directory."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        meta = json.loads((path / "meta.json").read_text())
+        self.version = meta["version"]
+        self.names = meta["names"]
+        self.index = {normalize_name(name): i for i, name in enumerate(self.names)}
+        self.terms = {term: i for i, term in enumerate(meta["terms"])}
+        self.neighbours = np.load(path / "neighbours.npy", mmap_mode="r")
+        self.scores = np.load(path / "scores.npy", mmap_mode="r")
+        self.popularity = np.load(path / "popularity.npy", mmap_mode="r")
+        self.idf = np.load(path / "idf.npy", mmap_mode="r")
+        # Term -> item TF-IDF weights, CSR by term
+        self.term_indptr = np.load(path / "term_indptr.npy", mmap_mode="r")
+        self.term_items = np.load(path / "term_items.npy", mmap_mode="r")
+        self.term_weights = np.load(path / "term_weights.npy", mmap_mode="r")
+        # Fallback order for users with little history
+        self.most_popular = np.argsort(self.popularity)[::-1][:1000].tolist()
+
+    def project(self, key: str) -> list[tuple[int, float]]:
+        """Known items most similar by name to an item the model has not seen."""
+        counts = Counter(term for term in item_terms(key) if term in self.terms)
+        if not counts:
+            return []
+        columns = [self.terms[term] for term in counts]
+        weights = np.fromiter((1 + math.log(n) for n in counts.values()), dtype=np.float32, count=len(counts))
+        weights *= self.idf[columns]
+        weights /= np.linalg.norm(weights)
+        postings = [(self.term_indptr[column], self.term_indptr[column + 1]) for column in columns]
+        items = np.concatenate([self.term_items[start:end] for start, end in postings])
+        values = np.concatenate([weight * self.term_weights[start:end] for weight, (start, end) in zip(weights, postings)])
+        return [
+            (int(item), float(similarity))
+            for item, similarity in _top(items, values, PROJECTION_NEIGHBOURS, len(self.names))
+            if similarity >= PROJECTION_MIN_SIMILARITY
+        ]
+
+    def recommend(self, item_names: list[str], k: int) -> list[str]:
+        """Top k item names for someone whose wishlists hold item_names.
+
+        Only the neighbours of the user's items are scored, so the cost does
+        not grow with the size of the catalogue. Users with too little to go
+        on are topped up with the most popular items.
+        """
+        keys = {normalize_name(name) for name in item_names}
+        keys.discard("")
+        seeds: list[tuple[int, float]] = []
+        owned = set()
+        for key in keys:
+            if key in self.index:
+                owned.add(self.index[key])
+                seeds.append((self.index[key], 1.0))
+            else:
+                seeds.extend(self.project(key))
+        picks: list[int] = []
+        if seeds:
+            rows = [self.neighbours[item] for item, _ in seeds]
+            items = np.concatenate(rows)
+            values = np.concatenate([weight * self.scores[item] for item, weight in seeds])
+            valid = items >= 0
+            for item, _ in _top(items[valid], values[valid], k + len(owned), len(self.names)):
+                if item not in owned:
+                    picks.append(int(item))
+        chosen = set(picks[:k]) | owned
+        for item in self.most_popular:
+            if len(picks) >= k:
+                break
+            if item not in chosen:
+                picks.append(int(item))
+                chosen.add(item)
+        return [self.names[i] for i in picks[:k]]
+
+
+def _top(items: np.ndarray, values: np.ndarray, k: int, n_items: int) -> list[tuple[int, float]]:
+    """Sum values per item and return the k best as (item, total) pairs."""
+    if not len(items):
+        return []
+    if len(items) * 8 < n_items:
+        # Few candidates: sorting them beats a pass over the whole catalogue
+        candidates, inverse = np.unique(items, return_inverse=True)
+        totals = np.bincount(inverse, weights=values)
+    else:
+        totals = np.bincount(items, weights=values, minlength=n_items)
+        candidates = None
+    if len(totals) > k:
+        best = np.argpartition(totals, -k)[-k:]
+    else:
+        best = np.arange(len(totals))
+    best = best[np.argsort(totals[best])[::-1]]
+    best = best[totals[best] > 0]
+    ids = best if candidates is None else candidates[best]
+    return list(zip(ids.tolist(), totals[best].tolist()))
+
+
+_recommender: Recommender | None = None
+
+
+def current_version(model_dir: Path = MODEL_DIR) -> str | None:
+    try:
+        return (model_dir / "CURRENT").read_text().strip()
+    except FileNotFoundError:
+        return None
+
+
+def get_recommender() -> Recommender | None:
+    """The loaded model, loading the current version on first use."""
+    if _recommender is None:
+        reload_recommender()
+    return _recommender
+
+
+def reload_recommender() -> bool:
+    """Swap in the current model version if it changed; True if it did."""
+    global _recommender
+    version = current_version()
+    if version is None or (_recommender is not None and _recommender.version == version):
+        return False
+    try:
+        _recommender = Recommender(MODEL_DIR / version)
+    except Exception as e:
+        logger.error("[reload_recommender] Failed to load model %s: %s", version, e)
+        return False
+    logger.info("[reload_recommender] Loaded recommendation model %s (%s items)", version, len(_recommender.names))
+    return True
+
+
+def recommend(item_names: list[str], k: int) -> list[str]:
+    recommender = get_recommender()
+    if recommender is None:
+        return DEFAULT_RECOMMENDATIONS[:k]
+    return recommender.recommend(item_names, k) or DEFAULT_RECOMMENDATIONS[:k]
+
+
+# Offline training. pandas, scipy and scikit-learn are only imported here.
+
+def load_items():
+    import pandas as pd
+    from sqlalchemy import select
+    from .db.database import engine
+    from .db.models import WishItemDB
+
+    query = (
+        select(WishItemDB.id, WishItemDB.wishlist_id, WishItemDB.name, WishItemDB.version)
+        .where(WishItemDB.name.isnot(None))
+    )
+    with engine.connect() as conn:
+        return pd.read_sql(query, conn)
+
+
+def watermark(items) -> dict:
+    """What a model was trained from, to tell whether a refresh is needed.
+
+    Every insert or rename stamps the item's sync version, so the highest
+    one moves on edits that leave the count and the ids alone.
+    """
+    return {
+        "items": int(len(items)),
+        "max_item_id": int(items["id"].max()) if len(items) else 0,
+        "max_item_version": int(items["version"].max()) if len(items) else 0,
+    }
+
+
+def train(items, neighbours: int) -> dict:
+    """Build the model arrays from a frame of (id, wishlist_id, name) rows."""
+    import pandas as pd
+    from scipy import sparse
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.neighbors import NearestNeighbors
+
+    items = items.assign(key=items["name"].map(normalize_name))
+    items = items[items["key"] != ""]
+    codes, keys = pd.factorize(items["key"])
+    # Display each item under its most common spelling
+    spellings = items.assign(code=codes).groupby(["code", "name"]).size().reset_index(name="n")
+    names = spellings.sort_values("n", ascending=False).drop_duplicates("code").sort_values("code")["name"].tolist()
+    n_items = len(keys)
+
+    # Binary wishlist x item matrix; co-occurrence is B^T B
+    wishlists, _ = pd.factorize(items["wishlist_id"])
+    basket = sparse.csr_matrix((np.ones(len(codes), dtype=np.float32), (wishlists, codes)))
+    basket.data[:] = 1
+    popularity = np.asarray(basket.sum(axis=0)).ravel().astype(np.float32)
+    co_occurrence = (basket.T @ basket).tocsr()
+    co_occurrence.setdiag(0)
+    co_occurrence.eliminate_zeros()
+    norm = sparse.diags(1 / np.sqrt(popularity))
+    co_occurrence = norm @ co_occurrence @ norm
+
+    vectorizer = TfidfVectorizer(analyzer=item_terms, sublinear_tf=True, dtype=np.float32)
+    tfidf = vectorizer.fit_transform(keys)
+    n_neighbours = min(neighbours + 1, n_items)
+    knn = NearestNeighbors(n_neighbors=n_neighbours, metric="cosine", algorithm="brute").fit(tfidf)
+    name_similarity = knn.kneighbors_graph(tfidf, mode="distance")
+    name_similarity.data = 1 - name_similarity.data
+    name_similarity.setdiag(0)
+    name_similarity.eliminate_zeros()
+
+    blended = (CO_OCCURRENCE_WEIGHT * co_occurrence + (1 - CO_OCCURRENCE_WEIGHT) * name_similarity).tocsr()
+    neighbour_ids = np.full((n_items, neighbours), -1, dtype=np.int32)
+    neighbour_scores = np.zeros((n_items, neighbours), dtype=np.float32)
+    for item in range(n_items):
+        start, end = blended.indptr[item], blended.indptr[item + 1]
+        row_ids, row_scores = blended.indices[start:end], blended.data[start:end]
+        if len(row_ids) > neighbours:
+            keep = np.argpartition(row_scores, -neighbours)[-neighbours:]
+            row_ids, row_scores = row_ids[keep], row_scores[keep]
+        neighbour_ids[item, :len(row_ids)] = row_ids
+        neighbour_scores[item, :len(row_ids)] = row_scores
+
+    by_term = tfidf.T.tocsr()
+    terms = [None] * len(vectorizer.vocabulary_)
+    for term, column in vectorizer.vocabulary_.items():
+        terms[column] = term
+    return {
+        "names": names,
+        "terms": terms,
+        "arrays": {
+            "neighbours": neighbour_ids,
+            "scores": neighbour_scores,
+            "popularity": popularity,
+            "idf": vectorizer.idf_.astype(np.float32),
+            "term_indptr": by_term.indptr.astype(np.int64),
+            "term_items": by_term.indices.astype(np.int32),
+            "term_weights": by_term.data.astype(np.float32),
+        },
+    }
+
+
+def save_model(model: dict, trained_from: dict, model_dir: Path = MODEL_DIR, keep: int = 2) -> str:
+    """Write a new model version and point CURRENT at it.
+
+    Versions are written to their own directory and published by atomically
+    replacing CURRENT, so API processes never see a half-written model.
+    Older versions beyond ``keep`` are removed.
+    """
+    version = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S%f")
+    path = model_dir / version
+    path.mkdir(parents=True, exist_ok=True)
+    for name, array in model["arrays"].items():
+        np.save(path / f"{name}.npy", array)
+    meta = {"version": version, "names": model["names"], "terms": model["terms"], "trained_from": trained_from}
+    (path / "meta.json").write_text(json.dumps(meta))
+    pointer = model_dir / "CURRENT.tmp"
+    pointer.write_text(version)
+    os.replace(pointer, model_dir / "CURRENT")
+    versions = sorted(p for p in model_dir.iterdir() if p.is_dir())
+    for old in versions[:-keep]:
+        shutil.rmtree(old, ignore_errors=True)
+    return version
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the item recommendation model.")
+    parser.add_argument("command", choices=["train", "refresh"], help="refresh skips training if no items changed")
+    parser.add_argument("--neighbours", type=int, default=settings.RECOMMENDER_NEIGHBOURS)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    items = load_items()
+    trained_from = watermark(items)
+    if args.command == "refresh":
+        version = current_version()
+        if version is not None:
+            meta = json.loads((MODEL_DIR / version / "meta.json").read_text())
+            if meta["trained_from"] == trained_from:
+                logger.info("[recommender] Model %s is up to date", version)
+                return
+    if items.empty:
+        logger.info("[recommender] No wishlist items to train on")
+        return
+    model = train(items, args.neighbours)
+    version = save_model(model, trained_from)
+    logger.info(
+        "[recommender] Trained model %s on %s items (%s distinct) in %.1fs",
+        version, trained_from['items'], len(model['names']), time.perf_counter() - started,
+    )
+
+
+if __name__ == "__main__":
+    main()
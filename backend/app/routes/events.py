@@ -0,0 +1,76 @@
+import asyncio
+import json
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..auth import verify_admin, verify_token
+from ..config import settings
+from ..db.crud import get_wishlist_by_id
+from ..db.database import get_db
+from ..utils.event_hub import event_hub
+from ..utils.logger import logger
+
+
+router = APIRouter()
+
+
+def _ends_stream(event: dict, user_id: str, is_owner: bool) -> bool:
+    """Whether event takes the list away from user_id, so their stream should close."""
+    if event["type"] == "wishlist_deleted":
+        return True
+    if is_owner:
+        return False
+    if event["type"] == "wishlist_unshared":
+        return event["user_id"] == user_id
+    if event["type"] == "wishlist_updated":
+        return user_id not in event["shared_with"]
+    return False
+
+
+async def _event_stream(wishlist_id: int, user_id: str, is_owner: bool):
+    with event_hub.subscribe(wishlist_id) as subscription:
+        # Subscribed from here on: clients load the list once this arrives
+        yield "event: ready\ndata: {}\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), settings.EVENT_STREAM_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                # A comment line, so proxies do not close an idle stream
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+            if _ends_stream(event, user_id, is_owner):
+                logger.info("[stream_wishlist_events] Closing stream of user %s on wishlist %s (%s)", user_id, wishlist_id, event['type'])
+                return
+
+
+# Live changes to a wishlist as Server-Sent Events (owner or shared_with).
+# Events: item_created, item_updated (changed fields only), item_deleted,
+# item_reserved, items_batch (ids), wishlist_updated, wishlist_shared,
+# wishlist_unshared and wishlist_deleted. Nothing is replayed: after a
+# reconnect or a "resync" event, reload the list.
+@router.get("/wishlists/{wishlist_id}/events")
+async def stream_wishlist_events(wishlist_id: int, user=Depends(verify_token), db: AsyncSession = Depends(get_db)):
+    user_id = user['uid']
+    logger.info("[stream_wishlist_events] User %s streaming wishlist %s", user_id, wishlist_id)
+    wishlist = await get_wishlist_by_id(db, wishlist_id)
+    if not wishlist:
+        raise HTTPException(status_code=404, detail="Wishlist not found")
+    is_owner = wishlist.owner_id == user_id
+    shared_with_ids = [sw.uid for sw in await wishlist.awaitable_attrs.shared_with]
+    if not is_owner and user_id not in shared_with_ids:
+        raise HTTPException(status_code=403, detail="Not allowed to view this wishlist")
+    # Streams stay open for as long as the page does; hand the connection back now
+    await db.close()
+    return StreamingResponse(
+        _event_stream(wishlist_id, user_id, is_owner),
+        media_type="text/event-stream",
+        # X-Accel-Buffering: stop nginx from holding events back
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Open streams and event counts for this worker (ADMIN_UIDS only)
+@router.get("/events/stats")
+async def get_event_stats(user=Depends(verify_admin)):
+    return event_hub.stats()
@@ -1,70 +1,75 @@
-from fastapi import APIRouter, Depends, Body, Query, BackgroundTasks, HTTPException
-from sqlalchemy.orm import Session
+from typing import Optional
+from fastapi import APIRouter, Depends, Body, Query, HTTPException, Request, Response
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..auth import verify_token
-from ..db.models import GroupDB, GroupMemberDB, UserDB
-from ..db.database import SessionLocal
+from ..db.models import GroupDB, GroupMemberDB
+from ..db.database import get_db
 from ..utils.logger import logger
-from ..utils.email_utils import send_invite_email_background, is_valid_email
+from ..utils.http_cache import cache_headers, etag_matches, make_etag, not_modified
+from ..utils.email_utils import queue_group_invite_emails, queue_invite_email, is_valid_email
 from ..config import settings
 from ..models import CreateGroupRequest
+from ..db.crud import (
+    get_data_version, get_user_by_email, get_users_by_emails,
+    get_group_members as crud_get_group_members, search_groups as crud_search_groups,
+)
+from ..utils.pagination import decode_cursor, next_page_headers, page_cursor, page_size
 
 
 router = APIRouter()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.post("/groups")
-def create_group(request: CreateGroupRequest, user=Depends(verify_token), db: Session = Depends(get_db)):
+async def create_group(request: CreateGroupRequest, user=Depends(verify_token), db: AsyncSession = Depends(get_db)):
     """Create a new group."""
     try:
         name = request.name
-        users = request.users
+        # Deduplicate while keeping order; the owner is added separately
+        users = list(dict.fromkeys(request.users))
         # Check if Group Name already exists
-        if db.query(GroupDB).filter_by(name=name).first():
+        if await db.scalar(select(GroupDB).filter_by(name=name)):
             raise HTTPException(status_code=409, detail="Group name already exists")
-        logger.info(f"[create_group] User {user['uid']} creating group '{name}' with users {users}")
+        logger.info("[create_group] User %s creating group '%s' with %s users", user['uid'], name, len(users))
         for user_email in users:
             if not is_valid_email(user_email):
                 raise HTTPException(status_code=400, detail=f"Invalid email: {user_email}")
-        users_objects = [UserDB(email=user_email) for user_email in users]
-        logger.debug(f"[create_group] Users objects: {users_objects}")
+        uids_by_email = await get_users_by_emails(db, users)
         group = GroupDB(name=name, owner_id=user['uid'])
         db.add(group)
-        db.commit()
-        db.refresh(group)
-        db.add(GroupMemberDB(group_id=group.id, user_id=user['uid']))
-        for user_obj in users_objects:
-            db.add(GroupMemberDB(group_id=group.id, user_id=user_obj.uid))
-            db.flush()
-        db.commit()
-        logger.info(f"[create_group] Group created: id={group.id}, name={group.name}")
+        await db.flush()
+        member_uids = dict.fromkeys([user['uid'], *uids_by_email.values()])
+        await db.execute(
+            insert(GroupMemberDB),
+            [{"group_id": group.id, "user_id": uid} for uid in member_uids],
+        )
+        unknown_emails = [email for email in users if email not in uids_by_email]
+        await queue_group_invite_emails(db, group.id, name, unknown_emails, logger)
+        await db.commit()
+        logger.info(
+            "[create_group] Group created: id=%s, name=%s, members=%s, invited=%s",
+            group.id, group.name, len(member_uids), len(unknown_emails),
+        )
         return {"group_id": group.id, "name": group.name}
     except Exception as e:
-        logger.error(f"[create_group] Error: {e}")
+        logger.error("[create_group] Error: %s", e)
         raise
 
 
 
-# Group search endpoint for sharing dialog
+# Group search endpoint for sharing dialog; X-Next-Cursor continues it
 @router.get("/groups/search")
-def search_groups(
+async def search_groups(
+    response: Response,
     q: str = Query(..., description="Search query for group name"),
-    limit: int = Query(10, description="Max results to return"),
-    db: Session = Depends(get_db)
+    limit: int = page_size(10, settings.SEARCH_LIMIT_MAX),
+    cursor: Optional[str] = page_cursor(),
+    db: AsyncSession = Depends(get_db)
 ):
-    logger.info(f"[search_groups] Searching groups with query: {q}")
-    query = db.query(GroupDB).filter(
-        GroupDB.name.ilike(f"%{q}%")
-    ).limit(limit)
-    groups = query.all()
+    logger.info("[search_groups] Searching groups with query: %s", q)
+    groups, next_key = await crud_search_groups(db, q, limit, decode_cursor(cursor, "group-search", int, int))
+    response.headers.update(next_page_headers("group-search", next_key))
     return [{
         "id": group.id,
         "name": group.name,
@@ -73,53 +78,58 @@ def search_groups(
 
 
 @router.post("/groups/{group_id}/members")
-def add_member_to_group(
+async def add_member_to_group(
     group_id: int,
-    background_tasks: BackgroundTasks,
     email: str = Body(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Add a new member to an existing group. If user does not exist, send invite email."""
-    logger.info(f"[add_member_to_group] Add member to group {group_id} with email {email}")
+    logger.info("[add_member_to_group] Add member to group %s with email %s", group_id, email)
     try:
         if not is_valid_email(email):
             raise HTTPException(status_code=400, detail="Invalid email address")
-        user = db.query(UserDB).filter(UserDB.email == email).first()
+        user = await get_user_by_email(db, email)
         if not user:
-            group = db.query(GroupDB).filter(GroupDB.id == group_id).first()
+            group = await db.get(GroupDB, group_id)
             group_name = group.name if group else None
             invite_link = f"{settings.WEBSITE_URL}/invite?group_id={group_id}&email={email}"
-            send_invite_email_background(background_tasks, email, invite_link, logger, group_name)
-            logger.info(f"[add_member_to_group] Invite sent to {email} for group {group_id}")
+            await queue_invite_email(db, email, invite_link, f"group-invite:{group_id}:{email}", logger, group_name)
+            await db.commit()
+            logger.info("[add_member_to_group] Invite sent to %s for group %s", email, group_id)
             return {"message": f"Invite sent to {email}."}
-        exists = db.query(GroupMemberDB).filter_by(group_id=group_id, user_id=user.uid).first()
+        exists = await db.get(GroupMemberDB, (group_id, user.uid))
         if exists:
-            logger.warning(f"[add_member_to_group] User {user.uid} already a member of group {group_id}")
+            logger.warning("[add_member_to_group] User %s already a member of group %s", user.uid, group_id)
             raise HTTPException(status_code=400, detail="User already a member of group.")
         db.add(GroupMemberDB(group_id=group_id, user_id=user.uid))
-        db.commit()
-        logger.info(f"[add_member_to_group] User {user.uid} added to group {group_id}")
+        await db.commit()
+        logger.info("[add_member_to_group] User %s added to group %s", user.uid, group_id)
         return {"message": f"User {email} added to group."}
     except Exception as e:
-        logger.error(f"[add_member_to_group] Error: {e}")
+        logger.error("[add_member_to_group] Error: %s", e)
         raise
 
 
 @router.get("/groups/{group_id}/members")
-def get_group_members(
+async def get_group_members(
     group_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    limit: int = page_size(),
+    cursor: Optional[str] = page_cursor(),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get all members of a group as user dicts."""
-    group = db.query(GroupDB).filter(GroupDB.id == group_id).first()
+    """Get the members of a group as user dicts, a page at a time in uid order."""
+    after = decode_cursor(cursor, "group-members", str)
+    etag = make_etag("group-members", group_id, after, limit, await get_data_version(db))
+    if etag_matches(request, etag):
+        return not_modified(etag, "no-cache")
+    group = await db.get(GroupDB, group_id)
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
-    members = (
-        db.query(UserDB)
-        .join(GroupMemberDB, GroupMemberDB.user_id == UserDB.uid)
-        .filter(GroupMemberDB.group_id == group_id)
-        .all()
-    )
+    members, next_key = await crud_get_group_members(db, group_id, after=after, limit=limit)
+    response.headers.update(cache_headers(etag, "no-cache"))
+    response.headers.update(next_page_headers("group-members", next_key))
     return [
         {
             "uid": user.uid,
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from ..auth import verify_admin, verify_metrics_scraper
+from ..utils import metrics
+
+
+router = APIRouter()
+
+
+# Prometheus scrape endpoint (text exposition format 0.0.4); it re-exports
+# the stats endpoints, so it is locked down the same way
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(user=Depends(verify_metrics_scraper)):
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# Most recent statements slower than SLOW_QUERY_MS, newest first; raw SQL,
+# so ADMIN_UIDS only
+@router.get("/metrics/slow-queries")
+async def get_slow_queries(user=Depends(verify_admin)):
+    return list(reversed(metrics.slow_query_samples))
@@ -1,10 +1,24 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..auth import verify_token
+from ..config import settings
+from ..db.crud import get_item_names_for_owner
+from ..db.database import get_db
+from ..recommender import recommend
 from ..utils.logger import logger
 
 router = APIRouter()
 
 @router.get("/recommendations/{user_id}")
-def get_recommendations(user_id: str):
-    logger.info(f"[get_recommendations] Fetching recommendations for user {user_id}")
-    # TODO: Integrate ML recommendation logic
-    return {"recommendations": ["Gift Card", "Book", "Headphones"]}
+async def get_recommendations(
+    user_id: str,
+    limit: int = Query(settings.RECOMMENDER_TOP_K, ge=1, le=100, description="Max recommendations to return"),
+    user=Depends(verify_token),
+    db: AsyncSession = Depends(get_db),
+):
+    logger.info("[get_recommendations] Fetching recommendations for user %s", user_id)
+    # Built from the user's own item names, so only for themselves
+    if user_id != user['uid']:
+        raise HTTPException(status_code=403, detail="Not allowed to view recommendations for this user")
+    item_names = await get_item_names_for_owner(db, user_id)
+    return {"recommendations": recommend(item_names, limit)}
@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models import SyncItem, SyncResponse, WishListRequest
+from ..auth import verify_token
+from ..db.database import get_db
+from ..db.crud import get_changes_for_user, get_reserver_names
+from ..utils.logger import logger
+
+
+router = APIRouter()
+
+
+# Incremental sync for offline clients: send back the token from the last
+# response and get only what changed since. Wishlists come without items;
+# changed items are listed separately with their wishlist_id.
+@router.get("/sync", response_model=SyncResponse)
+async def sync(
+    since: int = Query(0, description="Token from the previous /sync response; 0 for a full snapshot"),
+    user=Depends(verify_token),
+    db: AsyncSession = Depends(get_db),
+):
+    user_id = user['uid']
+    logger.info("[sync] User %s syncing since %s", user_id, since)
+    changes = await get_changes_for_user(db, user_id, since)
+    user_map = await get_reserver_names(db, changes["items"])
+    wishlists = [WishListRequest(
+        id=db_wishlist.id,
+        name=db_wishlist.name,
+        owner_id=db_wishlist.owner_id,
+        owner_first_name=db_wishlist.owner_user.first_name.capitalize() if db_wishlist.owner_user.first_name else "",
+        owner_last_name=db_wishlist.owner_user.last_name.capitalize() if db_wishlist.owner_user.last_name else "",
+        items=[],
+        shared_with=[sw.uid for sw in db_wishlist.shared_with],
+        tag=db_wishlist.tag
+    ) for db_wishlist in changes["wishlists"]]
+    items = [SyncItem(
+        id=item.id,
+        wishlist_id=item.wishlist_id,
+        name=item.name,
+        reserved=item.reserved,
+        reserved_by=item.reserved_by,
+        reserved_by_name=user_map.get(item.reserved_by) if item.reserved_by else None,
+        link=item.link
+    ) for item in changes["items"]]
+    logger.debug(
+        "[sync] User %s: %s wishlists, %s items, %s + %s deletions (token %s)",
+        user_id, len(wishlists), len(items), len(changes['deleted_wishlists']), len(changes['deleted_items']), changes['token'],
+    )
+    return SyncResponse(
+        token=changes["token"],
+        reset=changes["reset"],
+        wishlists=wishlists,
+        items=items,
+        deleted_wishlists=changes["deleted_wishlists"],
+        deleted_items=changes["deleted_items"],
+    )
@@ -1,47 +1,39 @@
-from fastapi import APIRouter, HTTPException, Depends, Request, Query
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, Query
 from ..utils.logger import logger
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..models import UserRequest
-from ..db.database import SessionLocal
-from ..db.crud import get_user_by_uid, create_user
-from sqlalchemy.orm import Session
-from ..db.models import UserDB
-from ..auth import verify_token
+from ..db.database import get_db
+from ..db.crud import get_user_by_uid, create_user, search_users as crud_search_users
+from ..config import settings
+from ..utils.pagination import decode_cursor, next_page_headers, page_cursor, page_size
 
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 
 @router.post("/register", response_model=UserRequest)
-def register_user(user: UserRequest, request: Request, db: Session = Depends(get_db)):
-    logger.info(f"[register_user] Registering user {user.uid}")
-    if get_user_by_uid(db, user.uid):
+async def register_user(user: UserRequest, request: Request, db: AsyncSession = Depends(get_db)):
+    logger.info("[register_user] Registering user %s", user.uid)
+    if await get_user_by_uid(db, user.uid):
         raise HTTPException(status_code=400, detail="User already exists")
-    create_user(db, user)
+    await create_user(db, user)
     return user
 
 
-# User search endpoint for sharing dialog
+# User search endpoint for sharing dialog; X-Next-Cursor continues it
 @router.get("/search", response_model=list[UserRequest])
-def search_users(
+async def search_users(
+    response: Response,
     q: str = Query(..., description="Search query for user email or name"),
-    limit: int = Query(10, description="Max results to return"),
-    db: Session = Depends(get_db)
+    limit: int = page_size(10, settings.SEARCH_LIMIT_MAX),
+    cursor: Optional[str] = page_cursor(),
+    db: AsyncSession = Depends(get_db)
 ):
-    logger.info(f"[search_users] Searching users with query: {q}")
-    query = db.query(UserDB).filter(
-        (UserDB.email.ilike(f"%{q}%")) |
-        (UserDB.first_name.ilike(f"%{q}%")) |
-        (UserDB.last_name.ilike(f"%{q}%"))
-    ).limit(limit)
-    users = query.all()
+    logger.info("[search_users] Searching users with query: %s", q)
+    # The key is (tier, rowid) on SQLite and (tier, uid) elsewhere
+    users, next_key = await crud_search_users(db, q, limit, decode_cursor(cursor, "user-search", int, (int, str)))
+    response.headers.update(next_page_headers("user-search", next_key))
     return [UserRequest(
         uid=user.uid,
         first_name=user.first_name,
@@ -1,54 +1,86 @@
-from typing import Annotated
-from fastapi import APIRouter, Depends, Request, HTTPException, Body
+from typing import Annotated, Optional
+from fastapi import APIRouter, Depends, Request, Response, HTTPException, Body, Query
 from ..utils.logger import logger
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..models import WishListRequest, CreateWishListRequest, TagEnum
-from ..auth import verify_token
-from ..db.database import SessionLocal
-from ..db.models import WishListDB, WishItemDB
+from ..auth import verify_admin, verify_token
+from ..db.database import get_db
+from ..utils.home_view_cache import home_view_cache
+from ..utils.event_hub import event_hub
+from ..utils.http_cache import cache_headers, etag_matches, make_etag, not_modified
+from ..utils.json_response import ORJSONResponse, item_fields, wishlist_fields
+from ..utils.pagination import decode_cursor, next_page_headers, page_cursor, page_size
+from ..config import settings
+from ..db.models import UserDB, WishListDB, WishItemDB
 from ..db.crud import (
-    get_wishlist_by_id, get_wishlists_for_user, create_wishlist as crud_create_wishlist
+    get_wishlist_by_id, get_wishlists_for_user, get_reserver_names, get_data_version,
+    create_wishlist as crud_create_wishlist
 )
 
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
-
-# Read wishlists (owner or shared_with)
+# Read wishlists (owner or shared_with), a page at a time in id order
+# Pass ?include=items to get every list's items in the same response.
 @router.get("/wishlists", response_model=list[WishListRequest])
-def get_wishlists(request: Request, user=Depends(verify_token), db: Session = Depends(get_db)):
-    logger.info(f"[get_wishlists] User {user['uid']} fetching wishlists")
+async def get_wishlists(
+    request: Request,
+    include: Optional[str] = Query(None, description="Comma-separated extras to embed; supports 'items'"),
+    limit: int = page_size(),
+    cursor: Optional[str] = page_cursor(),
+    user=Depends(verify_token),
+    db: AsyncSession = Depends(get_db)
+):
+    logger.info("[get_wishlists] User %s fetching wishlists (include=%s)", user['uid'], include)
     user_id = user['uid']
-    db_wishlists = get_wishlists_for_user(db, user_id)
-    result = []
-    for db_wishlist in db_wishlists:
-        shared_with = [sw.uid for sw in db_wishlist.shared_with]
-        result.append(WishListRequest(
-            id=db_wishlist.id,
-            name=db_wishlist.name,
-            owner_id=db_wishlist.owner_id,
-            owner_first_name=db_wishlist.owner_user.first_name.capitalize() if db_wishlist.owner_user.first_name else "",
-            owner_last_name=db_wishlist.owner_user.last_name.capitalize() if db_wishlist.owner_user.last_name else "",
-            items=[],  # Items will be fetched via a separate endpoint
-            shared_with=shared_with,
-            tag=db_wishlist.tag
-        ))
-    return result
+    include_items = "items" in (include or "").split(",")
+    after = decode_cursor(cursor, "wishlists", int)
+    page = (include_items, after, limit)
+    # Read before the rows, so a tag can only be older than the body it labels
+    data_version = await get_data_version(db)
+    etag = make_etag("wishlists", user_id, *page, data_version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    cached = home_view_cache.get(user_id, page)
+    if cached is not None:
+        # Tagged with the version it was read at, which may trail data_version
+        # after a write handled by another worker or one the cache ignores
+        cached_version, body, next_key = cached
+        etag = make_etag("wishlists", user_id, *page, cached_version)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        return ORJSONResponse(body, headers={**cache_headers(etag), **next_page_headers("wishlists", next_key)})
+    version = home_view_cache.clock
+    db_wishlists, next_key = await get_wishlists_for_user(
+        db, user_id, include_items=include_items, after=after, limit=limit,
+    )
+    user_map = {}
+    if include_items:
+        user_map = await get_reserver_names(db, [item for wl in db_wishlists for item in wl.items])
+    # Without include=items, items are fetched via a separate endpoint
+    response = ORJSONResponse([
+        wishlist_fields(db_wishlist, [item_fields(item, user_map) for item in db_wishlist.items] if include_items else [])
+        for db_wishlist in db_wishlists
+    ], headers={**cache_headers(etag), **next_page_headers("wishlists", next_key)})
+    # The encoded body is cached, so a hit is sent without serializing again
+    home_view_cache.put(user_id, page, (data_version, response.body, next_key), [wl.id for wl in db_wishlists], version)
+    return response
+
+
+# Hit rate and size of the GET /wishlists cache (ADMIN_UIDS only)
+@router.get("/home-view/stats")
+async def get_home_view_stats(user=Depends(verify_admin)):
+    return home_view_cache.stats()
 
 
 # Create a wishlist (owner only)
 @router.post("/wishlists", response_model=WishListRequest)
-def create_wishlist(wishlist: CreateWishListRequest, request: Request, user=Depends(verify_token), db: Session = Depends(get_db)):
-    logger.info(f"[create_wishlist] User {user['uid']} creating wishlist {wishlist.id}")
-    if get_wishlist_by_id(db, wishlist.id):
+async def create_wishlist(wishlist: CreateWishListRequest, request: Request, user=Depends(verify_token), db: AsyncSession = Depends(get_db)):
+    logger.info("[create_wishlist] User %s creating wishlist %s", user['uid'], wishlist.id)
+    if await get_wishlist_by_id(db, wishlist.id):
         raise HTTPException(status_code=400, detail="Wishlist already exists")
     
     db_wishlist = WishListDB(
@@ -57,13 +89,15 @@ def create_wishlist(wishlist: CreateWishListRequest, request: Request, user=Depe
         name=wishlist.name,
         tag=wishlist.tag,
     )
-    db_wishlist = crud_create_wishlist(db, db_wishlist)
+    db_wishlist = await crud_create_wishlist(db, db_wishlist)
+    home_view_cache.invalidate_user(user['uid'])
+    owner_user = await db_wishlist.awaitable_attrs.owner_user
     return WishListRequest(
         id=db_wishlist.id,
         name=db_wishlist.name,
         owner_id=db_wishlist.owner_id,
-        owner_first_name=db_wishlist.owner_user.first_name,
-        owner_last_name=db_wishlist.owner_user.last_name,
+        owner_first_name=owner_user.first_name,
+        owner_last_name=owner_user.last_name,
         items=[],
         shared_with=[],
         tag=db_wishlist.tag
@@ -72,38 +106,68 @@ def create_wishlist(wishlist: CreateWishListRequest, request: Request, user=Depe
 
 # Edit a wishlist (owner only)
 @router.put("/wishlists/{wishlist_id}", response_model=WishListRequest)
-def update_wishlist(wishlist_id: int, wishlist_update: WishListRequest, request: Request, user=Depends(verify_token), db: Session = Depends(get_db)):
-    logger.info(f"[update_wishlist] User {user['uid']} updating wishlist {wishlist_id}")
-    wishlist = get_wishlist_by_id(db, wishlist_id)
+async def update_wishlist(wishlist_id: int, wishlist_update: WishListRequest, request: Request, user=Depends(verify_token), db: AsyncSession = Depends(get_db)):
+    logger.info("[update_wishlist] User %s updating wishlist %s", user['uid'], wishlist_id)
+    wishlist = await get_wishlist_by_id(db, wishlist_id)
     if not wishlist:
         raise HTTPException(status_code=404, detail="Wishlist not found")
     if wishlist.owner_id != user['uid']:
         raise HTTPException(status_code=403, detail="Not allowed to edit this wishlist")
     wishlist.name = wishlist_update.name
     wishlist.tag = wishlist_update.tag
-    wishlist.shared_with = wishlist_update.shared_with or []
-    db.commit()
-    db.refresh(wishlist)
-    return wishlist
+    # shared_with arrives as uids; resolve them to users for the relationship
+    shared_users = []
+    if wishlist_update.shared_with:
+        shared_users = list(await db.scalars(select(UserDB).where(UserDB.uid.in_(wishlist_update.shared_with))))
+    previously_shared = [u.uid for u in await wishlist.awaitable_attrs.shared_with]
+    wishlist.shared_with = shared_users
+    await db.commit()
+    home_view_cache.invalidate_wishlist(wishlist_id, previously_shared + [u.uid for u in shared_users])
+    await event_hub.publish(
+        wishlist_id, "wishlist_updated",
+        name=wishlist.name, tag=wishlist.tag, shared_with=[u.uid for u in shared_users],
+    )
+    owner_user = await wishlist.awaitable_attrs.owner_user
+    return WishListRequest(
+        id=wishlist.id,
+        name=wishlist.name,
+        owner_id=wishlist.owner_id,
+        owner_first_name=owner_user.first_name,
+        owner_last_name=owner_user.last_name,
+        items=[],
+        shared_with=[u.uid for u in shared_users],
+        tag=wishlist.tag
+    )
 
 
 # Delete a wishlist (owner only)
 @router.delete("/wishlists/{wishlist_id}")
-def delete_wishlist(wishlist_id: int, user=Depends(verify_token), db: Session = Depends(get_db)):
-    logger.info(f"[delete_wishlist] User {user['uid']} deleting wishlist {wishlist_id}")
-    wishlist = get_wishlist_by_id(db, wishlist_id)
+async def delete_wishlist(wishlist_id: int, user=Depends(verify_token), db: AsyncSession = Depends(get_db)):
+    logger.info("[delete_wishlist] User %s deleting wishlist %s", user['uid'], wishlist_id)
+    wishlist = await get_wishlist_by_id(db, wishlist_id)
     if not wishlist:
         raise HTTPException(status_code=404, detail="Wishlist not found")
     if wishlist.owner_id != user['uid']:
         raise HTTPException(status_code=403, detail="Not allowed to delete this wishlist")
-    db.delete(wishlist)
-    db.commit()
+    await db.delete(wishlist)
+    await db.commit()
+    home_view_cache.invalidate_wishlist(wishlist_id)
+    await event_hub.publish(wishlist_id, "wishlist_deleted")
     return {"message": "Wishlist deleted!"}
 
 
 # Endpoint to get available tag options
+# The tags only change with a deploy, so browsers keep them for a day
+WISHLIST_TAGS = [tag.value for tag in TagEnum]
+WISHLIST_TAGS_ETAG = make_etag("wishlist-tags", *WISHLIST_TAGS)
+
+
 @router.get("/wishlist-tags", response_model=list[str])
-def get_wishlist_tags():
-    logger.info(f"[get_wishlist_tags] Fetching wishlist tags")
-    return [tag.value for tag in TagEnum]
+async def get_wishlist_tags(request: Request, response: Response):
+    logger.info("[get_wishlist_tags] Fetching wishlist tags")
+    cache_control = f"public, max-age={settings.WISHLIST_TAGS_MAX_AGE_SECONDS}"
+    if etag_matches(request, WISHLIST_TAGS_ETAG):
+        return not_modified(WISHLIST_TAGS_ETAG, cache_control)
+    response.headers.update(cache_headers(WISHLIST_TAGS_ETAG, cache_control))
+    return WISHLIST_TAGS
 
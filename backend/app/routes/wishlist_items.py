@@ -1,36 +1,36 @@
 from typing import Optional
-from fastapi import APIRouter, Depends, Request, HTTPException, Body
+from fastapi import APIRouter, Depends, Request, HTTPException, Body, Query
 from ..utils.logger import logger
-from sqlalchemy.orm import Session
-from ..models import WishItemRequest
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models import ItemBatchRequest, WishItemRequest
 from ..auth import verify_token
-from ..db.database import SessionLocal
-from ..db.models import WishItemDB, UserDB
+from ..db.database import get_db
+from ..utils.home_view_cache import home_view_cache
+from ..utils.event_hub import event_hub
+from ..utils.http_cache import cache_headers, etag_matches, make_etag, not_modified
+from ..utils.json_response import ORJSONResponse, item_fields
+from ..utils.pagination import decode_cursor, next_page_headers, page_cursor, page_size
+from ..db.models import WishItemDB
 from ..db.crud import (
-    get_wishlist_by_id, get_items_for_wishlist, add_item_to_wishlist
+    get_wishlist_by_id, get_items_for_wishlist, get_item_in_wishlist, get_reserver_names,
+    add_item_to_wishlist, toggle_item_reservation, get_item_ids_in_wishlist, apply_item_batch,
+    get_data_version, is_shared_with
 )
 
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # Create a wishlist item (owner only)
 @router.post("/wishlists/{wishlist_id}/items")
-def add_item_to_wishlist_route(wishlist_id: int, item: WishItemRequest, request: Request = None, user=Depends(verify_token), db: Session = Depends(get_db)):
-    logger.info(f"[add_item_to_wishlist] User {user['uid']} adding item to wishlist {wishlist_id}")
-    wishlist = get_wishlist_by_id(db, wishlist_id)
+async def add_item_to_wishlist_route(wishlist_id: int, item: WishItemRequest, request: Request = None, user=Depends(verify_token), db: AsyncSession = Depends(get_db)):
+    logger.info("[add_item_to_wishlist] User %s adding item to wishlist %s", user['uid'], wishlist_id)
+    wishlist = await get_wishlist_by_id(db, wishlist_id)
     if not wishlist:
         raise HTTPException(status_code=404, detail="Wishlist not found")
     if wishlist.owner_id != user['uid']:
         raise HTTPException(status_code=403, detail="Not allowed to edit this wishlist")
     # Check for duplicate item id
-    if any(existing_item.id == item.id for existing_item in get_items_for_wishlist(db, wishlist_id)):
+    if await get_item_in_wishlist(db, wishlist_id, item.id):
         raise HTTPException(status_code=400, detail="Item with this ID already exists")
     db_item = WishItemDB(
         wishlist_id=wishlist_id,
@@ -39,111 +39,179 @@ def add_item_to_wishlist_route(wishlist_id: int, item: WishItemRequest, request:
         reserved_by=item.reserved_by,
         link=item.link
     )
-    db_item = add_item_to_wishlist(db, db_item)
-    return WishItemRequest(
+    db_item = await add_item_to_wishlist(db, db_item)
+    created = WishItemRequest(
         id=db_item.id,
         name=db_item.name,
         reserved=db_item.reserved,
         reserved_by=db_item.reserved_by,
         link=db_item.link
     )
+    await event_hub.publish(wishlist_id, "item_created", item=created.model_dump(exclude={"reserved_by_name"}))
+    return created
 
 
-# Get all items for a wishlist (owner or shared_with)
+# Create, update and delete many items at once (owner only), in one transaction
+@router.post("/wishlists/{wishlist_id}/items:batch")
+async def batch_wishlist_items(wishlist_id: int, batch: ItemBatchRequest, user=Depends(verify_token), db: AsyncSession = Depends(get_db)):
+    operations = batch.operations
+    logger.info("[batch_wishlist_items] User %s applying %s item operations to wishlist %s", user['uid'], len(operations), wishlist_id)
+    wishlist = await get_wishlist_by_id(db, wishlist_id)
+    if not wishlist:
+        raise HTTPException(status_code=404, detail="Wishlist not found")
+    if wishlist.owner_id != user['uid']:
+        raise HTTPException(status_code=403, detail="Not allowed to edit this wishlist")
+    creates, updates, deletes = [], [], []
+    for index, operation in enumerate(operations):
+        if operation.op == "create":
+            if operation.name is None:
+                raise HTTPException(status_code=400, detail=f"Operation {index}: create needs a name")
+            creates.append(operation)
+        elif operation.id is None:
+            raise HTTPException(status_code=400, detail=f"Operation {index}: {operation.op} needs an item id")
+        elif operation.op == "update":
+            updates.append(operation)
+        else:
+            deletes.append(operation.id)
+    # Ids are checked as sets: within the batch, then against the wishlist in one query
+    target_ids = [operation.id for operation in updates] + deletes
+    if len(set(target_ids)) != len(target_ids):
+        raise HTTPException(status_code=400, detail="Each item can only be updated or deleted once per batch")
+    existing_ids = await get_item_ids_in_wishlist(db, wishlist_id, target_ids)
+    missing_ids = set(target_ids) - existing_ids
+    if missing_ids:
+        raise HTTPException(status_code=404, detail=f"Items not found: {sorted(missing_ids)}")
+    created_ids = await apply_item_batch(
+        db,
+        wishlist_id,
+        creates=[operation.model_dump(include={"name", "link", "reserved", "reserved_by"}) for operation in creates],
+        updates=[
+            operation.model_dump(include={"id", "name", "link"} & operation.model_fields_set)
+            for operation in updates if {"name", "link"} & operation.model_fields_set
+        ],
+        deletes=deletes,
+    )
+    logger.info(
+        "[batch_wishlist_items] Wishlist %s: created=%s, updated=%s, deleted=%s",
+        wishlist_id, len(created_ids), len(updates), len(deletes),
+    )
+    await event_hub.publish(
+        wishlist_id, "items_batch",
+        created=created_ids, updated=[operation.id for operation in updates], deleted=deletes,
+    )
+    return {
+        "created": [WishItemRequest(
+            id=item_id,
+            name=operation.name,
+            reserved=operation.reserved,
+            reserved_by=operation.reserved_by,
+            link=operation.link
+        ) for item_id, operation in zip(created_ids, creates)],
+        "updated": len(updates),
+        "deleted": len(deletes),
+    }
+
+
+# Get the items of a wishlist (owner or shared_with), a page at a time in id order
 @router.get("/wishlists/{wishlist_id}/items", response_model=list[WishItemRequest])
-def get_all_items_for_wishlist(wishlist_id: int, user=Depends(verify_token), db: Session = Depends(get_db)):
-    logger.info(f"[get_all_items_for_wishlist] User {user['uid']} fetching items for wishlist {wishlist_id}")
-    wishlist = get_wishlist_by_id(db, wishlist_id)
+async def get_all_items_for_wishlist(
+    wishlist_id: int,
+    request: Request,
+    limit: int = page_size(),
+    cursor: Optional[str] = page_cursor(),
+    user=Depends(verify_token),
+    db: AsyncSession = Depends(get_db),
+):
+    logger.info("[get_all_items_for_wishlist] User %s fetching items for wishlist %s", user['uid'], wishlist_id)
+    user_id = user['uid']
+    after = decode_cursor(cursor, "items", int)
+    # Check access before the tag, so a 304 tells nothing to anyone else
+    wishlist = await get_wishlist_by_id(db, wishlist_id)
     if not wishlist:
         raise HTTPException(status_code=404, detail="Wishlist not found")
     # Only allow access if user is owner or in shared_with
-    user_id = user['uid']
-    shared_with_ids = [sw.uid for sw in wishlist.shared_with]
-    if wishlist.owner_id != user_id and user_id not in shared_with_ids:
+    if wishlist.owner_id != user_id and not await is_shared_with(db, wishlist_id, user_id):
         raise HTTPException(status_code=403, detail="Not allowed to view items in this wishlist")
-    items = get_items_for_wishlist(db, wishlist_id)
-    # Collect all reserved_by user IDs (excluding None)
-    reserved_by_ids = set(item.reserved_by for item in items if item.reserved_by)
-    user_map = {}
-    if reserved_by_ids:
-        users = db.query(UserDB).filter(UserDB.uid.in_(reserved_by_ids)).all()
-        user_map = {user.uid: f"{user.first_name} {user.last_name}".capitalize() for user in users}
-    return [WishItemRequest(
-        id=item.id,
-        name=item.name,
-        reserved=item.reserved,
-        reserved_by=item.reserved_by,
-        reserved_by_name=user_map.get(item.reserved_by) if item.reserved_by else None,
-        link=item.link
-    ) for item in items]
+    etag = make_etag("items", user_id, wishlist_id, after, limit, await get_data_version(db))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    items, next_key = await get_items_for_wishlist(db, wishlist_id, after=after, limit=limit)
+    user_map = await get_reserver_names(db, items)
+    return ORJSONResponse(
+        [item_fields(item, user_map) for item in items],
+        headers={**cache_headers(etag), **next_page_headers("items", next_key)},
+    )
 
 
 # Update a wishlist item (owner only)
 @router.put("/wishlists/{wishlist_id}/items/{item_id}")
-def update_wishlist_item(wishlist_id: int, item_id: int, item_update: dict = Body(...), user=Depends(verify_token), db: Session = Depends(get_db)):
-    logger.info(f"[update_wishlist_item] User {user['uid']} updating item {item_id} in wishlist {wishlist_id}")
-    wishlist = get_wishlist_by_id(db, wishlist_id)
+async def update_wishlist_item(wishlist_id: int, item_id: int, item_update: dict = Body(...), user=Depends(verify_token), db: AsyncSession = Depends(get_db)):
+    logger.info("[update_wishlist_item] User %s updating item %s in wishlist %s", user['uid'], item_id, wishlist_id)
+    wishlist = await get_wishlist_by_id(db, wishlist_id)
     if not wishlist:
         raise HTTPException(status_code=404, detail="Wishlist not found")
     if wishlist.owner_id != user['uid']:
         raise HTTPException(status_code=403, detail="Not allowed to edit this wishlist")
-    item = db.query(WishItemDB).filter(WishItemDB.id == item_id, WishItemDB.wishlist_id == wishlist_id).first()
+    item = await get_item_in_wishlist(db, wishlist_id, item_id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     if 'name' in item_update:
         item.name = item_update['name']
     if 'link' in item_update:
         item.link = item_update['link']
-    db.commit()
-    db.refresh(item)
+    await db.commit()
+    home_view_cache.invalidate_wishlist(wishlist_id)
+    changed = {field: item_update[field] for field in ('name', 'link') if field in item_update}
+    await event_hub.publish(wishlist_id, "item_updated", item={"id": item_id, **changed})
     return {"message": "Item updated!"}
 
 
 # Delete a wishlist item (owner only)
 @router.delete("/wishlists/{wishlist_id}/items/{item_id}")
-def delete_wishlist_item(wishlist_id: int, item_id: int, user=Depends(verify_token), db: Session = Depends(get_db)):
-    logger.info(f"[delete_wishlist_item] User {user['uid']} deleting item {item_id} from wishlist {wishlist_id}")
-    wishlist = get_wishlist_by_id(db, wishlist_id)
+async def delete_wishlist_item(wishlist_id: int, item_id: int, user=Depends(verify_token), db: AsyncSession = Depends(get_db)):
+    logger.info("[delete_wishlist_item] User %s deleting item %s from wishlist %s", user['uid'], item_id, wishlist_id)
+    wishlist = await get_wishlist_by_id(db, wishlist_id)
     if not wishlist:
         raise HTTPException(status_code=404, detail="Wishlist not found")
     if wishlist.owner_id != user['uid']:
         raise HTTPException(status_code=403, detail="Not allowed to delete from this wishlist")
-    item = db.query(WishItemDB).filter(WishItemDB.id == item_id, WishItemDB.wishlist_id == wishlist_id).first()
+    item = await get_item_in_wishlist(db, wishlist_id, item_id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
-    db.delete(item)
-    db.commit()
+    await db.delete(item)
+    await db.commit()
+    home_view_cache.invalidate_wishlist(wishlist_id)
+    await event_hub.publish(wishlist_id, "item_deleted", item_id=item_id)
     return {"message": "Item deleted!"}
 
 
-# Reserve a gift (shared_with only)
+# Reserve a gift (shared_with only); reserving an item you hold releases it.
+# Always for the caller: reserved_by is only checked, for older clients
 @router.post("/wishlists/{wishlist_id}/reserve/{item_id}")
-def reserve_gift(wishlist_id: int, item_id: int, reserved_by: Optional[str] = None, request: Request = None, user=Depends(verify_token), db: Session = Depends(get_db)):
-    logger.info(f"[reserve_gift] User {user['uid']} reserving item {item_id} in wishlist {wishlist_id}")
-    wishlist = get_wishlist_by_id(db, wishlist_id)
-    if not wishlist:
-        raise HTTPException(status_code=404, detail="Wishlist not found")
+async def reserve_gift(
+    wishlist_id: int,
+    item_id: int,
+    reserved_by: Optional[str] = Query(None, deprecated=True, description="If given, must be the caller's uid"),
+    user=Depends(verify_token),
+    db: AsyncSession = Depends(get_db),
+):
+    logger.info("[reserve_gift] User %s reserving item %s in wishlist %s", user['uid'], item_id, wishlist_id)
     user_id = user['uid']
-    if wishlist.owner_id == user_id and user_id not in (wishlist.shared_with or []):
-        raise HTTPException(status_code=403, detail="Not allowed to reserve this wishlist")
-    item = db.query(WishItemDB).filter(WishItemDB.id == item_id, WishItemDB.wishlist_id == wishlist_id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Item not found")
-    user_id = user['uid']
-    # If already reserved, allow un-reserve only if reserved_by matches user
-    if item.reserved:
-        if item.reserved_by == user_id:
-            item.reserved = False
-            item.reserved_by = None
-            db.commit()
-            db.refresh(item)
-            return {"message": "Gift un-reserved!"}
-        else:
-            raise HTTPException(status_code=400, detail="Item already reserved")
-    # Otherwise, reserve as normal
-    item.reserved = True
-    item.reserved_by = reserved_by
-    db.commit()
-    db.refresh(item)
-    return {"message": "Gift reserved!"}
-
+    if reserved_by is not None and reserved_by != user_id:
+        raise HTTPException(status_code=403, detail="Cannot reserve for another user")
+    reserved = await toggle_item_reservation(db, wishlist_id, item_id, user_id)
+    if reserved is None:
+        # Nothing changed; only this path pays for finding out why
+        wishlist = await get_wishlist_by_id(db, wishlist_id)
+        if not wishlist:
+            raise HTTPException(status_code=404, detail="Wishlist not found")
+        if wishlist.owner_id == user_id or not await is_shared_with(db, wishlist_id, user_id):
+            raise HTTPException(status_code=403, detail="Not allowed to reserve this wishlist")
+        if not await get_item_in_wishlist(db, wishlist_id, item_id):
+            raise HTTPException(status_code=404, detail="Item not found")
+        raise HTTPException(status_code=400, detail="Item already reserved")
+    home_view_cache.invalidate_wishlist(wishlist_id)
+    await event_hub.publish(
+        wishlist_id, "item_reserved", item_id=item_id, reserved=reserved, reserved_by=user_id if reserved else None,
+    )
+    return {"message": "Gift reserved!" if reserved else "Gift un-reserved!"}
@@ -0,0 +1,122 @@
+"""Precompiled email templates.
+
+Each email kind is compiled once at import into a list of static chunks and
+placeholders, so rendering is a single join. Values are HTML-escaped in the
+HTML body and left as-is in the subject and plain-text alternative.
+"""
+import html
+import re
+from typing import NamedTuple
+
+from ..config import settings
+
+
+class RenderedEmail(NamedTuple):
+    subject: str
+    html: str
+    text: str
+
+
+_PLACEHOLDER = re.compile(r"\$\{(\w+)\}")
+
+
+class CompiledTemplate:
+    """A template string split into static text and ``${name}`` placeholders."""
+
+    def __init__(self, source: str, escape=None):
+        parts = _PLACEHOLDER.split(source)
+        # split() alternates static text and placeholder names
+        self._static = parts[0::2]
+        self._names = parts[1::2]
+        self._escape = escape or (lambda value: value)
+
+    def render(self, values: dict) -> str:
+        chunks = [self._static[0]]
+        for name, static in zip(self._names, self._static[1:]):
+            chunks.append(self._escape(str(values[name])))
+            chunks.append(static)
+        return "".join(chunks)
+
+
+def _escape_html(value: str) -> str:
+    return html.escape(value, quote=True)
+
+
+def _layout(website_url: str) -> tuple[str, str]:
+    """Static HTML around the per-kind content, with site URLs baked in."""
+    website_url = _escape_html(website_url)
+    logo_url = f"{website_url}/static/logo.png"  # Adjust path as needed
+    head = f"""
+    <html>
+    <body style='background:#f7f7fa;padding:0;margin:0;font-family:sans-serif;'>
+        <div style='max-width:480px;margin:40px auto;background:#fff;border-radius:8px;box-shadow:0 2px 8px #0001;padding:32px;'>
+            <div style='text-align:center;margin-bottom:24px;'>
+                <a href='{website_url}'><img src='{logo_url}' alt='Wishful Logo' style='height:48px;'/></a>
+            </div>
+            <h2 style='color:#4a4a4a;text-align:center;margin-bottom:24px;'>"""
+    tail = f"""
+            <div style='color:#888;font-size:14px;margin-top:32px;'>
+                Best wishes,<br>
+                <b>The Wishful Team</b>
+            </div>
+        </div>
+        <div style='text-align:center;color:#aaa;font-size:12px;margin-top:16px;'>
+            <a href='{website_url}' style='color:#aaa;text-decoration:none;'>Visit Wishful</a>
+        </div>
+    </body>
+    </html>
+    """
+    return head, tail
+
+
+_CTA = (
+    "<div style='text-align:center;margin-bottom:32px;'><a href='${cta_url}' "
+    "style='background:#6c63ff;color:#fff;text-decoration:none;padding:12px 32px;border-radius:6px;"
+    "font-weight:bold;font-size:16px;display:inline-block;'>"
+)
+
+
+class EmailTemplate:
+    def __init__(self, subject: str, html_message: str, text_message: str, cta_text: str = None):
+        head, tail = _layout(settings.WEBSITE_URL)
+        cta = f"{_CTA}{cta_text}</a></div>" if cta_text else ""
+        self.subject = CompiledTemplate(subject)
+        self.html = CompiledTemplate(
+            f"{head}{_escape_html(subject)}</h2>"
+            f"\n            <div style='font-size:16px;color:#333;margin-bottom:32px;'>{html_message}</div>"
+            f"\n            {cta}{tail}",
+            escape=_escape_html,
+        )
+        cta_line = f"\n\n{cta_text}: ${{cta_url}}" if cta_text else ""
+        self.text = CompiledTemplate(f"{text_message}{cta_line}\n\nBest wishes,\nThe Wishful Team\n")
+
+    def render(self, **values) -> RenderedEmail:
+        return RenderedEmail(self.subject.render(values), self.html.render(values), self.text.render(values))
+
+
+# Compiled once at import; placeholders in a subject are filled in both the
+# Subject header and the HTML heading.
+TEMPLATES = {
+    "invite": EmailTemplate(
+        subject="You've been invited to join Wishful!",
+        html_message="You have been invited to join a wishlist on Wishful.",
+        text_message="You have been invited to join a wishlist on Wishful.",
+        cta_text="Join Wishlist",
+    ),
+    "group_invite": EmailTemplate(
+        subject="You've been invited to join Wishful!",
+        html_message="You have been invited to join the group '<b>${group_name}</b>' on Wishful.",
+        text_message="You have been invited to join the group '${group_name}' on Wishful.",
+        cta_text="Join Group",
+    ),
+    "shared": EmailTemplate(
+        subject="${from_user_name} has shared their wishlist with you!",
+        html_message="Hi <b>${to_user_name}</b>,<br><br>${from_user_name} has shared their wishlist with you on Wishful!",
+        text_message="Hi ${to_user_name},\n\n${from_user_name} has shared their wishlist with you on Wishful!",
+        cta_text="View Wishlist",
+    ),
+}
+
+
+def render_email(kind: str, **values) -> RenderedEmail:
+    return TEMPLATES[kind].render(**values)
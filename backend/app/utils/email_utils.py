@@ -1,123 +1,163 @@
-from fastapi import BackgroundTasks
 import smtplib
 import ssl
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import os
+from email.header import Header
+import base64
+import hashlib
+import uuid
 import logging
 import re
-from dotenv import load_dotenv
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..config import settings
+from ..db.crud import enqueue_email, enqueue_emails
+from .email_templates import render_email
 
-load_dotenv()
 
-SMTP_SERVER = os.getenv("SMTP_SERVER")
-SMTP_PORT = int(os.getenv("SMTP_PORT"))
-SMTP_USERNAME = os.getenv("SMTP_USERNAME")
-SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
-FROM_EMAIL = os.getenv("FROM_EMAIL")
+def open_smtp_connection() -> smtplib.SMTP:
+    """Open an SMTP connection, upgraded to TLS and logged in as configured.
 
-TEST_EMAIL = os.getenv("TEST_EMAIL")
-
-
-def send_invite_email_background(
-    background_tasks: BackgroundTasks,
+    Called by the outbox worker's mail dispatchers when they first have
+    something to send, so importing this module never touches the SMTP
+    server.
+    """
+    server = smtplib.SMTP(settings.SMTP_SERVER, settings.SMTP_PORT, timeout=30)
+    server.ehlo()
+    if settings.SMTP_USE_TLS:
+        server.starttls(context=ssl.create_default_context())
+        server.ehlo()
+    if settings.SMTP_USERNAME:
+        server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
+    return server
+
+
+async def queue_invite_email(
+    db: AsyncSession,
     to_email: str,
     invite_link: str,
+    idempotency_key: str,
     logger: logging.Logger,
     group_name: str = None
 ):
-    logger.info(f"[send_invite_email_background] Scheduling invite email to {to_email} (group: {group_name})")
-    subject = "You've been invited to join Wishful!"
+    """Add an invite email to the outbox; it is sent once the caller commits."""
+    logger.info("[queue_invite_email] Queueing invite email to %s (group: %s)", to_email, group_name)
     if group_name:
-        message = f"You have been invited to join the group '<b>{group_name}</b>' on Wishful."
-        cta_text = "Join Group"
+        email = render_email("group_invite", group_name=group_name, cta_url=invite_link)
     else:
-        message = "You have been invited to join a wishlist on Wishful."
-        cta_text = "Join Wishlist"
-    html_body = build_email_html(
-        subject=subject,
-        message=message,
-        cta_url=invite_link,
-        cta_text=cta_text
-    )
-    background_tasks.add_task(send_email, to_email, subject, html_body, True)
+        email = render_email("invite", cta_url=invite_link)
+    await enqueue_email(db, idempotency_key, to_email, email.subject, email.html, is_html=True, text_body=email.text)
 
 
-def send_shared_email_background(
-    background_tasks: BackgroundTasks,
+async def queue_group_invite_emails(
+    db: AsyncSession,
+    group_id: int,
+    group_name: str,
+    emails: list[str],
+    logger: logging.Logger,
+):
+    """Add group invites for several emails to the outbox in one statement."""
+    logger.info("[queue_group_invite_emails] Queueing %s invite emails for group %s", len(emails), group_id)
+    rows = []
+    for to_email in emails:
+        invite_link = f"{settings.WEBSITE_URL}/invite?group_id={group_id}&email={to_email}"
+        email = render_email("group_invite", group_name=group_name, cta_url=invite_link)
+        rows.append({
+            "idempotency_key": f"group-invite:{group_id}:{to_email}",
+            "to_email": to_email,
+            "subject": email.subject,
+            "body": email.html,
+            "text_body": email.text,
+            "is_html": True,
+        })
+    await enqueue_emails(db, rows)
+
+
+async def queue_shared_email(
+    db: AsyncSession,
     to_user_name: str,
     to_user_email: str,
     from_user_name: str,
+    idempotency_key: str,
     logger: logging.Logger
 ):
+    """Add a "wishlist shared with you" email to the outbox; sent once the caller commits."""
     to_user_name = to_user_name.capitalize()
     from_user_name = from_user_name.capitalize()
-    logger.info(f"[send_shared_email_background] Scheduling share email to {to_user_email} from {from_user_name}.")
-    subject = f"{from_user_name} has shared their wishlist with you!"
-    message = f"Hi <b>{to_user_name}</b>,<br><br>{from_user_name} has shared their wishlist with you on Wishful!"
-    html_body = build_email_html(
-        subject=subject,
-        message=message,
+    logger.info("[queue_shared_email] Queueing share email to %s from %s.", to_user_email, from_user_name)
+    email = render_email(
+        "shared",
+        to_user_name=to_user_name,
+        from_user_name=from_user_name,
         cta_url=settings.WEBSITE_URL,
-        cta_text="View Wishlist"
     )
-    background_tasks.add_task(send_email, to_user_email, subject, html_body, logger, True)
+    await enqueue_email(db, idempotency_key, to_user_email, email.subject, email.html, is_html=True, text_body=email.text)
+
+
+def _header(value: str) -> str:
+    """Single-line header value, RFC 2047-encoded when it is not plain ASCII."""
+    value = " ".join(value.splitlines())
+    return value if value.isascii() else Header(value, "utf-8").encode()
+
+
+def _mime_part(subtype: str, body: str) -> str:
+    return (
+        f'Content-Type: text/{subtype}; charset="utf-8"\n'
+        "Content-Transfer-Encoding: base64\n\n"
+        + base64.encodebytes(body.encode("utf-8")).decode("ascii")
+    )
+
+
+def build_message(
+    to_email: str,
+    subject: str,
+    body: str,
+    is_html: bool = False,
+    idempotency_key: str = None,
+    text_body: str = None,
+) -> str:
+    """Render a MIME message ready for SMTP.
+
+    Written directly rather than through the email package's generator,
+    which dominated per-message cost for bulk sends. An HTML body with a
+    text_body is sent as multipart/alternative. With an idempotency key the
+    Message-ID is derived from it alone, so a resend after a worker crash,
+    from any host, carries the same id and can be deduplicated.
+    """
+    headers = [
+        f"From: {_header(settings.FROM_EMAIL)}",
+        f"To: {_header(to_email)}",
+        f"Subject: {_header(subject)}",
+        "MIME-Version: 1.0",
+    ]
+    if idempotency_key:
+        # Not email.utils.make_msgid, which adds a timestamp, pid and random part
+        domain = settings.FROM_EMAIL.split("@")[-1] if "@" in settings.FROM_EMAIL else "localhost"
+        headers.append(f"Message-ID: <{hashlib.sha256(idempotency_key.encode()).hexdigest()[:32]}@{domain}>")
+    if is_html and text_body:
+        boundary = f"=={uuid.uuid4().hex}=="
+        headers.append(f'Content-Type: multipart/alternative; boundary="{boundary}"')
+        return (
+            "\n".join(headers) + "\n\n"
+            f"--{boundary}\n{_mime_part('plain', text_body)}\n"
+            f"--{boundary}\n{_mime_part('html', body)}\n"
+            f"--{boundary}--\n"
+        )
+    return "\n".join(headers) + "\n" + _mime_part("html" if is_html else "plain", body)
 
 
 def send_email(to_email: str, subject: str, body: str, logger: logging.Logger, is_html: bool = False):
+    """Send one email now over its own connection, for manual tests.
+
+    The API and the outbox worker go through the email_outbox table instead.
+    """
     from .logger import logger
     if not is_valid_email(to_email):
-        logger.error(f"[send_email] Invalid email address: {to_email}")
+        logger.error("[send_email] Invalid email address: %s", to_email)
         return
-    logger.info(f"[send_email] Sending email to {to_email} with subject '{subject}'")
-    msg = MIMEMultipart()
-    msg["From"] = FROM_EMAIL
-    msg["To"] = to_email
-    msg["Subject"] = subject
-    if is_html:
-        msg.attach(MIMEText(body, "html"))
-    else:
-        msg.attach(MIMEText(body, "plain"))
-
-    context = ssl.create_default_context()
-
+    logger.info("[send_email] Sending email to %s with subject '%s'", to_email, subject)
     try:
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.ehlo()
-            server.starttls(context=context)
-            server.ehlo()
-            server.login(SMTP_USERNAME, SMTP_PASSWORD)
-            server.sendmail(FROM_EMAIL, to_email, msg.as_string())
+        with open_smtp_connection() as server:
+            server.sendmail(settings.FROM_EMAIL, to_email, build_message(to_email, subject, body, is_html))
     except Exception as e:
-        print(f"Failed to send email: {e}")
-
-
-# Helper to build a styled HTML email
-def build_email_html(subject: str, message: str, cta_url: str = None, cta_text: str = None) -> str:
-    logo_url = f"{settings.WEBSITE_URL}/static/logo.png"  # Adjust path as needed
-    website_url = settings.WEBSITE_URL
-    return f"""
-    <html>
-    <body style='background:#f7f7fa;padding:0;margin:0;font-family:sans-serif;'>
-        <div style='max-width:480px;margin:40px auto;background:#fff;border-radius:8px;box-shadow:0 2px 8px #0001;padding:32px;'>
-            <div style='text-align:center;margin-bottom:24px;'>
-                <a href='{website_url}'><img src='{logo_url}' alt='Wishful Logo' style='height:48px;'/></a>
-            </div>
-            <h2 style='color:#4a4a4a;text-align:center;margin-bottom:24px;'>{subject}</h2>
-            <div style='font-size:16px;color:#333;margin-bottom:32px;'>{message}</div>
-            {f"<div style='text-align:center;margin-bottom:32px;'><a href='{cta_url}' style='background:#6c63ff;color:#fff;text-decoration:none;padding:12px 32px;border-radius:6px;font-weight:bold;font-size:16px;display:inline-block;'>{cta_text}</a></div>" if cta_url and cta_text else ''}
-            <div style='color:#888;font-size:14px;margin-top:32px;'>
-                Best wishes,<br>
-                <b>The Wishful Team</b>
-            </div>
-        </div>
-        <div style='text-align:center;color:#aaa;font-size:12px;margin-top:16px;'>
-            <a href='{website_url}' style='color:#aaa;text-decoration:none;'>Visit Wishful</a>
-        </div>
-    </body>
-    </html>
-    """
+        logger.error("[send_email] Failed to send email to %s: %s", to_email, e)
 
 
 def is_valid_email(email: str) -> bool:
@@ -129,10 +169,5 @@ def is_valid_email(email: str) -> bool:
 if __name__ == "__main__":
     from .logger import logger
     # Test HTML email
-    test_html = build_email_html(
-        subject="You've been invited to join Wishful!",
-        message="This is a test invite email.",
-        cta_url="https://wishful.app/join",
-        cta_text="Join Now"
-    )
-    send_email(TEST_EMAIL, "You've been invited to join Wishful", test_html, logger, True)
+    test_email = render_email("invite", cta_url="https://wishful.app/join")
+    send_email(settings.TEST_EMAIL, test_email.subject, test_email.html, logger, True)
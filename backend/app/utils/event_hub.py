@@ -0,0 +1,192 @@
+import asyncio
+import json
+from contextlib import contextmanager
+from typing import Callable
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+from ..config import settings
+from .logger import logger
+
+
+class Subscription:
+    """One open event stream on a wishlist, with its own bounded backlog."""
+
+    def __init__(self, wishlist_id: int, max_queue: int):
+        self.wishlist_id = wishlist_id
+        self._queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=max_queue)
+
+    def offer(self, event: dict) -> bool:
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            # Too far behind to catch up event by event: drop the backlog and
+            # tell the client to reload the list instead
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait({"type": "resync", "wishlist_id": self.wishlist_id})
+            return False
+
+    async def get(self) -> dict:
+        return await self._queue.get()
+
+
+class EventHub:
+    """Fan-out of wishlist change events to the clients streaming them.
+
+    Writers call ``publish`` once their change is committed, and every open
+    stream on that wishlist gets the event: directly with the in-process
+    backend, or through the database with the Postgres one so that streams
+    held by other workers get it too. Each stream has a bounded queue, so a
+    slow client never holds up the writer or the other clients; when its
+    queue fills up, the backlog is replaced by a single ``resync`` event.
+
+    Events are not stored: a client that reconnects reloads the list.
+    """
+
+    def __init__(self, backend: str, max_queue: int):
+        self.max_queue = max_queue
+        self.backend = BACKENDS[backend](self._deliver, self.resync_all)
+        self._subscribers: dict[int, set[Subscription]] = {}
+        self.published = 0
+        self.delivered = 0
+        self.overflows = 0
+        self.publish_errors = 0
+
+    async def start(self):
+        await self.backend.start()
+
+    async def stop(self):
+        await self.backend.stop()
+
+    @contextmanager
+    def subscribe(self, wishlist_id: int):
+        subscription = Subscription(wishlist_id, self.max_queue)
+        self._subscribers.setdefault(wishlist_id, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            subscribers = self._subscribers[wishlist_id]
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[wishlist_id]
+
+    async def publish(self, wishlist_id: int, event_type: str, **data):
+        """Send an event to the streams on wishlist_id; failures are logged, not raised."""
+        event = {"type": event_type, "wishlist_id": wishlist_id, **data}
+        try:
+            await self.backend.publish(event)
+            self.published += 1
+        except Exception as e:
+            self.publish_errors += 1
+            logger.error("[EventHub.publish] Could not publish %s for wishlist %s: %s", event_type, wishlist_id, e)
+
+    def resync_all(self):
+        """Events may have been lost (e.g. the backend reconnected); every stream should reload."""
+        for wishlist_id in tuple(self._subscribers):
+            self._deliver({"type": "resync", "wishlist_id": wishlist_id})
+
+    def _deliver(self, event: dict):
+        for subscription in tuple(self._subscribers.get(event["wishlist_id"], ())):
+            if subscription.offer(event):
+                self.delivered += 1
+            else:
+                self.overflows += 1
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "wishlists": len(self._subscribers),
+            "streams": sum(len(subscribers) for subscribers in self._subscribers.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "overflows": self.overflows,
+            "publish_errors": self.publish_errors,
+        }
+
+
+class LocalBackend:
+    """Single process: events go straight to this process's streams."""
+
+    def __init__(self, deliver: Callable[[dict], None], resync: Callable[[], None]):
+        self._deliver = deliver
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(self, event: dict):
+        self._deliver(event)
+
+
+class PostgresBackend:
+    """Fan-out across workers with Postgres LISTEN/NOTIFY.
+
+    Events are sent with pg_notify on a pooled connection and come back to
+    every worker, this one included, on a connection each worker keeps
+    listening. NOTIFY payloads are capped at 8000 bytes; events only carry
+    ids and the changed fields of a single item. If the listening
+    connection drops it is reopened, and the streams are told to resync
+    since events sent in between are lost.
+    """
+
+    CHANNEL = "wishlist_events"
+
+    def __init__(self, deliver: Callable[[dict], None], resync: Callable[[], None]):
+        self._deliver = deliver
+        self._resync = resync
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    async def publish(self, event: dict):
+        from ..db.database import async_engine
+        async with async_engine.begin() as conn:
+            await conn.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": self.CHANNEL, "payload": json.dumps(event)},
+            )
+
+    def _on_notify(self, connection, pid, channel, payload):
+        self._deliver(json.loads(payload))
+
+    async def _listen(self):
+        import asyncpg
+        from ..db.database import SQLALCHEMY_DATABASE_URL
+        dsn = make_url(SQLALCHEMY_DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+        reconnecting = False
+        while True:
+            try:
+                conn = await asyncpg.connect(dsn)
+                try:
+                    closed = asyncio.Event()
+                    conn.add_termination_listener(lambda _: closed.set())
+                    await conn.add_listener(self.CHANNEL, self._on_notify)
+                    logger.info("[PostgresBackend] Listening on %s", self.CHANNEL)
+                    if reconnecting:
+                        self._resync()
+                    await closed.wait()
+                finally:
+                    await conn.close()
+            except Exception as e:
+                logger.error("[PostgresBackend] Listener error: %s", e)
+            reconnecting = True
+            await asyncio.sleep(settings.EVENT_HUB_RECONNECT_SECONDS)
+
+
+BACKENDS = {
+    "memory": LocalBackend,
+    "postgres": PostgresBackend,
+}
+
+
+event_hub = EventHub(settings.EVENT_HUB_BACKEND, settings.EVENT_STREAM_QUEUE_SIZE)
@@ -0,0 +1,128 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable
+
+from ..config import settings
+
+
+class HomeViewCache:
+    """Per-user GET /wishlists responses, invalidated when their data changes.
+
+    Entries are keyed by (user_id, variant) and stamped with the value of a
+    version clock taken before the view was read from the database. Every
+    invalidation advances the clock and records it against the user, so an
+    entry is served only if nothing touched that user since its stamp; a
+    view built while a write was in flight is therefore never cached.
+
+    Writes invalidate by wishlist: each cached view registers under the
+    wishlists it contains, so changing a list invalidates exactly the views
+    that show it. Wishlists are stamped too, so a view that was being read
+    while one of its lists changed is not cached either. Entries also expire
+    after ``ttl`` seconds, which bounds how long a write made by another
+    worker process can go unseen.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = 0
+        self._entries: OrderedDict[tuple[str, Hashable], tuple[int, float, tuple[int, ...], Any]] = OrderedDict()
+        self._changed: dict[str, int] = {}
+        self._wishlist_changed: dict[int, int] = {}
+        # Clock value below which every user counts as changed (see _prune)
+        self._floor = 0
+        self._by_wishlist: dict[int, set[tuple[str, Hashable]]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def _changed_at(self, user_id: str) -> int:
+        return self._changed.get(user_id, self._floor)
+
+    def get(self, user_id: str, variant: Hashable = None):
+        key = (user_id, variant)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        version, expires_at, _, value = entry
+        if expires_at < time.monotonic() or self._changed_at(user_id) > version:
+            self._drop(key)
+            self.stale += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, user_id: str, variant: Hashable, value, wishlist_ids: Iterable[int], version: int):
+        """Cache a view read at ``version`` (the clock before the read)."""
+        if self.max_size <= 0 or self._changed_at(user_id) > version:
+            return
+        wishlist_ids = tuple(wishlist_ids)
+        if any(self._wishlist_changed.get(wishlist_id, self._floor) > version for wishlist_id in wishlist_ids):
+            return
+        key = (user_id, variant)
+        self._drop(key)
+        self._entries[key] = (version, time.monotonic() + self.ttl, wishlist_ids, value)
+        for wishlist_id in wishlist_ids:
+            self._by_wishlist.setdefault(wishlist_id, set()).add(key)
+        while len(self._entries) > self.max_size:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate_user(self, user_id: str):
+        """Something user_id can see changed; their cached views go stale."""
+        self.clock += 1
+        self._changed[user_id] = self.clock
+        self.invalidations += 1
+        if len(self._changed) > 4 * self.max_size:
+            self._prune()
+
+    def invalidate_wishlist(self, wishlist_id: int, user_ids: Iterable[str] = ()):
+        """A wishlist changed; also invalidate user_ids it was shared with or unshared from."""
+        self.clock += 1
+        self._wishlist_changed[wishlist_id] = self.clock
+        users = {user_id for user_id, _ in self._by_wishlist.pop(wishlist_id, ())}
+        users.update(user_ids)
+        for user_id in users:
+            self.invalidate_user(user_id)
+        if len(self._wishlist_changed) > 4 * self.max_size:
+            self._prune()
+
+    def _drop(self, key: tuple[str, Hashable]):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for wishlist_id in entry[2]:
+            keys = self._by_wishlist.get(wishlist_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_wishlist[wishlist_id]
+
+    def _prune(self):
+        # Forget change stamps by treating everything as changed now
+        self._floor = self.clock
+        self._changed.clear()
+        self._wishlist_changed.clear()
+        self._entries.clear()
+        self._by_wishlist.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+home_view_cache = HomeViewCache(settings.HOME_VIEW_CACHE_SIZE, settings.HOME_VIEW_CACHE_TTL_SECONDS)
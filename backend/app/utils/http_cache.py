@@ -0,0 +1,40 @@
+import hashlib
+
+from fastapi import Request, Response
+
+
+# Responses that depend on who is asking: browsers may keep them but must
+# revalidate, and shared caches must key them on the bearer token
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """A strong ETag for a representation identified by parts.
+
+    Parts are the endpoint, whatever selects the representation (user,
+    wishlist, variant) and the data version it was read at, so a tag is
+    never shared between two different bodies.
+    """
+    key = "\0".join(str(part) for part in parts)
+    return '"' + hashlib.blake2b(key.encode(), digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match covers etag (weak comparison, as RFC 9110 asks)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def cache_headers(etag: str, cache_control: str = PRIVATE_CACHE_CONTROL) -> dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if cache_control.startswith("private"):
+        headers["Vary"] = "Authorization"
+    return headers
+
+
+def not_modified(etag: str, cache_control: str = PRIVATE_CACHE_CONTROL) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag, cache_control))
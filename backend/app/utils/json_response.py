@@ -0,0 +1,51 @@
+"""Single-pass JSON for the list endpoints.
+
+FastAPI validates whatever an endpoint returns against its response_model
+before serializing it, so a list built from WishListRequest/WishItemRequest
+objects paid for validation twice: once per row in the constructor, once
+more for the whole list. The list endpoints instead project rows straight
+to dicts with the response model's fields and return an ORJSONResponse,
+which FastAPI sends as it is. Rows come from the database, which only
+holds what the write endpoints validated, so nothing is lost.
+
+The routes keep their response_model for the OpenAPI schema; a field added
+to WishListRequest or WishItemRequest must be added here too.
+"""
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse encoded with orjson; content that is already bytes is sent as is."""
+
+    def render(self, content) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return orjson.dumps(content)
+
+
+def item_fields(item, user_map: dict[str, str]) -> dict:
+    """A WishItemDB row as WishItemRequest; user_map is get_reserver_names' result."""
+    return {
+        "id": item.id,
+        "name": item.name,
+        "reserved": bool(item.reserved),
+        "reserved_by": item.reserved_by,
+        "reserved_by_name": user_map.get(item.reserved_by) if item.reserved_by else None,
+        "link": item.link,
+    }
+
+
+def wishlist_fields(wishlist, items: list[dict]) -> dict:
+    """A WishListDB row, with owner_user and shared_with loaded, as WishListRequest."""
+    owner_user = wishlist.owner_user
+    return {
+        "id": wishlist.id,
+        "name": wishlist.name,
+        "owner_id": wishlist.owner_id,
+        "owner_first_name": owner_user.first_name.capitalize() if owner_user.first_name else "",
+        "owner_last_name": owner_user.last_name.capitalize() if owner_user.last_name else "",
+        "items": items,
+        "shared_with": [sw.uid for sw in wishlist.shared_with],
+        "tag": wishlist.tag,
+    }
@@ -1,18 +1,174 @@
+"""Application logging, written off the request path.
+
+Loggers hand records to a QueueHandler, which only puts them on an
+in-memory queue; a QueueListener thread formats them and writes them to a
+size-rotated file and to stderr, so a slow disk or terminal never stalls a
+request. If the queue is full, records are dropped (and counted) rather
+than blocking the caller.
+
+With LOG_FORMAT=json (the default) each line is a JSON object with the
+time, level, logger, message, the id of the request being served when the
+record was made, and any fields passed with ``extra=``. Pass arguments
+%-style (``logger.info("... %s", value)``) so that records below LOG_LEVEL
+are never formatted.
+"""
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import time
+import uuid
+from contextvars import ContextVar
 
-# Ensure the log directory exists
+from ..config import settings
+
+# The log file sits next to the app package unless LOG_FILE says otherwise
 LOG_DIR = os.path.join(os.path.dirname(__file__), '../')
-LOG_PATH = os.path.abspath(os.path.join(LOG_DIR, 'wishful_backend.log'))
-os.makedirs(LOG_DIR, exist_ok=True)
-
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s %(levelname)s %(name)s %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_PATH),
-        logging.StreamHandler()
-    ]
-)
+LOG_PATH = os.path.abspath(settings.LOG_FILE or os.path.join(LOG_DIR, 'wishful_backend.log'))
+TEXT_FORMAT = '%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s'
+
+# Id of the request being served, set by RequestContextMiddleware
+request_id_var: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; any others were passed with extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.request_id:
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamps records with the current request id; runs on the thread that logs."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records when the queue is full instead of blocking.
+
+    The stock prepare() folds the traceback into the message; this keeps it
+    in exc_text so the JSON formatter can report it as its own field.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging() -> tuple[NonBlockingQueueHandler, logging.handlers.QueueListener]:
+    formatter = JsonFormatter() if settings.LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+    os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
+    # Each worker process rotates on its own; point workers at separate
+    # LOG_FILEs or let the process manager collect stderr when running several
+    file_handler = logging.handlers.RotatingFileHandler(
+        LOG_PATH, maxBytes=settings.LOG_MAX_BYTES, backupCount=settings.LOG_BACKUP_COUNT,
+    )
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+    queue_handler.addFilter(RequestContextFilter())
+    root = logging.getLogger()
+    root.addHandler(queue_handler)
+    root.setLevel(settings.LOG_LEVEL.upper())
+
+    listener = logging.handlers.QueueListener(queue_handler.queue, file_handler, stream_handler)
+    listener.start()
+    # Flush what is still queued when the process exits
+    atexit.register(listener.stop)
+    return queue_handler, listener
+
+
+queue_handler, listener = configure_logging()
 
 logger = logging.getLogger('wishful_backend')
+access_logger = logging.getLogger('wishful_backend.access')
+
+
+def stats() -> dict:
+    return {"queued": queue_handler.queue.qsize(), "dropped": queue_handler.dropped}
+
+
+class RequestContextMiddleware:
+    """Gives each request an id for its log records and logs one line per request.
+
+    The id comes from the caller's X-Request-ID header when it looks sane,
+    otherwise a new one is made, and is echoed back in the response. The
+    access line is written when the response starts, with the status and
+    duration_ms as fields.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        if not request_id or len(request_id) > 64 or not request_id.isprintable():
+            request_id = uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+        started = time.perf_counter()
+        logged = False
+
+        def log_request(status: int):
+            access_logger.info(
+                "%s %s %s", scope["method"], scope["path"], status,
+                extra={"status": status, "duration_ms": round((time.perf_counter() - started) * 1000, 2)},
+            )
+
+        async def send_with_request_id(message):
+            nonlocal logged
+            if message["type"] == "http.response.start" and not logged:
+                logged = True
+                message.setdefault("headers", [])
+                message["headers"] = [*message["headers"], (b"x-request-id", request_id.encode("latin-1"))]
+                log_request(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            if not logged:
+                log_request(500)
+            request_id_var.reset(token)
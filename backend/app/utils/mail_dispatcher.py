@@ -0,0 +1,176 @@
+import queue
+import smtplib
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from .logger import logger
+
+
+class MailQueueFull(Exception):
+    """Raised by MailDispatcher.submit when the outbound queue is full."""
+
+
+@dataclass
+class OutboundEmail:
+    from_addr: str
+    to_addr: str
+    message: str
+    # Called from the worker thread with None once sent, or the final error
+    on_done: Optional[Callable[[Optional[Exception]], None]] = None
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+# SMTP errors that will not succeed on retry (bad recipient, rejected sender...)
+PERMANENT_ERRORS = (
+    smtplib.SMTPRecipientsRefused,
+    smtplib.SMTPSenderRefused,
+    smtplib.SMTPDataError,
+)
+
+
+class MailDispatcher:
+    """Background SMTP sender that reuses one authenticated connection.
+
+    Messages are queued by ``submit`` and delivered by a single worker thread,
+    which drains up to ``batch_size`` messages per wake-up over the same
+    connection. The connection is closed after ``idle_timeout`` seconds with
+    nothing to send and reopened on demand. Transient failures are retried
+    with exponential backoff; a full queue raises ``MailQueueFull`` instead
+    of blocking the caller.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], smtplib.SMTP],
+        max_queue: int = 1000,
+        batch_size: int = 50,
+        max_retries: int = 3,
+        idle_timeout: float = 30.0,
+        backoff_base: float = 1.0,
+    ):
+        self._connect = connect
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.idle_timeout = idle_timeout
+        self.backoff_base = backoff_base
+        self._queue: queue.Queue[Optional[OutboundEmail]] = queue.Queue(maxsize=max_queue)
+        self._conn: Optional[smtplib.SMTP] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.rejected = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def submit(self, from_addr: str, to_addr: str, message: str, on_done=None):
+        self.start()
+        try:
+            self._queue.put_nowait(OutboundEmail(from_addr, to_addr, message, on_done))
+        except queue.Full:
+            with self._stats_lock:
+                self.rejected += 1
+            raise MailQueueFull(f"Outbound mail queue is full ({self._queue.maxsize} messages)")
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='mail-dispatcher', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Deliver what is already queued, then stop the worker."""
+        if not self._thread or not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            delivered = self.sent or 1
+            return {
+                "queue_depth": self._queue.qsize(),
+                "sent": self.sent,
+                "failed": self.failed,
+                "retries": self.retries,
+                "rejected": self.rejected,
+                "avg_latency_seconds": self._latency_total / delivered,
+                "max_latency_seconds": self._latency_max,
+            }
+
+    def _run(self):
+        while True:
+            try:
+                email = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                self._close()
+                continue
+            batch = [email]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for email in batch:
+                if email is None:
+                    self._close()
+                    return
+                self._deliver(email)
+
+    def _deliver(self, email: OutboundEmail):
+        error = self._send(email)
+        if email.on_done:
+            try:
+                email.on_done(error)
+            except Exception as e:
+                logger.error("[mail_dispatcher] on_done callback failed for %s: %s", email.to_addr, e)
+
+    def _send(self, email: OutboundEmail) -> Optional[Exception]:
+        error = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                if self._conn is None:
+                    self._conn = self._connect()
+                self._conn.sendmail(email.from_addr, email.to_addr, email.message)
+                latency = time.monotonic() - email.enqueued_at
+                with self._stats_lock:
+                    self.sent += 1
+                    self._latency_total += latency
+                    self._latency_max = max(self._latency_max, latency)
+                return None
+            except PERMANENT_ERRORS as e:
+                error = e
+                logger.error("[mail_dispatcher] Rejected email to %s: %s", email.to_addr, e)
+                break
+            except Exception as e:
+                error = e
+                self._close()
+                if attempt == self.max_retries:
+                    logger.error("[mail_dispatcher] Giving up on email to %s: %s", email.to_addr, e)
+                    break
+                with self._stats_lock:
+                    self.retries += 1
+                # A pooled connection the server dropped while idle is not a real failure
+                reconnect_only = attempt == 0 and isinstance(e, smtplib.SMTPServerDisconnected)
+                delay = 0 if reconnect_only else self.backoff_base * 2 ** attempt
+                logger.warning("[mail_dispatcher] Send to %s failed (%s), retrying in %ss", email.to_addr, e, delay)
+                time.sleep(delay)
+        with self._stats_lock:
+            self.failed += 1
+        return error
+
+    def _close(self):
+        if self._conn is None:
+            return
+        try:
+            self._conn.quit()
+        except Exception:
+            pass
+        self._conn = None
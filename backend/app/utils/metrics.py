@@ -0,0 +1,255 @@
+"""Request, auth and database metrics in the Prometheus text format.
+
+MetricsMiddleware times every request up to the moment its response
+starts (for a stream, that is its setup) and files it under the route
+template, so /wishlists/1/items and /wishlists/2/items share a series. The
+cursor hooks registered on the engines in db/database.py time each SQL
+statement; statements and auth time issued while serving a request are
+also added to that request, which splits its latency into auth, db and
+everything else (handler code and serialization).
+
+Metrics are plain counters and bucket arrays updated under a lock, so a
+request costs a few microseconds; nothing is aggregated until /metrics is
+scraped.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Iterable
+
+from ..config import settings
+from .logger import logger
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+SQL_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple = (), amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in self._values.items():
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    def dec(self, labels: tuple = (), amount: float = 1.0):
+        self.inc(labels, -amount)
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...], buckets: tuple[float, ...]):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # Per label set: [count per bucket (not cumulative)..., count above the last bucket, sum]
+        self._series: dict[tuple, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        # First bucket whose upper bound is >= value; len(buckets) means +Inf
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+request_duration = Histogram(
+    "http_request_duration_seconds", "Time until the response starts, by route template.",
+    ("method", "route", "status"), LATENCY_BUCKETS,
+)
+request_phase = Histogram(
+    "http_request_phase_seconds", "Request time spent in verify_token (auth), SQL (db) and the rest (app).",
+    ("method", "route", "phase"), LATENCY_BUCKETS,
+)
+request_queries = Histogram(
+    "http_request_db_queries", "SQL statements issued per request.",
+    ("method", "route"), QUERY_COUNT_BUCKETS,
+)
+requests_in_progress = Gauge("http_requests_in_progress", "Requests being handled.")
+query_duration = Histogram(
+    "db_query_duration_seconds", "SQL statement execution time, by statement type.",
+    ("operation",), LATENCY_BUCKETS,
+)
+slow_queries = Counter("db_slow_queries_total", "SQL statements slower than SLOW_QUERY_MS.", ("operation",))
+
+METRICS = [request_duration, request_phase, request_queries, requests_in_progress, query_duration, slow_queries]
+
+# Most recent slow statements, newest last
+slow_query_samples: deque[dict] = deque(maxlen=settings.SLOW_QUERY_SAMPLES)
+
+
+@dataclass
+class RequestStats:
+    scope: dict
+    queries: int = 0
+    db_seconds: float = 0.0
+    auth_seconds: float = 0.0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def route(self) -> str:
+        # Set by the router once it has matched, which is before the handler runs
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or "unmatched"
+
+
+_current_request: ContextVar[RequestStats | None] = ContextVar("metrics_request", default=None)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so it adds no task or body buffering to a request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = RequestStats(scope)
+        token = _current_request.set(stats)
+        requests_in_progress.inc()
+        recorded = False
+
+        async def send_with_metrics(message):
+            nonlocal recorded
+            if message["type"] == "http.response.start" and not recorded:
+                recorded = True
+                _record_request(stats, scope["method"], message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            if not recorded:
+                _record_request(stats, scope["method"], 500)
+            requests_in_progress.dec()
+            _current_request.reset(token)
+
+
+def _record_request(stats: RequestStats, method: str, status: int):
+    elapsed = time.perf_counter() - stats.started
+    route = stats.route
+    request_duration.observe((method, route, str(status)), elapsed)
+    request_queries.observe((method, route), stats.queries)
+    request_phase.observe((method, route, "auth"), stats.auth_seconds)
+    request_phase.observe((method, route, "db"), stats.db_seconds)
+    request_phase.observe((method, route, "app"), max(0.0, elapsed - stats.auth_seconds - stats.db_seconds))
+
+
+def record_auth(seconds: float):
+    """Add time spent verifying the bearer token to the current request."""
+    stats = _current_request.get()
+    if stats is not None:
+        stats.auth_seconds += seconds
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_started
+    operation = statement.lstrip()[:6].upper()
+    if operation not in SQL_OPERATIONS:
+        operation = "WITH" if operation.startswith("WITH") else "OTHER"
+    query_duration.observe((operation,), elapsed)
+    stats = _current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+    if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        slow_queries.inc((operation,))
+        route = stats.route if stats is not None else None
+        slow_query_samples.append({
+            "route": route,
+            "duration_ms": round(elapsed * 1000, 2),
+            "statement": " ".join(statement.split())[:1000],
+            "at": time.time(),
+        })
+        logger.warning("[metrics] Slow query (%.1f ms) on %s: %s", elapsed * 1000, route, ' '.join(statement.split())[:200])
+
+
+_stats_sources: list[tuple[str, Callable[[], dict], set[str]]] = []
+
+
+def register_stats(prefix: str, stats: Callable[[], dict], counters: Iterable[str] = ()):
+    """Export the numeric values of a component's stats() dict as {prefix}_{key}.
+
+    Keys listed in counters only ever grow and are typed as counters; the
+    rest are gauges.
+    """
+    _stats_sources.append((prefix, stats, set(counters)))
+
+
+def render() -> str:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for prefix, stats, counters in _stats_sources:
+        try:
+            values = stats()
+        except Exception as e:
+            logger.error("[metrics] Could not read %s stats: %s", prefix, e)
+            continue
+        for key, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = f"{prefix}_{key}"
+            lines.append(f"# TYPE {name} {'counter' if key in counters else 'gauge'}")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
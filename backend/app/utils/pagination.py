@@ -0,0 +1,59 @@
+"""Keyset pagination for the list endpoints.
+
+A client asks for up to ``limit`` rows, then for the next page with the
+``cursor`` from the X-Next-Cursor header of the previous one; the last page
+has no such header. A cursor holds the sort key of the last row sent, and
+the next page is read with a WHERE on that key over an index in the same
+order, so every page costs the same however deep into a list it is, and
+rows added or removed meanwhile do not shift the pages the way OFFSET
+would. Cursors are opaque to clients: the endpoint's name and the key,
+JSON in URL-safe base64, checked on the way back in.
+"""
+import base64
+import binascii
+import json
+
+from fastapi import HTTPException, Query
+
+from ..config import settings
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def page_size(default: int = settings.PAGE_SIZE_DEFAULT, maximum: int = settings.PAGE_SIZE_MAX):
+    """The ``limit`` query parameter, capped at maximum."""
+    return Query(default, ge=1, le=maximum, description=f"Rows per page, at most {maximum}")
+
+
+def page_cursor():
+    return Query(None, description=f"{NEXT_CURSOR_HEADER} of the previous page; omit for the first page")
+
+
+def encode_cursor(kind: str, key: tuple) -> str:
+    raw = json.dumps([kind, *key], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str | None, kind: str, *types) -> tuple | None:
+    """The key in a cursor made by encode_cursor(kind, ...), or None without one.
+
+    types gives the type (or tuple of types) of each part of the key.
+    Anything else, a cursor from another endpoint included, is a 400.
+    """
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        values = None
+    if (
+        not isinstance(values, list) or len(values) != len(types) + 1 or values[0] != kind
+        or not all(isinstance(value, expected) and not isinstance(value, bool)
+                   for value, expected in zip(values[1:], types))
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return tuple(values[1:])
+
+
+def next_page_headers(kind: str, next_key: tuple | None) -> dict[str, str]:
+    return {NEXT_CURSOR_HEADER: encode_cursor(kind, next_key)} if next_key is not None else {}
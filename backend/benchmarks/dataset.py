@@ -0,0 +1,122 @@
+"""Synthetic users, wishlists, items, shares and groups for the load benchmarks.
+
+Rows go straight into the app/db/models.py tables with bulk inserts, drawn
+from a fixed random seed, so two runs with the same sizes see the same
+data. The returned Dataset keeps what the benchmark flows need to build
+realistic requests: who owns and who can see which lists, the items of
+each list and the names people search for.
+"""
+import random
+import string
+from dataclasses import dataclass, field
+
+from sqlalchemy import insert
+
+from app.db.models import GroupDB, GroupMemberDB, UserDB, WishItemDB, WishListDB, wishlist_shared_with
+from app.models import TagEnum
+
+FIRST_NAMES = ["alice", "bob", "carol", "dave", "erin", "frank", "grace", "heidi", "ivan", "judy",
+               "mallory", "niaj", "olivia", "peggy", "rupert", "sybil", "trent", "victor", "walter", "zoe"]
+LAST_NAMES = ["smith", "jones", "taylor", "brown", "wilson", "evans", "thomas", "roberts", "walker", "wright"]
+TAGS = [tag.value for tag in TagEnum]
+GIFTS = ["book", "headphones", "scarf", "board game", "mug", "plant", "candle", "watch", "backpack", "lego set"]
+
+
+@dataclass
+class DatasetSize:
+    users: int = 2000
+    wishlists_per_user: int = 3
+    items_per_wishlist: int = 12
+    shares_per_wishlist: int = 4
+    groups: int = 200
+    members_per_group: int = 8
+    # Lists shared with many users, for reservation storms
+    hot_wishlists: int = 5
+    hot_shares: int = 200
+
+
+@dataclass
+class Dataset:
+    users: list[str] = field(default_factory=list)
+    emails: dict[str, str] = field(default_factory=dict)
+    owned: dict[str, list[int]] = field(default_factory=dict)
+    # Lists shared with each user, not counting their own
+    shared: dict[str, list[int]] = field(default_factory=dict)
+    shared_pairs: set[tuple[int, str]] = field(default_factory=set)
+    owner_of: dict[int, str] = field(default_factory=dict)
+    items: dict[int, list[int]] = field(default_factory=dict)
+    hot_wishlists: list[int] = field(default_factory=list)
+    readers: dict[int, list[str]] = field(default_factory=dict)
+    search_terms: list[str] = field(default_factory=list)
+
+
+def seed(session_factory, size: DatasetSize, seed: int = 42) -> Dataset:
+    rng = random.Random(seed)
+    data = Dataset()
+    users, wishlists, items, shares, groups, members = [], [], [], [], [], []
+
+    for i in range(size.users):
+        uid = f"user{i}"
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        suffix = "".join(rng.choices(string.ascii_lowercase, k=3))
+        email = f"{first}.{last}{i}@example.com"
+        users.append({"uid": uid, "first_name": f"{first}{suffix}", "last_name": last, "email": email})
+        data.users.append(uid)
+        data.emails[uid] = email
+        data.owned[uid] = []
+        data.shared[uid] = []
+
+    def add_wishlist(owner: str, readers: list[str]) -> int:
+        wishlist_id = len(wishlists) + 1
+        wishlists.append({
+            "id": wishlist_id, "owner_id": owner, "name": f"{owner}'s list {wishlist_id}", "tag": rng.choice(TAGS),
+        })
+        data.owned[owner].append(wishlist_id)
+        data.owner_of[wishlist_id] = owner
+        data.items[wishlist_id] = []
+        for _ in range(size.items_per_wishlist):
+            item_id = len(items) + 1
+            items.append({
+                "id": item_id, "wishlist_id": wishlist_id, "name": f"{rng.choice(GIFTS)} {item_id}",
+                "reserved": False, "reserved_by": None, "link": f"https://shop.example.com/p/{item_id}",
+            })
+            data.items[wishlist_id].append(item_id)
+        data.readers[wishlist_id] = readers
+        for reader in readers:
+            shares.append({"wishlist_id": wishlist_id, "user_id": reader})
+            data.shared[reader].append(wishlist_id)
+            data.shared_pairs.add((wishlist_id, reader))
+        return wishlist_id
+
+    def pick_readers(owner: str, count: int) -> list[str]:
+        readers = set(rng.sample(data.users, min(count + 1, len(data.users))))
+        readers.discard(owner)
+        return sorted(readers)[:count]
+
+    for uid in data.users:
+        for _ in range(size.wishlists_per_user):
+            add_wishlist(uid, pick_readers(uid, size.shares_per_wishlist))
+    for _ in range(size.hot_wishlists):
+        owner = rng.choice(data.users)
+        data.hot_wishlists.append(add_wishlist(owner, pick_readers(owner, size.hot_shares)))
+    # Some items start out reserved by someone who can see the list
+    for item in rng.sample(items, len(items) // 5):
+        readers = data.readers[item["wishlist_id"]]
+        if readers and item["wishlist_id"] not in data.hot_wishlists:
+            item["reserved"], item["reserved_by"] = True, rng.choice(readers)
+
+    for group_id in range(1, size.groups + 1):
+        owner = rng.choice(data.users)
+        groups.append({"id": group_id, "name": f"{rng.choice(LAST_NAMES)} family {group_id}", "owner_id": owner})
+        for uid in {owner, *rng.sample(data.users, min(size.members_per_group, len(data.users)))}:
+            members.append({"group_id": group_id, "user_id": uid})
+
+    data.search_terms = [name[:length] for name in FIRST_NAMES + LAST_NAMES for length in (2, 3, 5)]
+
+    with session_factory() as db:
+        for table, rows in [(UserDB, users), (WishListDB, wishlists), (WishItemDB, items),
+                            (wishlist_shared_with, shares), (GroupDB, groups), (GroupMemberDB, members)]:
+            if rows:
+                db.execute(insert(table), rows)
+        db.commit()
+    return data
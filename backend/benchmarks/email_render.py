@@ -0,0 +1,36 @@
+"""Per-message cost of rendering notification emails.
+
+    python -m benchmarks.email_render [--iterations N]
+"""
+import argparse
+import timeit
+
+from app.utils.email_templates import render_email
+from app.utils.email_utils import build_message
+
+
+def render_shared():
+    return render_email(
+        "shared",
+        to_user_name="Alice <script>",
+        from_user_name="Bob",
+        cta_url="https://wishful.app",
+    )
+
+
+def render_and_build():
+    email = render_shared()
+    return build_message("alice@example.com", email.subject, email.html, True, "wishlist-shared:1:alice", email.text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=10000)
+    args = parser.parse_args()
+    for name, fn in (("render", render_shared), ("render + MIME", render_and_build)):
+        seconds = min(timeit.repeat(fn, number=args.iterations, repeat=5))
+        print(f"{name:<15} {seconds / args.iterations * 1e6:8.2f} us/message")
+
+
+if __name__ == "__main__":
+    main()
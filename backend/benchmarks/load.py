@@ -0,0 +1,269 @@
+"""Throughput and latency of the main API flows on a synthetic dataset.
+
+    python -m benchmarks.load [--flows home,items,...] [--requests N] [--concurrency N]
+                              [--users N] [--baseline PATH] [--save] [--tolerance PCT]
+
+Seeds a scratch SQLite database (see benchmarks/dataset.py), then drives
+the real app, middleware and lifespan included, through httpx's ASGI
+transport, so no server or network is involved. verify_token runs as
+usual but its Firebase call is replaced by a local verifier that accepts
+"Bearer <uid>". Each flow sends --requests requests from --concurrency
+concurrent clients after a short warm-up:
+
+    home     GET /wishlists as a random user
+    items    GET /wishlists/{id}/items of an owned or shared list
+    reserve  reservation storm: readers of a few popular lists toggling
+             the same items (400 for an item someone else holds is expected)
+    share    owners sharing a list with an existing user by email
+    search   GET /search with name prefixes from the sharing dialog
+
+Results are compared with the baseline file when it exists; a flow whose
+p95 is more than --tolerance percent slower fails the run. --save writes
+this run as the new baseline. Baselines depend on the machine, so keep
+them local rather than in git, and compare runs with the same sizes.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+# Point the app at a scratch database before anything imports the engine
+_TMP_DIR = tempfile.mkdtemp()
+_DB_FILE = os.path.join(_TMP_DIR, "load_bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_FILE}"
+os.environ.setdefault("WEBSITE_URL", "http://localhost")
+os.environ.setdefault("LOG_FILE", os.path.join(_TMP_DIR, "load_bench.log"))
+# Request logs and slow-query warnings would drown the report; set
+# LOG_LEVEL=INFO to include the cost of request logging
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+# No Firebase here, so nothing to keep warm
+os.environ["TOKEN_KEY_REFRESH_SECONDS"] = "0"
+
+import httpx  # noqa: E402
+
+from app import auth  # noqa: E402
+from app.db.database import SessionLocal, init_db  # noqa: E402
+from app.main import app  # noqa: E402
+
+from .dataset import Dataset, DatasetSize, seed  # noqa: E402
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "load_baseline.json"
+
+
+class LocalTokenVerifier:
+    """Stands in for firebase_admin.auth: the bearer token is the uid."""
+
+    def verify_id_token(self, token: str) -> dict:
+        return {"uid": token, "exp": time.time() + 3600}
+
+
+@dataclass
+class Request:
+    method: str
+    url: str
+    uid: str
+    json: object = None
+    expected: tuple[int, ...] = (200,)
+
+
+def home_requests(data: Dataset, rng: random.Random, count: int) -> list[Request]:
+    return [Request("GET", "/wishlists", rng.choice(data.users)) for _ in range(count)]
+
+
+def items_requests(data: Dataset, rng: random.Random, count: int) -> list[Request]:
+    requests = []
+    while len(requests) < count:
+        uid = rng.choice(data.users)
+        visible = data.owned[uid] + data.shared[uid]
+        if visible:
+            requests.append(Request("GET", f"/wishlists/{rng.choice(visible)}/items", uid))
+    return requests
+
+
+def reserve_requests(data: Dataset, rng: random.Random, count: int) -> list[Request]:
+    requests = []
+    for _ in range(count):
+        wishlist_id = rng.choice(data.hot_wishlists)
+        # A handful of items per list, so requests collide
+        item_id = rng.choice(data.items[wishlist_id][:3])
+        uid = rng.choice(data.readers[wishlist_id])
+        requests.append(Request("POST", f"/wishlists/{wishlist_id}/reserve/{item_id}", uid, expected=(200, 400)))
+    return requests
+
+
+def share_requests(data: Dataset, rng: random.Random, count: int) -> list[Request]:
+    requests = []
+    while len(requests) < count:
+        owner = rng.choice(data.users)
+        wishlist_id = rng.choice(data.owned[owner])
+        target = rng.choice(data.users)
+        # Sharing twice with the same user is a different (failing) path
+        if target == owner or (wishlist_id, target) in data.shared_pairs:
+            continue
+        data.shared_pairs.add((wishlist_id, target))
+        requests.append(Request("POST", f"/wishlists/{wishlist_id}/share", owner, json={"email": data.emails[target]}))
+    return requests
+
+
+def search_requests(data: Dataset, rng: random.Random, count: int) -> list[Request]:
+    return [
+        Request("GET", f"/search?q={rng.choice(data.search_terms)}", rng.choice(data.users)) for _ in range(count)
+    ]
+
+
+FLOWS = {
+    "home": home_requests,
+    "items": items_requests,
+    "reserve": reserve_requests,
+    "share": share_requests,
+    "search": search_requests,
+}
+
+
+@dataclass
+class FlowResult:
+    requests: int
+    errors: int
+    throughput: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+
+def percentile(timings: list[float], p: float) -> float:
+    return timings[min(len(timings) - 1, int(len(timings) * p))] * 1000
+
+
+async def send(client: httpx.AsyncClient, request: Request) -> tuple[float, bool]:
+    start = time.perf_counter()
+    response = await client.request(
+        request.method, request.url, json=request.json, headers={"Authorization": f"Bearer {request.uid}"},
+    )
+    return time.perf_counter() - start, response.status_code in request.expected
+
+
+async def drive(client: httpx.AsyncClient, requests: list[Request], concurrency: int) -> tuple[list[float], int, float]:
+    """Send requests from concurrency clients; returns sorted timings, errors and wall time."""
+    pending = iter(requests)
+    timings = []
+    errors = 0
+
+    async def client_loop():
+        nonlocal errors
+        for request in pending:
+            elapsed, ok = await send(client, request)
+            timings.append(elapsed)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return sorted(timings), errors, time.perf_counter() - started
+
+
+async def run_flows(data: Dataset, flows: list[str], count: int, warmup: int, concurrency: int) -> dict[str, FlowResult]:
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name in flows:
+                # Seeded per flow, so running a subset sends the same requests
+                requests = FLOWS[name](data, random.Random(name), warmup + count)
+                await drive(client, requests[:warmup], concurrency)
+                timings, errors, wall = await drive(client, requests[warmup:], concurrency)
+                results[name] = FlowResult(
+                    requests=len(timings),
+                    errors=errors,
+                    throughput=len(timings) / wall,
+                    p50_ms=percentile(timings, 0.5),
+                    p95_ms=percentile(timings, 0.95),
+                    p99_ms=percentile(timings, 0.99),
+                )
+    return results
+
+
+def report(results: dict[str, FlowResult], baseline: dict | None, tolerance: float) -> int:
+    print(f"{'':<10}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          + (f"{'req/s vs base':>15}{'p95 vs base':>13}" if baseline else ""))
+    status = 0
+    for name, result in results.items():
+        line = (f"{name:<10}{result.requests:>9}{result.errors:>8}{result.throughput:9.1f}"
+                f"{result.p50_ms:9.2f}{result.p95_ms:9.2f}{result.p99_ms:9.2f}")
+        base = (baseline or {}).get(name)
+        if base:
+            throughput_change = (result.throughput / base["throughput"] - 1) * 100
+            p95_change = (result.p95_ms / base["p95_ms"] - 1) * 100
+            line += f"{throughput_change:+14.1f}%{p95_change:+12.1f}%"
+            if p95_change > tolerance:
+                line += "  SLOWER"
+                status = 1
+        print(line)
+        if result.errors:
+            status = 1
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--flows", default=",".join(FLOWS), help="comma-separated, from: " + ", ".join(FLOWS))
+    parser.add_argument("--requests", type=int, default=2000, help="measured requests per flow")
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--users", type=int, default=DatasetSize.users)
+    parser.add_argument("--wishlists-per-user", type=int, default=DatasetSize.wishlists_per_user)
+    parser.add_argument("--items-per-wishlist", type=int, default=DatasetSize.items_per_wishlist)
+    parser.add_argument("--shares-per-wishlist", type=int, default=DatasetSize.shares_per_wishlist)
+    parser.add_argument("--groups", type=int, default=DatasetSize.groups)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="write this run to --baseline")
+    parser.add_argument("--tolerance", type=float, default=25.0, help="allowed p95 slowdown, in percent")
+    args = parser.parse_args()
+
+    flows = [name.strip() for name in args.flows.split(",") if name.strip()]
+    unknown = [name for name in flows if name not in FLOWS]
+    if unknown:
+        parser.error(f"unknown flows: {', '.join(unknown)}")
+    size = DatasetSize(
+        users=args.users,
+        wishlists_per_user=args.wishlists_per_user,
+        items_per_wishlist=args.items_per_wishlist,
+        shares_per_wishlist=args.shares_per_wishlist,
+        groups=args.groups,
+    )
+    settings = {"size": asdict(size), "requests": args.requests, "concurrency": args.concurrency}
+
+    baseline = None
+    if args.baseline.exists():
+        stored = json.loads(args.baseline.read_text())
+        if stored["settings"] != settings:
+            print(f"Baseline {args.baseline} was recorded with other settings; not comparing")
+        else:
+            baseline = stored["results"]
+
+    auth._firebase_auth = LocalTokenVerifier()
+    try:
+        init_db()
+        started = time.perf_counter()
+        data = seed(SessionLocal, size)
+        print(f"Seeded {len(data.users)} users, {len(data.owner_of)} wishlists and "
+              f"{sum(map(len, data.items.values()))} items in {time.perf_counter() - started:.1f}s")
+        print(f"{args.requests} requests per flow from {args.concurrency} concurrent clients")
+        results = asyncio.run(run_flows(data, flows, args.requests, args.warmup, args.concurrency))
+    finally:
+        os.remove(_DB_FILE)
+    status = report(results, baseline, args.tolerance)
+    if args.save:
+        args.baseline.write_text(json.dumps(
+            {"settings": settings, "results": {name: asdict(result) for name, result in results.items()}}, indent=2,
+        ) + "\n")
+        print(f"Saved baseline to {args.baseline}")
+    raise SystemExit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Query plans of the statements issued by app/db/crud.py.
+
+    python -m benchmarks.query_plans [--verbose]
+
+Runs each CRUD function against a scratch SQLite database built from the
+models, captures the SELECT/UPDATE/DELETE statements it sends and asks
+SQLite for their EXPLAIN QUERY PLAN. Any plan that walks a whole table
+(``SCAN <table>``) instead of searching an index is reported, and the
+script exits non-zero, so it can gate changes to queries or indexes.
+
+It also counts the statements get_wishlists_for_user sends for a user with
+a few lists and with many, and fails if the count grows with the lists
+(an N+1 from a lazy load creeping back in).
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+import tempfile
+
+# Point the app at a scratch database before anything imports the engine
+_DB_FILE = os.path.join(tempfile.mkdtemp(), "query_plans.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_FILE}"
+
+from sqlalchemy import event, insert  # noqa: E402
+
+from app.db import crud  # noqa: E402
+from app.db.database import AsyncSessionLocal, SessionLocal, async_engine, engine, init_db  # noqa: E402
+from app.db.models import (  # noqa: E402
+    Base, GroupDB, GroupMemberDB, UserDB, WishItemDB, WishListDB, wishlist_shared_with,
+)
+
+_SCAN = re.compile(r"^SCAN (\w+)\b(?! VIRTUAL TABLE)")
+
+
+def scans_table(detail: str) -> bool:
+    """A full pass over a mapped table (or all of one of its indexes).
+
+    FTS5 lookups, subqueries and derived tables also show up as SCAN but are
+    bounded by the query, not the table size.
+    """
+    match = _SCAN.match(detail)
+    return bool(match) and match.group(1) in Base.metadata.tables
+
+
+def seed():
+    with SessionLocal() as db:
+        db.execute(insert(UserDB), [
+            {"uid": f"u{i}", "first_name": f"user{i}", "last_name": "test", "email": f"u{i}@example.com"}
+            for i in range(1, 4)
+        ])
+        db.execute(insert(WishListDB), [{"id": 1, "owner_id": "u1", "name": "birthday", "tag": "Birthday"}])
+        db.execute(insert(WishItemDB), [
+            {"id": i, "wishlist_id": 1, "name": f"item {i}", "reserved": i == 1, "reserved_by": "u2" if i == 1 else None}
+            for i in range(1, 4)
+        ])
+        db.execute(insert(wishlist_shared_with), [{"wishlist_id": 1, "user_id": "u2"}])
+        db.execute(insert(GroupDB), [{"id": 1, "name": "family", "owner_id": "u1"}])
+        db.execute(insert(GroupMemberDB), [{"group_id": 1, "user_id": "u1"}, {"group_id": 1, "user_id": "u2"}])
+        db.commit()
+
+
+async def enqueue_and_claim(db):
+    await crud.enqueue_emails(db, [
+        {"idempotency_key": f"plan:{i}", "to_email": "u3@example.com", "subject": "s", "body": "b",
+         "text_body": None, "is_html": False}
+        for i in range(2)
+    ])
+    await db.commit()
+    return await crud.claim_outbox_batch(db, "query-plans", 10, 60)
+
+
+async def share_token_round_trip(db):
+    token = await crud.create_share_token(db, 1, "u1")
+    await db.commit()
+    crud._share_token_cache.clear()
+    await crud.get_share_token(db, token)
+    await crud.delete_share_token(db, token)
+
+
+CASES = [
+    ("get_user_by_uid", lambda db: crud.get_user_by_uid(db, "u1")),
+    ("get_user_by_email", lambda db: crud.get_user_by_email(db, "u1@example.com")),
+    ("get_users_by_emails", lambda db: crud.get_users_by_emails(db, ["u1@example.com", "u2@example.com"])),
+    ("get_wishlist_by_id", lambda db: crud.get_wishlist_by_id(db, 1)),
+    ("get_wishlists_for_user", lambda db: crud.get_wishlists_for_user(db, "u2", include_items=True)),
+    ("get_wishlists_for_user page", lambda db: crud.get_wishlists_for_user(db, "u2", after=(1,), limit=10)),
+    ("get_items_for_wishlist", lambda db: crud.get_items_for_wishlist(db, 1)),
+    ("get_items_for_wishlist page", lambda db: crud.get_items_for_wishlist(db, 1, after=(1,), limit=10)),
+    ("get_item_in_wishlist", lambda db: crud.get_item_in_wishlist(db, 1, 2)),
+    ("get_item_ids_in_wishlist", lambda db: crud.get_item_ids_in_wishlist(db, 1, [1, 2, 99])),
+    ("apply_item_batch", lambda db: crud.apply_item_batch(
+        db, 1, [{"name": "new"}], [{"id": 2, "name": "renamed"}, {"id": 1, "link": "https://example.com"}], [3],
+    )),
+    ("get_item_names_for_owner", lambda db: crud.get_item_names_for_owner(db, "u1")),
+    ("toggle_item_reservation", lambda db: crud.toggle_item_reservation(db, 1, 2, "u2")),
+    ("get_reserver_names", lambda db: crud.get_reserver_names(db, [WishItemDB(reserved_by="u2")])),
+    ("share_wishlist_with_user", lambda db: crud.share_wishlist_with_user(db, 1, "u3")),
+    ("get_shared_wishlists_for_user", lambda db: crud.get_shared_wishlists_for_user(db, "u2")),
+    ("is_shared_with", lambda db: crud.is_shared_with(db, 1, "u2")),
+    ("get_shared_user_emails_for_wishlist", lambda db: crud.get_shared_user_emails_for_wishlist(db, 1)),
+    ("unshare_wishlist_with_user", lambda db: crud.unshare_wishlist_with_user(db, 1, "u3@example.com")),
+    ("share tokens", share_token_round_trip),
+    ("delete_expired_share_tokens", lambda db: crud.delete_expired_share_tokens(db)),
+    ("get_data_version", lambda db: crud.get_data_version(db)),
+    ("get_changes_for_user full", lambda db: crud.get_changes_for_user(db, "u2", 0)),
+    ("get_changes_for_user since", lambda db: crud.get_changes_for_user(db, "u2", 3)),
+    ("prune_sync_tombstones", lambda db: crud.prune_sync_tombstones(db, 0)),
+    ("claim_outbox_batch", enqueue_and_claim),
+    ("record_outbox_results", lambda db: crud.record_outbox_results(db, {1: None, 2: RuntimeError("bounced")}, 5, 30)),
+    ("search_users", lambda db: crud.search_users(db, "user", 10)),
+    ("search_users page", lambda db: crud.search_users(db, "user", 10, after=(1, 1))),
+    ("search_groups", lambda db: crud.search_groups(db, "fam", 10)),
+    ("search_groups page", lambda db: crud.search_groups(db, "fam", 10, after=(0, 1))),
+    ("get_group_members page", lambda db: crud.get_group_members(db, 1, after=("u1",), limit=10)),
+]
+
+
+async def capture_statements(case) -> list[tuple[str, tuple]]:
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+            statements.append((statement, parameters))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        async with AsyncSessionLocal() as db:
+            await case(db)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", capture)
+    return statements
+
+
+async def count_statements_by_list_count(verbose: bool) -> int:
+    """Statements per get_wishlists_for_user call for 3 and 50 lists; the failures."""
+    counts = {}
+    next_id = 1000
+    for lists in (3, 50):
+        with SessionLocal() as db:
+            owned = db.query(WishListDB).filter_by(owner_id="u3").count()
+            rows = [{"id": next_id + i, "owner_id": "u3", "name": f"count {next_id + i}"} for i in range(lists - owned)]
+            next_id += len(rows)
+            db.execute(insert(WishListDB), rows)
+            db.execute(insert(WishItemDB), [
+                {"wishlist_id": row["id"], "name": f"item {n}", "reserved": n == 0, "reserved_by": "u1" if n == 0 else None}
+                for row in rows for n in range(2)
+            ])
+            db.execute(insert(wishlist_shared_with), [{"wishlist_id": row["id"], "user_id": "u2"} for row in rows])
+            db.commit()
+        for include_items in (False, True):
+            statements = await capture_statements(
+                lambda db: crud.get_wishlists_for_user(db, "u3", include_items=include_items)
+            )
+            counts[include_items, lists] = len(statements)
+    failures = 0
+    for include_items in (False, True):
+        few, many = counts[include_items, 3], counts[include_items, 50]
+        failures += many > few
+        name = f"get_wishlists_for_user{' include_items' if include_items else ''}"
+        if many > few or verbose:
+            print(f"{'GROWS' if many > few else 'ok':<6}{name}: {few} statement(s) for 3 lists, {many} for 50")
+    print(f"{failures} call(s) send more statements for more lists")
+    return failures
+
+
+def explain(statement: str, parameters: tuple) -> list[str]:
+    with engine.connect() as conn:
+        return [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+
+
+async def run(verbose: bool) -> int:
+    init_db()
+    seed()
+    failures = 0
+    for name, case in CASES:
+        for statement, parameters in await capture_statements(case):
+            plan = explain(statement, parameters)
+            scans = [detail for detail in plan if scans_table(detail)]
+            failures += bool(scans)
+            print(f"{'SCAN' if scans else 'ok':<6}{name}")
+            if scans or verbose:
+                print("      " + " ".join(statement.split()))
+                for detail in plan:
+                    print(f"        {detail}")
+    print(f"{failures} statement(s) scan a table")
+    failures += await count_statements_by_list_count(verbose)
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--verbose", action="store_true", help="print every statement and plan")
+    args = parser.parse_args()
+    try:
+        status = asyncio.run(run(args.verbose))
+    finally:
+        os.remove(_DB_FILE)
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Training time and per-user latency of the recommendation model.
+
+    python -m benchmarks.recommendations [--wishlists N] [--users N]
+
+Trains on synthetic wishlists drawn from themed catalogues, writes the
+model to a temporary directory and times Recommender.recommend for users
+with a handful of known and never-seen item names.
+"""
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from app.recommender import Recommender, save_model, train
+
+THEMES = {
+    "lego": ["lego {} set", "lego {} minifigures", "lego {} collector edition"],
+    "coffee": ["{} coffee beans", "{} espresso machine", "{} coffee grinder", "{} pour over kettle"],
+    "books": ["{} hardcover", "{} paperback", "{} audiobook", "{} box set"],
+    "running": ["{} running shoes", "{} running vest", "{} gps watch", "{} foam roller"],
+    "gaming": ["{} controller", "{} headset", "{} game pass", "{} console"],
+}
+VARIANTS = ["star wars", "city", "technic", "ethiopian", "colombian", "breville", "fantasy", "sci fi",
+            "nike", "garmin", "asics", "xbox", "playstation", "nintendo", "deluxe", "mini", "pro", "classic"]
+
+
+def make_items(wishlists: int, seed: int = 1) -> pd.DataFrame:
+    rng = random.Random(seed)
+    catalogue = {
+        theme: [pattern.format(variant) for pattern in patterns for variant in VARIANTS]
+        for theme, patterns in THEMES.items()
+    }
+    rows = []
+    item_id = 0
+    for wishlist_id in range(wishlists):
+        themes = rng.sample(list(catalogue), k=rng.randint(1, 2))
+        for _ in range(rng.randint(3, 12)):
+            name = rng.choice(catalogue[rng.choice(themes)])
+            if rng.random() < 0.1:
+                # Long tail of one-off names
+                name = f"{name} {rng.choice(VARIANTS)} {rng.randrange(100_000)}"
+            item_id += 1
+            rows.append({"id": item_id, "wishlist_id": wishlist_id, "name": name.title() if rng.random() < 0.3 else name})
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--wishlists", type=int, default=50_000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--neighbours", type=int, default=50)
+    args = parser.parse_args()
+
+    items = make_items(args.wishlists)
+    started = time.perf_counter()
+    model = train(items, args.neighbours)
+    print(f"Trained on {len(items)} items ({len(model['names'])} distinct) in {time.perf_counter() - started:.2f}s")
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        version = save_model(model, {}, Path(model_dir))
+        recommender = Recommender(Path(model_dir) / version)
+        rng = random.Random(2)
+        names = list(items["name"].unique())
+        users = [rng.sample(names, k=rng.randint(1, 10)) + ["lego millennium falcon"] * (rng.random() < 0.2)
+                 for _ in range(args.users)]
+        timings = []
+        for user_items in users:
+            start = time.perf_counter()
+            recommender.recommend(user_items, 10)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        for p in (0.5, 0.95, 0.99):
+            print(f"recommend p{int(p * 100):<3} {timings[int(len(timings) * p)] * 1000:7.3f} ms")
+        print("lego star wars set ->", recommender.recommend(["Lego Star Wars Set"], 5))
+        print("never seen 'espresso cups' ->", recommender.recommend(["espresso cups"], 5))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Many users racing to reserve the same gift.
+
+    python -m benchmarks.reservations [--reservers N] [--items N]
+
+For each item, ``--reservers`` users try to reserve it at the same moment,
+each through its own session and connection. crud.toggle_item_reservation
+must hand every item to exactly one of them; the read-check-write that
+POST /wishlists/{id}/reserve/{item_id} used before is run the same way for
+comparison. Exits non-zero if any item ends up with more or fewer than one
+winner, or if the stored reservation disagrees with the winner.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+# Point the app at a scratch database before anything imports the engine
+_DB_FILE = os.path.join(tempfile.mkdtemp(), "reservations_bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_FILE}"
+
+from sqlalchemy import insert, select, update  # noqa: E402
+
+from app.db import crud  # noqa: E402
+from app.db.database import AsyncSessionLocal, SessionLocal, init_db  # noqa: E402
+from app.db.models import WishItemDB, WishListDB  # noqa: E402
+
+
+async def read_then_write(db, wishlist_id: int, item_id: int, user_id: str) -> bool | None:
+    # The reservation logic before the conditional UPDATE
+    item = await crud.get_item_in_wishlist(db, wishlist_id, item_id)
+    if item.reserved:
+        return None
+    item.reserved = True
+    item.reserved_by = user_id
+    await db.commit()
+    return True
+
+
+def seed(items: int):
+    with SessionLocal() as db:
+        db.execute(insert(WishListDB), [{"id": 1, "owner_id": "owner", "name": "race", "tag": "Other"}])
+        db.execute(insert(WishItemDB), [
+            {"id": i, "wishlist_id": 1, "name": f"gift {i}", "reserved": False} for i in range(1, items + 1)
+        ])
+        db.commit()
+
+
+def reset():
+    with SessionLocal() as db:
+        db.execute(update(WishItemDB).values(reserved=False, reserved_by=None))
+        db.commit()
+
+
+async def attempt(reserve, item_id: int, user_id: str) -> tuple[bool, float]:
+    start = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        reserved = await reserve(db, 1, item_id, user_id)
+    return reserved is True, time.perf_counter() - start
+
+
+async def race(reserve, items: int, reservers: int) -> tuple[int, list[float]]:
+    """Returns how many items did not end up with exactly one winner."""
+    reset()
+    bad = 0
+    timings = []
+    for item_id in range(1, items + 1):
+        users = [f"user{n}" for n in range(reservers)]
+        results = await asyncio.gather(*(attempt(reserve, item_id, user_id) for user_id in users))
+        timings.extend(elapsed for _, elapsed in results)
+        winners = [user_id for user_id, (won, _) in zip(users, results) if won]
+        async with AsyncSessionLocal() as db:
+            holder = await db.scalar(select(WishItemDB.reserved_by).where(WishItemDB.id == item_id))
+        if len(winners) != 1 or holder != winners[0]:
+            bad += 1
+    return bad, sorted(timings)
+
+
+def percentile(timings: list[float], p: float) -> float:
+    return timings[min(len(timings) - 1, int(len(timings) * p))] * 1000
+
+
+async def run(items: int, reservers: int) -> int:
+    init_db()
+    seed(items)
+    print(f"{items} items, {reservers} concurrent reservers each")
+    print(f"{'':<28}{'bad items':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    status = 0
+    for name, reserve in [("conditional UPDATE", crud.toggle_item_reservation), ("read then write", read_then_write)]:
+        bad, timings = await race(reserve, items, reservers)
+        print(f"{name:<28}{bad:>10}{percentile(timings, 0.5):9.3f}{percentile(timings, 0.95):9.3f}{percentile(timings, 0.99):9.3f}")
+        if reserve is crud.toggle_item_reservation and bad:
+            status = 1
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--reservers", type=int, default=20)
+    args = parser.parse_args()
+    try:
+        status = asyncio.run(run(args.items, args.reservers))
+    finally:
+        os.remove(_DB_FILE)
+    raise SystemExit(status)
+
+
+if __name__ == "__main__":
+    main()
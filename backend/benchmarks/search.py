@@ -0,0 +1,133 @@
+"""Latency of the sharing-dialog searches against a large user table.
+
+    python -m benchmarks.search [--users N] [--queries N]
+
+Builds a throwaway SQLite database, then times crud.search_users and
+crud.search_groups against the previous ILIKE '%q%' scan. Timings are end
+to end through the async session, so they include the aiosqlite round trip
+shown on the first line.
+"""
+import argparse
+import asyncio
+import os
+import random
+import string
+import tempfile
+import time
+
+# Point the app at a scratch database before anything imports the engine
+_DB_FILE = os.path.join(tempfile.mkdtemp(), "search_bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_FILE}"
+
+from sqlalchemy import insert, or_, select, text  # noqa: E402
+
+from app.db import crud  # noqa: E402
+from app.db.database import AsyncSessionLocal, SessionLocal, init_db  # noqa: E402
+from app.db.models import GroupDB, UserDB  # noqa: E402
+
+FIRST_NAMES = ["alice", "bob", "carol", "dave", "erin", "frank", "grace", "heidi", "ivan", "judy",
+               "mallory", "niaj", "olivia", "peggy", "rupert", "sybil", "trent", "victor", "walter", "zoe"]
+LAST_NAMES = ["smith", "jones", "taylor", "brown", "wilson", "evans", "thomas", "roberts", "walker", "wright"]
+DOMAINS = ["gmail.com", "outlook.com", "example.org", "proton.me"]
+
+
+def seed(users: int, groups: int):
+    rng = random.Random(42)
+    rows = []
+    for i in range(users):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        suffix = "".join(rng.choices(string.ascii_lowercase, k=4))
+        rows.append({
+            "uid": f"uid{i}",
+            "first_name": f"{first}{suffix}",
+            "last_name": last,
+            "email": f"{first}.{last}{i}@{rng.choice(DOMAINS)}",
+        })
+    with SessionLocal() as db:
+        db.execute(insert(UserDB), rows)
+        db.execute(insert(GroupDB), [
+            {"name": f"{rng.choice(LAST_NAMES)} family {i}", "owner_id": f"uid{i}"} for i in range(groups)
+        ])
+        db.commit()
+
+
+def make_queries(count: int) -> list[str]:
+    """Mostly prefixes of common names, with some rare terms and misses."""
+    rng = random.Random(7)
+    words = FIRST_NAMES + LAST_NAMES
+    queries = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.7:
+            queries.append(rng.choice(words)[: rng.randint(1, 5)])
+        elif kind < 0.9:
+            queries.append(f"{rng.choice(FIRST_NAMES)}.{rng.choice(LAST_NAMES)}{rng.randrange(100_000)}")
+        else:
+            queries.append("".join(rng.choices(string.ascii_lowercase, k=5)))
+    return queries
+
+
+async def ilike_users(db, q: str, limit: int):
+    # The query /search ran before the FTS5 index
+    return list(await db.scalars(select(UserDB).where(or_(
+        UserDB.email.ilike(f"%{q}%"), UserDB.first_name.ilike(f"%{q}%"), UserDB.last_name.ilike(f"%{q}%"),
+    )).limit(limit)))
+
+
+async def ilike_groups(db, q: str, limit: int):
+    return list(await db.scalars(select(GroupDB).where(GroupDB.name.ilike(f"%{q}%")).limit(limit)))
+
+
+async def round_trip(db, q: str, limit: int):
+    # Floor set by the async driver, for comparison
+    await db.execute(text("SELECT 1"))
+
+
+async def measure(search, queries: list[str]) -> list[float]:
+    timings = []
+    async with AsyncSessionLocal() as db:
+        await search(db, queries[0], 10)  # warm up the connection
+        for q in queries:
+            start = time.perf_counter()
+            await search(db, q, 10)
+            timings.append(time.perf_counter() - start)
+    return sorted(timings)
+
+
+def percentile(timings: list[float], p: float) -> float:
+    return timings[min(len(timings) - 1, int(len(timings) * p))] * 1000
+
+
+async def run(users: int, groups: int, queries: int):
+    init_db()
+    started = time.perf_counter()
+    seed(users, groups)
+    print(f"Seeded {users} users and {groups} groups in {time.perf_counter() - started:.1f}s")
+    sample = make_queries(queries)
+    cases = [
+        ("round trip (SELECT 1)", round_trip),
+        ("search_users (FTS5)", crud.search_users),
+        ("search_users (ILIKE)", ilike_users),
+        ("search_groups (FTS5)", crud.search_groups),
+        ("search_groups (ILIKE)", ilike_groups),
+    ]
+    print(f"{'':<24}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, search in cases:
+        timings = await measure(search, sample)
+        print(f"{name:<24}{percentile(timings, 0.5):9.3f}{percentile(timings, 0.95):9.3f}{percentile(timings, 0.99):9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--groups", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+    try:
+        asyncio.run(run(args.users, args.groups, args.queries))
+    finally:
+        os.remove(_DB_FILE)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Cost of turning rows into the JSON body of the list endpoints.
+
+    python -m benchmarks.serialization [--items N] [--repeat N]
+
+Builds WishListDB/WishItemDB rows in memory (no database) and times, per
+1,000 items, how GET /wishlists and GET /wishlists/{id}/items turn them
+into a response body: the previous way, a pydantic model per row that
+FastAPI then validates again against the route's response_model and
+serializes, against the dict projection encoded by ORJSONResponse (see
+app/utils/json_response.py). Exits non-zero if the two bodies differ.
+"""
+import argparse
+import json
+import statistics
+import time
+
+from fastapi.routing import APIRoute, serialize_response
+
+from app.db.models import UserDB, WishItemDB, WishListDB
+from app.models import WishItemRequest, WishListRequest
+from app.routes.wishlist import router as wishlist_router
+from app.routes.wishlist_items import router as wishlist_items_router
+from app.utils.json_response import ORJSONResponse, item_fields, wishlist_fields
+
+ITEMS_PER_WISHLIST = 10
+
+
+def response_field(router, path: str):
+    """The response_model field FastAPI validates GET path's result against."""
+    return next(
+        route.response_field for route in router.routes
+        if isinstance(route, APIRoute) and route.path == path and "GET" in route.methods
+    )
+
+
+def build_rows(items: int) -> tuple[list[WishListDB], dict[str, str]]:
+    users = [UserDB(uid=f"user{i}", first_name=f"first{i}", last_name=f"last{i}", email=f"u{i}@example.com")
+             for i in range(20)]
+    wishlists = []
+    for n in range(max(1, items // ITEMS_PER_WISHLIST)):
+        wishlists.append(WishListDB(
+            id=n + 1, name=f"list {n}", owner_id=users[n % 20].uid, owner_user=users[n % 20], tag="Birthday",
+            shared_with=users[:4],
+            items=[
+                WishItemDB(
+                    id=n * ITEMS_PER_WISHLIST + i, name=f"gift {i}", reserved=i % 3 == 0,
+                    reserved_by=users[i % 4].uid if i % 3 == 0 else None, link=f"https://shop.example.com/p/{i}",
+                )
+                for i in range(ITEMS_PER_WISHLIST)
+            ],
+        ))
+    user_map = {user.uid: f"{user.first_name} {user.last_name}" for user in users}
+    return wishlists, user_map
+
+
+def model_items(items, user_map) -> list[WishItemRequest]:
+    # What the routes returned before the dict projection
+    return [WishItemRequest(
+        id=item.id,
+        name=item.name,
+        reserved=item.reserved,
+        reserved_by=item.reserved_by,
+        reserved_by_name=user_map.get(item.reserved_by) if item.reserved_by else None,
+        link=item.link
+    ) for item in items]
+
+
+def model_wishlists(wishlists, user_map) -> list[WishListRequest]:
+    return [WishListRequest(
+        id=wishlist.id,
+        name=wishlist.name,
+        owner_id=wishlist.owner_id,
+        owner_first_name=wishlist.owner_user.first_name.capitalize() if wishlist.owner_user.first_name else "",
+        owner_last_name=wishlist.owner_user.last_name.capitalize() if wishlist.owner_user.last_name else "",
+        items=model_items(wishlist.items, user_map),
+        shared_with=[sw.uid for sw in wishlist.shared_with],
+        tag=wishlist.tag
+    ) for wishlist in wishlists]
+
+
+def measure(render, repeat: int) -> tuple[float, bytes]:
+    body = render()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    wishlists, user_map = build_rows(args.items)
+    items = [item for wishlist in wishlists for item in wishlist.items]
+    wishlists_field = response_field(wishlist_router, "/wishlists")
+    items_field = response_field(wishlist_items_router, "/wishlists/{wishlist_id}/items")
+
+    def validated(field, content) -> bytes:
+        # serialize_response does not await anything for an async endpoint;
+        # stepping it directly keeps event loop overhead out of the timing
+        coroutine = serialize_response(field=field, response_content=content, dump_json=True)
+        try:
+            coroutine.send(None)
+        except StopIteration as done:
+            return done.value
+        raise RuntimeError("serialize_response suspended")
+
+    cases = [
+        ("GET /wishlists/{id}/items",
+         lambda: validated(items_field, model_items(items, user_map)),
+         lambda: ORJSONResponse([item_fields(item, user_map) for item in items]).body),
+        ("GET /wishlists?include=items",
+         lambda: validated(wishlists_field, model_wishlists(wishlists, user_map)),
+         lambda: ORJSONResponse([
+             wishlist_fields(wishlist, [item_fields(item, user_map) for item in wishlist.items]) for wishlist in wishlists
+         ]).body),
+    ]
+    print(f"{len(items)} items in {len(wishlists)} wishlists; median of {args.repeat} runs, per 1,000 items")
+    print(f"{'':<30}{'models ms':>11}{'dicts ms':>10}{'speedup':>9}")
+    status = 0
+    for name, before, after in cases:
+        before_seconds, before_body = measure(before, args.repeat)
+        after_seconds, after_body = measure(after, args.repeat)
+        scale = 1000 / len(items) * 1000
+        line = f"{name:<30}{before_seconds * scale:11.3f}{after_seconds * scale:10.3f}{before_seconds / after_seconds:8.1f}x"
+        if json.loads(before_body) != json.loads(after_body):
+            line += "  BODIES DIFFER"
+            status = 1
+        print(line)
+    raise SystemExit(status)
+
+
+if __name__ == "__main__":
+    main()
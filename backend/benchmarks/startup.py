@@ -0,0 +1,65 @@
+"""Import time of the API app, checked against a budget.
+
+    python -m benchmarks.startup [--runs N] [--budget-ms MS]
+
+Imports app.main in fresh interpreters under ``python -X importtime`` and
+reports the median cumulative time, plus where the time goes by top-level
+package. Exits non-zero when the median is over budget, so a module that
+starts doing real work at import (connecting, reading credentials, building
+the schema) shows up before it slows down every worker spawn.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from collections import Counter
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+
+def import_times(module: str) -> dict[str, tuple[int, int]]:
+    """(self, cumulative) microseconds per module for one cold import."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if self_us.strip().isdigit():
+            times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="tune for the machine running the check")
+    parser.add_argument("--top", type=int, default=12)
+    args = parser.parse_args()
+
+    runs = [import_times(args.module) for _ in range(args.runs)]
+    totals = [run[args.module][1] / 1000 for run in runs]
+    median = statistics.median(totals)
+
+    # Self time per top-level package, from the median run
+    by_package = Counter()
+    for name, (self_us, _) in runs[totals.index(sorted(totals)[len(totals) // 2])].items():
+        by_package[name.split(".")[0]] += self_us
+    print(f"{'package':<24}{'ms':>9}")
+    for package, self_us in by_package.most_common(args.top):
+        print(f"{package:<24}{self_us / 1000:9.1f}")
+
+    print(f"import {args.module}: median {median:.0f} ms over {args.runs} runs "
+          f"(min {min(totals):.0f}, max {max(totals):.0f}), budget {args.budget_ms:.0f} ms")
+    if median > args.budget_ms:
+        print("Over budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -157,8 +157,7 @@ class _WishListDetailsScreenState extends State<WishListDetailsScreen> {
 
   void _reserveGift(int itemId) async {
     try {
-      final reservedBy = currentUserId ?? 'User';
-      await WishListService().reserveGift(widget.wishList.id, itemId, reservedBy);
+      await WishListService().reserveGift(widget.wishList.id, itemId);
       // Always refresh items from backend to get the true state (reserved or unreserved)
       _fetchItems();
     } catch (e) {
@@ -39,14 +39,8 @@ class WishListService {
   }
 
   Future<List<WishItem>> fetchWishListItems(int wishlistId) async {
-    final headers = await _getAuthHeaders();
-    final response = await http.get(Uri.parse('$baseUrl/wishlists/$wishlistId/items'), headers: headers);
-    if (response.statusCode == 200) {
-      final List<dynamic> data = jsonDecode(response.body);
-      return data.map((json) => WishItem.fromJson(json)).toList();
-    } else {
-      throw Exception('Failed to load wish list items');
-    }
+    final data = await _getAllPages('$baseUrl/wishlists/$wishlistId/items', 'Failed to load wish list items');
+    return data.map((json) => WishItem.fromJson(json)).toList();
   }
 
   Future<bool> registerUser({
@@ -224,15 +218,29 @@ class WishListService {
     return headers;
   }
 
-  Future<List<WishList>> fetchWishLists() async {
+  /// GETs every page of a list endpoint, following the x-next-cursor header
+  Future<List<dynamic>> _getAllPages(String url, String errorMessage) async {
     final headers = await _getAuthHeaders();
-    final response = await http.get(Uri.parse('$baseUrl/wishlists'), headers: headers);
-    if (response.statusCode == 200) {
-      final List<dynamic> data = jsonDecode(response.body);
-      return data.map((json) => WishList.fromJson(json)).toList();
-    } else {
-      throw Exception('Failed to load wish lists');
-    }
+    final rows = <dynamic>[];
+    String? cursor;
+    do {
+      final uri = Uri.parse(url);
+      final response = await http.get(
+        cursor == null ? uri : uri.replace(queryParameters: {...uri.queryParameters, 'cursor': cursor}),
+        headers: headers,
+      );
+      if (response.statusCode != 200) {
+        throw Exception(errorMessage);
+      }
+      rows.addAll(jsonDecode(response.body) as List);
+      cursor = response.headers['x-next-cursor'];
+    } while (cursor != null);
+    return rows;
+  }
+
+  Future<List<WishList>> fetchWishLists() async {
+    final data = await _getAllPages('$baseUrl/wishlists', 'Failed to load wish lists');
+    return data.map((json) => WishList.fromJson(json)).toList();
   }
 
   Future<void> createWishList(Map<String, dynamic> wishList) async {
@@ -247,10 +255,11 @@ class WishListService {
     }
   }
 
-  Future<void> reserveGift(int wishlistId, int itemId, String reservedBy) async {
+  // Reserves (or releases) the item for the signed-in user
+  Future<void> reserveGift(int wishlistId, int itemId) async {
     final headers = await _getAuthHeaders();
     final response = await http.post(
-      Uri.parse('$baseUrl/wishlists/$wishlistId/reserve/$itemId?reserved_by=$reservedBy'),
+      Uri.parse('$baseUrl/wishlists/$wishlistId/reserve/$itemId'),
       headers: headers,
     );
     if (response.statusCode != 200) {
@@ -303,16 +312,7 @@ class WishListService {
 
   // Fetch members of a group
   Future<List<UserSearchResult>> getGroupMembers(int groupId) async {
-    final headers = await _getAuthHeaders();
-    final response = await http.get(
-      Uri.parse('$baseUrl/groups/$groupId/members'),
-      headers: headers,
-    );
-    if (response.statusCode == 200) {
-      final data = jsonDecode(response.body) as List;
-      return data.map((json) => UserSearchResult.fromJson(json)).toList();
-    } else {
-      throw Exception('Failed to fetch group members');
-    }
+    final data = await _getAllPages('$baseUrl/groups/$groupId/members', 'Failed to fetch group members');
+    return data.map((json) => UserSearchResult.fromJson(json)).toList();
   }
 }